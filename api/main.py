@@ -4,6 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from src.models.user import UserLogged
 from src.main import router as v1_router
+from src.routers.metrics import router as metrics_router
+from src.utils.timing import ServerTimingMiddleware
+from src.utils.profiling import ProfileMiddleware
+from src.utils.memory import AllocationMiddleware
+from src.utils.concurrency import LoopMonitorMiddleware
+from src.utils.etag import ETagMiddleware
+from src.utils.compression import CompressionMiddleware
 from src.utils.oauth import get_current_user
 
 
@@ -23,7 +30,16 @@ app.add_middleware(
 )
 
 
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(AllocationMiddleware)
+app.add_middleware(ProfileMiddleware)
+app.add_middleware(LoopMonitorMiddleware)
+app.add_middleware(ETagMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+
 app.include_router(v1_router, prefix="/v1")
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root(current_user:UserLogged = Depends(get_current_user)):
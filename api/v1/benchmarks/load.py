@@ -0,0 +1,361 @@
+"""
+Load-testing harness.
+
+Starts one API worker against local backends and replays realistic traffic
+at a fixed concurrency, then reports the throughput and the latency
+percentiles of each route.
+
+Usage (from api/v1):
+    python -m benchmarks.load [--concurrency N] [--duration S] [--warmup S]
+                              [--scenario NAME ...] [--url URL] [--app MODULE:APP]
+                              [--output FILE.json] [--compare BASELINE.json]
+
+Without `--url`, the app is started with uvicorn in a subprocess, with
+`DB_BACKEND=memory` unless the variable is already set, so the client does
+not share the worker's interpreter. Each virtual user loops over a
+scenario picked (round robin) among:
+
+- `questionnaire`: the section list, then for each section its questions
+  with their options, the next questions of an option and the next section.
+- `projects`: project create, read, update and delete.
+- `templates`: the public template listing.
+- `recommendations`: the templates recommended for a project.
+
+Latencies are grouped by route template (`/v1/sections/{section_id}/questions`),
+not by URL. The JSON results can be compared with `--compare` to get the
+change of each metric between two runs.
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_APP = "tests.main_test:app"
+PERCENTILES = (50, 95, 99)
+USER_ID = "653e4964f9e328a046420984"
+PROJECT = {
+    "created_by": USER_ID,
+    "project_name": "Benchmark Project",
+    "project_type": "Backend",
+    "project_architecture": "Microservices",
+    "project_tags": ["Python", "FastAPI"],
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    The q-th percentile of values, by linear interpolation.
+
+    Args:
+        values (List[float]): The sorted values.
+        q (float): The percentile, between 0 and 100.
+    """
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class Recorder:
+    """
+    Class to collect the latency and status of each request, per route.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.recording = False
+
+    def add(self, route: str, seconds: float, status: int):
+        if not self.recording:
+            return
+        self.samples.setdefault(route, []).append(seconds)
+        statuses = self.statuses.setdefault(route, {})
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 0 or status >= 500:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        """
+        Returns:
+            dict: The requests, errors, throughput and latencies (ms) per route, and in total.
+        """
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            routes[route] = self._stats(sorted(samples), elapsed, self.errors.get(route, 0))
+            routes[route]["statuses"] = self.statuses[route]
+        every = sorted(s for samples in self.samples.values() for s in samples)
+        return {"routes": routes, "total": self._stats(every, elapsed, sum(self.errors.values()))}
+
+    @staticmethod
+    def _stats(samples: List[float], elapsed: float, errors: int) -> dict:
+        stats = {
+            "requests": len(samples),
+            "errors": errors,
+            "rps": len(samples) / elapsed if elapsed else 0.0,
+            "mean_ms": 1000 * sum(samples) / len(samples) if samples else 0.0,
+            "max_ms": 1000 * samples[-1] if samples else 0.0,
+        }
+        for q in PERCENTILES:
+            stats[f"p{q}_ms"] = 1000 * percentile(samples, q)
+        return stats
+
+
+class Traffic:
+    """
+    Class to replay the scenarios against the API.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self.client = client
+        self.recorder = recorder
+
+    async def request(self, method: str, route: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (httpx.ReadError, httpx.RemoteProtocolError):
+                # The server closes a kept-alive connection after an unhandled
+                # error: the next request on it fails before being sent.
+                start = time.perf_counter()
+                response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.add(f"{method} {route}", time.perf_counter() - start, 0)
+            return None
+        self.recorder.add(f"{method} {route}", time.perf_counter() - start, response.status_code)
+        return response
+
+    @staticmethod
+    def _json(response: Optional[httpx.Response], default):
+        if response is None or response.status_code != 200:
+            return default
+        return response.json()
+
+    async def questionnaire(self):
+        sections = self._json(await self.request("GET", "/v1/sections/", "/v1/sections/"), [])
+        for section in sections:
+            questions = self._json(
+                await self.request(
+                    "GET", "/v1/sections/{section_id}/questions", f"/v1/sections/{section['id']}/questions",
+                    params={"include": "options"},
+                ),
+                [],
+            )
+            for question in questions[:2]:
+                for option in (question.get("options") or [])[:1]:
+                    await self.request(
+                        "GET", "/v1/sections/next-questions", "/v1/sections/next-questions",
+                        params={"question_id": question["id"], "option_text": option["text"]},
+                    )
+            await self.request(
+                "GET", "/v1/sections/{section_id}/next-section", f"/v1/sections/{section['id']}/next-section"
+            )
+
+    async def projects(self):
+        project = self._json(await self.request("POST", "/v1/projects/", "/v1/projects/", json=PROJECT), None)
+        if not project or not project.get("pid"):
+            return
+        url = f"/v1/projects/{project['pid']}"
+        await self.request("GET", "/v1/projects/{project_id}", url)
+        await self.request("PUT", "/v1/projects/{project_id}", url, json={"project_name": "Benchmark Project 2"})
+        await self.request("DELETE", "/v1/projects/{project_id}", url)
+
+    async def templates(self):
+        await self.request("GET", "/v1/templates/", "/v1/templates/")
+
+    async def recommendations(self):
+        project = self._json(await self.request("POST", "/v1/projects/", "/v1/projects/", json=PROJECT), None)
+        if not project or not project.get("pid"):
+            return
+        url = f"/v1/projects/{project['pid']}"
+        await self.request("GET", "/v1/projects/{project_id}/recommended-templates", f"{url}/recommended-templates")
+        await self.request("DELETE", "/v1/projects/{project_id}", url)
+
+
+SCENARIOS = ("questionnaire", "projects", "templates", "recommendations")
+
+
+async def _user(traffic: Traffic, scenarios, deadline: float):
+    while time.perf_counter() < deadline:
+        await getattr(traffic, next(scenarios))()
+
+
+async def run_load(url: str, concurrency: int, duration: float, warmup: float, scenarios) -> dict:
+    """
+    Run `concurrency` virtual users for `warmup` then `duration` seconds.
+
+    Returns:
+        dict: The summary of the requests sent after the warm-up.
+    """
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        traffic = Traffic(client, recorder)
+        start = time.perf_counter()
+        deadline = start + warmup + duration
+        users = [
+            asyncio.create_task(_user(traffic, itertools.islice(itertools.cycle(scenarios), i, None), deadline))
+            for i in range(concurrency)
+        ]
+        await asyncio.sleep(warmup)
+        recorder.recording = True
+        measured = time.perf_counter()
+        await asyncio.gather(*users)
+        recorder.recording = False
+        return recorder.summary(time.perf_counter() - measured)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, log: str = None, timeout: float = 60, env: dict = None) -> tuple:
+    """
+    Start one uvicorn worker serving `app`, and wait until it answers.
+
+    Args:
+        app (str): The uvicorn app (`module:attribute`).
+        log (str): The file receiving the server output, discarded by default.
+        timeout (float): Seconds to wait for the server.
+        env (dict): Extra environment variables of the server.
+
+    Returns:
+        tuple: The process and the base URL.
+    """
+    port = _free_port()
+    env = {**os.environ, "DB_BACKEND": os.environ.get("DB_BACKEND", "memory"), **(env or {})}
+    output = open(log, "w", encoding="utf-8") if log else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=env, stdout=output, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with code {process.returncode}")
+        try:
+            httpx.get(f"{url}/v1/sections/", timeout=5)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"The server did not start within {timeout}s")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: dict):
+    print(f"{'route':<52} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    rows = list(results["routes"].items()) + [("total", results["total"])]
+    for route, stats in rows:
+        print(
+            f"{route:<52} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+
+
+def compare(baseline: dict, results: dict) -> dict:
+    """
+    The relative change (in %) of the throughput and percentiles of each route
+    found in both runs. Positive is more requests per second or slower.
+    """
+    changes = {}
+    routes = dict(results["routes"], total=results["total"])
+    before = dict(baseline["routes"], total=baseline["total"])
+    for route, stats in routes.items():
+        if route not in before:
+            continue
+        changes[route] = {
+            metric: 100 * (stats[metric] - before[route][metric]) / before[route][metric]
+            for metric in ["rps"] + [f"p{q}_ms" for q in PERCENTILES]
+            if before[route][metric]
+        }
+    return changes
+
+
+def print_comparison(changes: dict):
+    print(f"{'change vs baseline':<52} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, change in changes.items():
+        cells = " ".join(
+            f"{change[metric]:>+7.1f}%" if metric in change else f"{'-':>8}"
+            for metric in ["rps"] + [f"p{q}_ms" for q in PERCENTILES]
+        )
+        print(f"{route:<52} {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API and report per-route latencies.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of virtual users.")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of traffic before measuring.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to replay (repeatable).")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one.")
+    parser.add_argument("--app", default=DEFAULT_APP, help="The uvicorn app to start.")
+    parser.add_argument("--server-log", help="Write the output of the started server to this file.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Print the change against the results of a previous run.")
+    args = parser.parse_args()
+
+    scenarios = tuple(args.scenario or SCENARIOS)
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_server(args.app, log=args.server_log)
+    try:
+        summary = asyncio.run(run_load(url, args.concurrency, args.duration, args.warmup, scenarios))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    results = {
+        "meta": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "url": args.url,
+            "app": None if args.url else args.app,
+            "db_backend": None if args.url else os.environ.get("DB_BACKEND", "memory"),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "scenarios": list(scenarios),
+            "python": platform.python_version(),
+        },
+        **summary,
+    }
+    print_report(results)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print_comparison(compare(json.load(file), results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
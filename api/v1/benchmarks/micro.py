@@ -0,0 +1,230 @@
+"""
+Micro-benchmarks of the helpers run on every request.
+
+Measures the per-call cost of the `src.utils` helpers and of the pydantic
+validation and serialization of the response models, on payloads the size
+of the real ones (the seed templates, a page of 100 documents), and the
+validated and trusted serialization paths of a 1k-template listing.
+
+Usage (from api/v1):
+    python -m benchmarks.micro [--filter TEXT] [--repeat N] [--min-time S]
+                               [--output FILE.json] [--compare BASELINE.json]
+
+For each case:
+
+- `ns/call` is the median over `repeat` rounds of the mean time per call,
+  each round calling the case enough times to last `min-time` seconds;
+- `allocs/call` and `bytes/call` are the memory blocks and bytes still
+  allocated by a call once it returns (its result, and what it added to its
+  arguments), measured with tracemalloc;
+- `peak/call` is the peak of temporary memory during one call.
+
+Arguments are built before the timed loop (helpers like `parse_mongo_id`
+modify their input), so only the call itself is measured.
+"""
+import argparse
+import copy
+import datetime
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from typing import Callable, List
+
+from bson.objectid import ObjectId
+from pydantic import TypeAdapter
+
+from src.db.ingestion.sources import ModuleSource
+from src.db.ingestion.synthetic import SyntheticCatalog
+from src.models.project import ProjectReadFields
+from src.models.template import TemplateReadFields
+from src.utils.handlers import build_query_sort_project, generate_response, handle_db_operations
+from src.utils.parsing import format_dict_for_cypher, parse_mongo_id
+from src.utils.serialization import TrustedSerializer
+
+PAGE = 100
+LISTING = 1000
+
+
+class Case:
+    """
+    A benchmarked call: `func(*make_args())`.
+    """
+
+    def __init__(self, name: str, func: Callable, make_args: Callable[[], tuple] = tuple):
+        self.name = name
+        self.func = func
+        self.make_args = make_args
+
+    def _time(self, number: int) -> float:
+        calls = [self.make_args() for _ in range(number)]
+        func = self.func
+        start = time.perf_counter_ns()
+        for args in calls:
+            func(*args)
+        return (time.perf_counter_ns() - start) / number
+
+    def calibrate(self, min_time: float) -> int:
+        """
+        The number of calls lasting at least `min_time` seconds.
+        """
+        number = 1
+        while True:
+            if self._time(number) * number >= min_time * 1e9:
+                return number
+            number *= 10
+
+    def allocations(self, number: int = 100) -> dict:
+        calls = [self.make_args() for _ in range(number)]
+        results = []
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for args in calls:
+                results.append(self.func(*args))
+            after = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            self.func(*self.make_args())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        stats = after.compare_to(before, "filename")
+        return {
+            "allocs": sum(stat.count_diff for stat in stats) / number,
+            "bytes": sum(stat.size_diff for stat in stats) / number,
+            "peak_bytes": max(0, peak - current),
+        }
+
+    def run(self, repeat: int = 5, min_time: float = 0.2) -> dict:
+        number = self.calibrate(min_time / repeat)
+        timings = [self._time(number) for _ in range(repeat)]
+        return {
+            "ns": statistics.median(timings),
+            "ns_min": min(timings),
+            "calls": number * repeat,
+            **self.allocations(),
+        }
+
+
+def _template_document(template: dict) -> dict:
+    return {**template, "_id": ObjectId(), "tid": str(ObjectId())}
+
+
+def _project_document(project: dict) -> dict:
+    return {**project, "_id": ObjectId()}
+
+
+def cases() -> List[Case]:
+    templates = [_template_document(t) for t in ModuleSource().templates()]
+    template = max(templates, key=lambda t: len(t.get("template_tree") or ""))
+    projects = [_project_document(p) for p in SyntheticCatalog(users=10, projects=PAGE).projects()]
+    template_page = [templates[n % len(templates)] for n in range(PAGE)]
+    template_reads = [{k: v for k, v in t.items() if k != "_id"} for t in template_page]
+    project_reads = [{**{k: v for k, v in p.items() if k != "_id"}, "pid": str(p["_id"])} for p in projects]
+
+    node = {"id": "project_type", "statement": "Project Type", "question_type": "select",
+            "section_id": "project_info", "order": 2, "required": True, "is_first": False}
+
+    @handle_db_operations
+    def wrapped(value):
+        return value
+
+    def unwrapped(value):
+        return value
+
+    templates_adapter = TypeAdapter(List[TemplateReadFields])
+    projects_adapter = TypeAdapter(List[ProjectReadFields])
+    templates_serializer = TrustedSerializer(TemplateReadFields, "template")
+    listing = [{**templates[n % len(templates)], "_id": ObjectId()} for n in range(LISTING)]
+
+    def validated_listing(documents):
+        # the previous path of GET /templates/: parse_mongo_id, response_model, default encoder
+        rows = templates_adapter.dump_python(templates_adapter.validate_python(parse_mongo_id(documents, "template")))
+        return json.dumps(rows).encode("utf-8")
+
+    return [
+        Case("format_dict_for_cypher(question)", format_dict_for_cypher, lambda: (node,)),
+        Case("format_dict_for_cypher(template)", format_dict_for_cypher,
+             lambda: ({k: v for k, v in template_reads[0].items() if k != "template_tree"},)),
+        Case("parse_mongo_id(template)", parse_mongo_id, lambda: (dict(template), "template", True)),
+        Case(f"parse_mongo_id({PAGE} projects)", parse_mongo_id,
+             lambda: ([dict(p) for p in projects], "project")),
+        Case("build_query_sort_project({})", build_query_sort_project, lambda: ({},)),
+        Case("build_query_sort_project(description)", build_query_sort_project,
+             lambda: ({"template_description": "django api"},)),
+        Case("build_query_sort_project(tags)", build_query_sort_project,
+             lambda: ({"template_tags": ["Python", "API"]},)),
+        Case("build_query_sort_project(stars)", build_query_sort_project, lambda: ({"stars": "3"},)),
+        Case("generate_response", generate_response, lambda: (True, "Operation successful", template)),
+        Case("plain call (baseline)", unwrapped, lambda: (template,)),
+        Case("handle_db_operations call", wrapped, lambda: (template,)),
+        Case("TemplateReadFields.model_validate", TemplateReadFields.model_validate,
+             lambda: (template_reads[0],)),
+        Case("ProjectReadFields.model_validate", ProjectReadFields.model_validate, lambda: (project_reads[0],)),
+        Case("TemplateReadFields.model_dump_json", TemplateReadFields.model_dump_json,
+             lambda: (TemplateReadFields.model_validate(template_reads[0]),)),
+        Case(f"response list[TemplateReadFields] ({PAGE})",
+             lambda rows: templates_adapter.dump_json(templates_adapter.validate_python(rows)),
+             lambda: (template_reads,)),
+        Case(f"response list[ProjectReadFields] ({PAGE})",
+             lambda rows: projects_adapter.dump_json(projects_adapter.validate_python(rows)),
+             lambda: (project_reads,)),
+        Case(f"deepcopy {PAGE} template documents", copy.deepcopy, lambda: (template_page,)),
+        Case(f"validated listing ({LISTING} templates)", validated_listing,
+             lambda: ([dict(t) for t in listing],)),
+        Case(f"trusted listing ({LISTING} templates)", lambda rows: templates_serializer.response(rows).body,
+             lambda: (listing,)),
+    ]
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"{'case':<46} {'ns/call':>12} {'allocs/call':>12} {'bytes/call':>11} {'peak/call':>10}"
+          + (f" {'vs baseline':>12}" if baseline else ""))
+    for name, stats in results.items():
+        line = (f"{name:<46} {stats['ns']:>12,.0f} {stats['allocs']:>12.1f} "
+                f"{stats['bytes']:>11,.0f} {stats['peak_bytes']:>10,}")
+        if baseline:
+            before = baseline.get(name)
+            line += f" {100 * (stats['ns'] - before['ns']) / before['ns']:>+11.1f}%" if before else f" {'-':>12}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the per-request helpers.")
+    parser.add_argument("--filter", help="Only run the cases whose name contains this text.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds of calls per case.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Print the change against the results of a previous run.")
+    args = parser.parse_args()
+
+    results = {}
+    for case in cases():
+        if args.filter and args.filter not in case.name:
+            continue
+        results[case.name] = case.run(repeat=args.repeat, min_time=args.min_time)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["cases"]
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({
+                "meta": {
+                    "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "repeat": args.repeat,
+                    "min_time": args.min_time,
+                },
+                "cases": results,
+            }, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Scaling curves.
+
+For each scale (a multiple of the seed data), generates a synthetic catalog
+(see `src.db.ingestion.synthetic`), starts one API worker on the in-memory
+backends seeded with it, and load-tests it with `benchmarks.load`. Prints the
+throughput and p95 of each route against the scale, and saves every run.
+
+Usage (from api/v1):
+    python -m benchmarks.scaling [--scale N ...] [--concurrency N] [--duration S] [--warmup S]
+                                 [--scenario NAME ...] [--seed N] [--output FILE.json]
+
+The in-memory backends answer most reads with scans: their curves show how
+the services scale with the data, not how MongoDB and Neo4j do. To get the
+curves of real databases, load each catalog with the ingestion job
+(`--mode stream --source DIR`, then `synthetic DIR --load-accounts`) and
+run `benchmarks.load --url` against the API.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import tempfile
+import time
+
+from benchmarks.load import SCENARIOS, run_load, start_server
+from src.db.ingestion.synthetic import SyntheticCatalog, scaled
+
+DEFAULT_SCALES = (10, 100, 1000)
+
+
+def run_scale(scale: int, args) -> dict:
+    """
+    Generate, serve and load-test the catalog of one scale.
+
+    Returns:
+        dict: The catalog counts, the startup time and the load summary.
+    """
+    with tempfile.TemporaryDirectory(prefix=f"catalog-{scale}x-") as directory:
+        counts = SyntheticCatalog(seed=args.seed, **scaled(scale)).write(directory)
+        print(f"{scale}x: {counts}")
+        start = time.perf_counter()
+        process, url = start_server(
+            args.app, timeout=args.startup_timeout, env={"DB_BACKEND": "memory", "MEMORY_DB_SOURCE": directory}
+        )
+        startup = time.perf_counter() - start
+        try:
+            summary = asyncio.run(run_load(url, args.concurrency, args.duration, args.warmup, args.scenarios))
+        finally:
+            process.terminate()
+            process.wait()
+    return {"counts": counts, "startup_seconds": startup, **summary}
+
+
+def print_curves(runs: dict):
+    scales = list(runs)
+    routes = sorted({route for run in runs.values() for route in run["routes"]})
+    header = " ".join(f"{f'{scale}x':>18}" for scale in scales)
+    print(f"{'route (rps / p95 ms)':<52} {header}")
+    for route in routes + ["total"]:
+        cells = []
+        for scale in scales:
+            stats = runs[scale]["total"] if route == "total" else runs[scale]["routes"].get(route)
+            cells.append(f"{stats['rps']:>8.1f} / {stats['p95_ms']:>7.1f}" if stats else f"{'-':>18}")
+        print(f"{route:<52} {' '.join(cells)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API on synthetic catalogs of growing size.")
+    parser.add_argument("--scale", type=int, action="append", help="Scale to run (repeatable).")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app", default="tests.main_test:app")
+    parser.add_argument("--startup-timeout", type=float, default=900, help="Seconds to seed and start a server.")
+    parser.add_argument("--output", help="Write the runs to this JSON file.")
+    args = parser.parse_args()
+    args.scenarios = tuple(args.scenario or SCENARIOS)
+
+    runs = {}
+    for scale in args.scale or DEFAULT_SCALES:
+        runs[scale] = run_scale(scale, args)
+    print_curves(runs)
+
+    if args.output:
+        results = {
+            "meta": {
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "warmup": args.warmup,
+                "scenarios": list(args.scenarios),
+                "seed": args.seed,
+                "python": platform.python_version(),
+            },
+            "scales": {str(scale): run for scale, run in runs.items()},
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
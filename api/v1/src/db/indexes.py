@@ -0,0 +1,46 @@
+"""
+Database indexes.
+
+The indexes the service queries rely on. `ensure_indexes` creates the missing
+ones; it is run by the ingestion job, and the query-plan suite
+(`tests/plans`) checks that every service query uses them.
+"""
+
+# (collection, [(field, direction), ...])
+MONGO_INDEXES = [
+    ("users", [("username", 1)]),
+    ("projects", [("created_by", 1)]),
+    ("templates", [("tid", 1)]),
+    ("templates", [("created_at", -1)]),
+]
+
+# (label, (property, ...))
+NEO4J_INDEXES = [
+    ("Section", ("id",)),
+    ("Section", ("order",)),
+    ("Question", ("id",)),
+    ("Option", ("question_id", "text")),
+    ("Tag", ("name",)),
+    ("Template", ("template_name",)),
+    ("Template", ("tid",)),
+    ("Project", ("id",)),
+]
+
+
+def ensure_indexes(mongo, neo4j) -> dict:
+    """
+    Create the MongoDB and Neo4j indexes that do not exist yet.
+
+    Args:
+        mongo (MongoDB): The MongoDB database.
+        neo4j (Neo4jDB): The Neo4j database.
+
+    Returns:
+        dict: The result of each index creation, by collection or label and keys.
+    """
+    results = {}
+    for collection, keys in MONGO_INDEXES:
+        results[f"{collection}{keys}"] = mongo.create_index(collection, keys)
+    for label, properties in NEO4J_INDEXES:
+        results[f":{label}{properties}"] = neo4j.ensure_index(label, properties)
+    return results
@@ -406,13 +406,13 @@ options =[
         {
         'text': 'Yes',
         'is_default': True,
-        'question_id': 'advanced_configurations',
+        'question_id': 'add_advanced_configurations',
         'tags': []
     },
             {
         'text': 'No',
         'is_default': False,
-        'question_id': 'advanced_configurations',
+        'question_id': 'add_advanced_configurations',
         'tags': []
     },
     ]
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Graph model of the ingestion data.
+
+Turns the source records (templates, sections, questions, options) into the
+nodes and relationships written to Neo4j. Every node and relationship carries
+a `content_hash` so loaders can tell what changed since the last run.
+"""
+import hashlib
+import json
+
+# Properties identifying a node of each label.
+NODE_KEYS = {
+    "Template": ("template_name",),
+    "Section": ("id",),
+    "Question": ("id",),
+    "Option": ("question_id", "text"),
+    "Tag": ("name",),
+}
+
+# Order in which labels are written, endpoints before the edges using them.
+NODE_LABELS = ("Section", "Question", "Option", "Tag", "Template")
+
+# Every (start_label, type, end_label) relationship group of the questionnaire.
+EDGE_GROUPS = (
+    ("Template", "HAS_TAG", "Tag"),
+    ("Tag", "RECOMMENDS", "Template"),
+    ("Section", "HAS_QUESTION", "Question"),
+    ("Option", "LEADS_TO", "Question"),
+    ("Question", "HAS_OPTION", "Option"),
+    ("Option", "HAS_TAG", "Tag"),
+)
+
+QUESTION_EXCLUDED_FIELDS = ("depends_on", "value")
+OPTION_EXCLUDED_FIELDS = ("applicable_languages", "applicable_project_types")
+
+
+def content_hash(data: dict) -> str:
+    """
+    Hash a record independently of its key order.
+
+    Args:
+        data (dict): The record to hash.
+
+    Returns:
+        str: The SHA-256 hex digest of the canonical JSON form of the record.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def node_key(label: str, properties: dict) -> tuple:
+    """
+    Get the identifying key of a node.
+    """
+    return tuple(properties.get(field) for field in NODE_KEYS[label])
+
+
+def _node(properties: dict) -> dict:
+    # Neo4j does not store null properties, leave them out of the hash too.
+    properties = {k: v for k, v in properties.items() if v is not None}
+    properties["content_hash"] = content_hash(properties)
+    return properties
+
+
+def _edge(start_label: str, start: dict, relation_type: str, end_label: str, end: dict) -> tuple:
+    group = (start_label, relation_type, end_label)
+    row = {
+        "start": start,
+        "end": end,
+        "properties": {"content_hash": content_hash([group, start, end])},
+    }
+    return group, row
+
+
+def edge_key(group: tuple, row: dict) -> tuple:
+    """
+    Get the identifying key of a relationship within its (start, type, end) group.
+    """
+    start_label, _, end_label = group
+    return node_key(start_label, row["start"]), node_key(end_label, row["end"])
+
+
+def section_node(section: dict) -> dict:
+    return _node(dict(section))
+
+
+def question_node(question: dict) -> dict:
+    return _node({k: v for k, v in question.items() if k not in QUESTION_EXCLUDED_FIELDS})
+
+
+def option_node(option: dict) -> dict:
+    return _node({k: v for k, v in option.items() if k not in OPTION_EXCLUDED_FIELDS})
+
+
+def tag_node(name: str) -> dict:
+    return _node({"name": name})
+
+
+def template_node(template: dict) -> dict:
+    """
+    Build a Template node. The `tid` is added once the Mongo document exists
+    and is not part of the hash.
+    """
+    return _node({k: v for k, v in template.items() if k not in ("_id", "tid")})
+
+
+def template_edges(template: dict) -> list:
+    name = {"template_name": template.get("template_name")}
+    edges = []
+    for tag in template.get("template_tags", []):
+        edges.append(_edge("Template", name, "HAS_TAG", "Tag", {"name": tag}))
+        edges.append(_edge("Tag", {"name": tag}, "RECOMMENDS", "Template", name))
+    return edges
+
+
+def question_edges(question: dict) -> list:
+    end = {"id": question.get("id")}
+    edges = [_edge("Section", {"id": question.get("section_id")}, "HAS_QUESTION", "Question", end)]
+    depends_on = question.get("depends_on", None)
+    if depends_on:
+        for option in question.get("value", []):
+            start = {"question_id": depends_on, "text": option}
+            edges.append(_edge("Option", start, "LEADS_TO", "Question", end))
+    return edges
+
+
+def option_edges(option: dict) -> list:
+    node = {"question_id": option.get("question_id"), "text": option.get("text")}
+    edges = [_edge("Question", {"id": option.get("question_id")}, "HAS_OPTION", "Option", node)]
+    for tag in option.get("tags", []):
+        edges.append(_edge("Option", node, "HAS_TAG", "Tag", {"name": tag}))
+    return edges
+
+
+def build_graph(templates: list, sections: list, questions: list, options: list) -> tuple:
+    """
+    Build every node and relationship of the ingestion data.
+
+    Args:
+        templates (list): The public templates.
+        sections (list): The questionnaire sections.
+        questions (list): The questions, with their `depends_on`/`value` LEADS_TO links.
+        options (list): The options of the questions.
+
+    Returns:
+        tuple: The nodes as {label: {key: properties}} and the relationships
+            as {(start_label, type, end_label): {key: row}}.
+    """
+    nodes = {label: {} for label in NODE_LABELS}
+    edges = {group: {} for group in EDGE_GROUPS}
+
+    def add_node(label, properties):
+        nodes[label][node_key(label, properties)] = properties
+
+    def add_edges(new_edges):
+        for group, row in new_edges:
+            edges[group][edge_key(group, row)] = row
+
+    for template in templates:
+        add_node("Template", template_node(template))
+        add_edges(template_edges(template))
+        for tag in template.get("template_tags", []):
+            add_node("Tag", tag_node(tag))
+    for section in sections:
+        add_node("Section", section_node(section))
+    for question in questions:
+        add_node("Question", question_node(question))
+        add_edges(question_edges(question))
+    for option in options:
+        add_node("Option", option_node(option))
+        add_edges(option_edges(option))
+        for tag in option.get("tags", []):
+            add_node("Tag", tag_node(tag))
+
+    return nodes, edges
@@ -0,0 +1,225 @@
+"""
+Incremental ingestion.
+
+Compares the content hashes of the source entities with the ones stored on
+the Neo4j nodes/relationships and the Mongo template documents, and applies
+only the inserts, updates and deletes, in batched transactions.
+
+Only entities carrying a `content_hash` are managed: templates created
+through the API are never deleted by an ingestion run.
+"""
+import time
+
+from src.db.ingestion.graph import NODE_KEYS, NODE_LABELS, build_graph, content_hash
+
+
+def diff_hashes(source: dict, existing: dict) -> dict:
+    """
+    Compute the changes to apply to go from `existing` to `source`.
+
+    Args:
+        source (dict): The source records, by key. Each carries its `content_hash`.
+        existing (dict): The stored content hashes, by key.
+
+    Returns:
+        dict: The `inserts`, `updates` and `deletes` keys.
+    """
+    inserts, updates = [], []
+    for key, record in source.items():
+        if key not in existing:
+            inserts.append(key)
+        elif existing[key] != record["content_hash"]:
+            updates.append(key)
+    deletes = [key for key in existing if key not in source]
+    return {"inserts": inserts, "updates": updates, "deletes": deletes}
+
+
+class IncrementalIngestion:
+    """
+    Class to plan and apply a diff-based ingestion.
+    """
+
+    def __init__(self, mongo, neo4j, batch_size: int = 1000):
+        self.mongo = mongo
+        self.neo4j = neo4j
+        self.batch_size = batch_size
+        self.timings = {}
+
+    def _timed(self, phase: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+        return result
+
+    def plan(self, templates: list, sections: list, questions: list, options: list) -> dict:
+        """
+        Build the ingestion plan from the source records.
+
+        Returns:
+            dict: The source graph and the changes per templates collection,
+                node label and relationship group.
+        """
+        nodes, edges = self._timed(
+            "build graph", build_graph, templates, sections, questions, options
+        )
+
+        documents = {}
+        for template in templates:
+            document = {k: v for k, v in template.items() if k not in ("_id", "tid")}
+            document["content_hash"] = content_hash(document)
+            documents[template["template_name"]] = document
+
+        def plan_stored():
+            stored = self.mongo.read(
+                {"content_hash": {"$exists": True}, "is_private": False},
+                "templates",
+                many=True,
+                projection={"template_name": 1, "content_hash": 1},
+                limit=0,
+            ).get("result") or []
+            stored_templates = {doc["template_name"]: doc["content_hash"] for doc in stored}
+
+            node_changes = {}
+            for label in NODE_LABELS:
+                stored_nodes = self.neo4j.read_hashes(label, NODE_KEYS[label]).get("result") or {}
+                node_changes[label] = diff_hashes(nodes[label], stored_nodes)
+
+            edge_changes = {}
+            for group, rows in edges.items():
+                start_label, relation_type, end_label = group
+                stored_edges = self.neo4j.read_relationship_hashes(
+                    start_label, NODE_KEYS[start_label], relation_type,
+                    end_label, NODE_KEYS[end_label],
+                ).get("result") or {}
+                edge_changes[group] = diff_hashes(rows, stored_edges)
+
+            return diff_hashes(documents, stored_templates), node_changes, edge_changes
+
+        template_changes, node_changes, edge_changes = self._timed("read hashes", plan_stored)
+
+        return {
+            "documents": documents,
+            "nodes": nodes,
+            "edges": edges,
+            "templates": template_changes,
+            "node_changes": node_changes,
+            "edge_changes": edge_changes,
+        }
+
+    @staticmethod
+    def print_plan(plan: dict):
+        """
+        Print the number of inserts, updates and deletes per entity.
+        """
+        def line(name, changes):
+            print(
+                f"  {name:<40} +{len(changes['inserts']):<6} "
+                f"~{len(changes['updates']):<6} -{len(changes['deletes'])}"
+            )
+
+        print("Ingestion plan (+insert ~update -delete):")
+        line("templates (mongo)", plan["templates"])
+        for label, changes in plan["node_changes"].items():
+            line(f"(:{label})", changes)
+        for (start_label, relation_type, end_label), changes in plan["edge_changes"].items():
+            line(f"(:{start_label})-[:{relation_type}]->(:{end_label})", changes)
+
+    def apply(self, plan: dict):
+        """
+        Apply an ingestion plan.
+
+        Mongo templates are written first so their `tid` can be set on the
+        Template nodes. Stale relationships and nodes are deleted before the
+        nodes and then the relationships are written.
+        """
+        self._timed("mongo templates", self._apply_templates, plan)
+
+        # Template nodes carry the Mongo id of their document as `tid`.
+        changed = plan["node_changes"]["Template"]
+        names = [key[0] for key in changed["inserts"] + changed["updates"]]
+        if names:
+            stored = self.mongo.read(
+                {"template_name": {"$in": names}, "is_private": False},
+                "templates",
+                many=True,
+                projection={"template_name": 1},
+                limit=0,
+            ).get("result") or []
+            for doc in stored:
+                node = plan["nodes"]["Template"].get((doc["template_name"],))
+                if node is not None:
+                    node["tid"] = str(doc["_id"])
+
+        for group, changes in plan["edge_changes"].items():
+            if changes["deletes"]:
+                start_label, relation_type, end_label = group
+                self._timed(
+                    f"delete {relation_type}",
+                    self.neo4j.delete_relationships,
+                    start_label, NODE_KEYS[start_label], relation_type,
+                    end_label, NODE_KEYS[end_label],
+                    changes["deletes"], batch_size=self.batch_size,
+                )
+
+        for label, changes in plan["node_changes"].items():
+            if changes["deletes"]:
+                self._timed(
+                    f"delete {label}",
+                    self.neo4j.delete_nodes,
+                    label, NODE_KEYS[label], changes["deletes"], batch_size=self.batch_size,
+                )
+
+        for label, changes in plan["node_changes"].items():
+            rows = [plan["nodes"][label][key] for key in changes["inserts"] + changes["updates"]]
+            if rows:
+                self._timed(
+                    f"write {label}",
+                    self.neo4j.merge_nodes,
+                    label, NODE_KEYS[label], rows, batch_size=self.batch_size,
+                )
+
+        for group, changes in plan["edge_changes"].items():
+            rows = [plan["edges"][group][key] for key in changes["inserts"] + changes["updates"]]
+            if rows:
+                start_label, relation_type, end_label = group
+                self._timed(
+                    f"write {relation_type}",
+                    self.neo4j.merge_relationships,
+                    start_label, NODE_KEYS[start_label], relation_type,
+                    end_label, NODE_KEYS[end_label],
+                    rows, batch_size=self.batch_size,
+                )
+
+    def _apply_templates(self, plan: dict):
+        changes = plan["templates"]
+        documents = [plan["documents"][name] for name in changes["inserts"] + changes["updates"]]
+        if documents:
+            self.mongo.bulk_upsert(
+                documents, "templates", key="template_name", batch_size=self.batch_size
+            )
+        if changes["deletes"]:
+            self.mongo.delete(
+                {"template_name": {"$in": changes["deletes"]}, "content_hash": {"$exists": True}, "is_private": False},
+                "templates",
+                many=True,
+            )
+
+    def print_timings(self):
+        """
+        Print the time spent in each phase of the run.
+        """
+        print("Ingestion timings:")
+        for phase, seconds in self.timings.items():
+            print(f"  {phase:<40} {seconds:8.3f}s")
+        print(f"  {'total':<40} {sum(self.timings.values()):8.3f}s")
+
+    def run(self, templates: list, sections: list, questions: list, options: list, dry_run: bool = False) -> dict:
+        """
+        Plan, print and apply an incremental ingestion.
+        """
+        plan = self.plan(templates, sections, questions, options)
+        self.print_plan(plan)
+        if not dry_run:
+            self.apply(plan)
+        self.print_timings()
+        return plan
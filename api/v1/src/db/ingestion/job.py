@@ -1,184 +1,309 @@
+"""
+Ingestion job.
 
-from src.db.ingestion.data.templates import templates
+Fills MongoDB and Neo4j with the public templates and the questionnaire.
 
-from src.db.ingestion.data.sections import sections
+Usage:
+    python -m src.db.ingestion.job [--mode full|incremental|stream|staged] [--source DIR]
+                                   [--batch-size N] [--workers N] [--dry-run] [--write-source DIR]
+                                   [--strict] [--skip-validation]
 
-from src.db.ingestion.data.questions import questions
+The `full` mode wipes the graph and the templates collection and reloads
+everything. The `incremental` mode only applies what changed since the
+last run. The `stream` mode loads the source batch by batch through bulk
+writes, with a flat memory use. The `staged` mode loads the node labels in
+parallel, then each relationship type once its endpoints are loaded.
 
-from src.db.ingestion.data.options import options
+The data comes from the Python modules under `data/`, or from the
+`<kind>.jsonl`/`<kind>.yaml` files of `--source`.
+
+The questionnaire is validated before the load (`src.db.ingestion.validation`):
+a questionnaire with errors (e.g. a LEADS_TO cycle, a `depends_on` on an
+unknown question) is rejected, and `--strict` rejects its warnings too.
+After the load, its topological order and reachability index are stored in
+the `QuestionnaireIndex` node (deleted by `--skip-validation`).
+
+Every mode ends by creating the indexes of `src.db.indexes`.
+"""
+import argparse
+
+from src.db.indexes import ensure_indexes
+
+from src.db.ingestion.incremental import IncrementalIngestion
+
+from src.db.ingestion.pipeline import StagedIngestion
+
+from src.db.ingestion.sources import FileSource, ModuleSource, dump_source
+
+from src.db.ingestion.streaming import StreamingIngestion
+
+from src.db.ingestion.validation import QuestionnaireGraphError, delete_index, store_index, validate_source
 
 from src.services.templates_service import TemplateService
 
 from src.dependencies import get_mongo_db, get_neo4j_db
 
-mongo = get_mongo_db()
 
-neo4j = get_neo4j_db()
+def run_full(mongo, neo4j, source):
 
-# Instantiate the TemplateService class
+    # Instantiate the TemplateService class
 
-template_service = TemplateService(mongo, neo4j)
+    template_service = TemplateService(mongo, neo4j)
 
-# Clear the Neo4j database
+    # Clear the Neo4j database, in batches (re-run the job to resume an interrupted drop)
 
-neo4j.drop()
+    neo4j.drop(
+        on_progress=lambda label, deleted, total: print(
+            f"Dropping {label} nodes: {deleted}/{total}"
+        )
+    )
 
-# Clear the MongoDB collection templates
+    # Clear the MongoDB collection templates
 
-mongo.drop_collection("templates")
+    mongo.drop_collection("templates")
 
-# Create a Mongo unique index on the `template_name` field
+    # Create a Mongo unique index on the `template_name` field
 
-#mongo.create_index("templates", "template_name", unique=True)
+    #mongo.create_index("templates", "template_name", unique=True)
 
-#Create a Neo4j unique index on the `template_name` field
+    #Create a Neo4j unique index on the `template_name` field
 
-#neo4j.create_index("Template", "template_name")
+    #neo4j.create_index("Template", "template_name")
 
-# Create the public templates
+    # Create the public templates
 
-for template in templates:
+    for template in source.templates():
 
-    template_service.create_template(template)
+        template_service.create_template(template)
 
-    for tag in template.get('template_tags', []):
+        for tag in template.get('template_tags', []):
 
-        neo4j.create(tx_type="relationship",
+            neo4j.create(tx_type="relationship",
 
-                     start_node_label="Template",
+                         start_node_label="Template",
 
-                     start_node_properties={"template_name": template.get('template_name')},
+                         start_node_properties={"template_name": template.get('template_name')},
 
-                     end_node_label="Tag",
+                         end_node_label="Tag",
 
-                     end_node_properties={"name": tag},
+                         end_node_properties={"name": tag},
 
-                     relation_type="HAS_TAG")
+                         relation_type="HAS_TAG")
 
-        neo4j.create(tx_type="relationship",
+            neo4j.create(tx_type="relationship",
 
-                     start_node_label="Tag",
+                         start_node_label="Tag",
 
-                     start_node_properties={"name": tag},
+                         start_node_properties={"name": tag},
 
-                     end_node_label="Template",
+                         end_node_label="Template",
 
-                     end_node_properties={"template_name": template.get("template_name")},
+                         end_node_properties={"template_name": template.get("template_name")},
 
-                     relation_type="RECOMMENDS")
+                         relation_type="RECOMMENDS")
 
-# Insert the sections
+    # Insert the sections
 
-for section in sections:
+    for section in source.sections():
 
-     neo4j.create(
+        neo4j.create(
 
-        tx_type="node",  # transaction function  
+            tx_type="node",  # transaction function
 
-        node_label="Section", # resource (node label),
+            node_label="Section", # resource (node label),
 
-        properties=section,  # unpacked section data as kwargs
+            properties=section,  # unpacked section data as kwargs
 
-        identifier="id"
+            identifier="id"
 
-    )
+        )
 
-# Insert the questions
+    # Insert the questions
 
-for question in questions:
+    for question in source.questions():
 
-    neo4j.create(
+        neo4j.create(
 
-        tx_type="node",  # transaction function  
+            tx_type="node",  # transaction function
 
-        node_label="Question",  # identifier field
+            node_label="Question",  # identifier field
 
-        properties={k: v for k, v in question.items() if k not in ['depends_on', 'value']},
+            properties={k: v for k, v in question.items() if k not in ['depends_on', 'value']},
 
-        identifier="id"
+            identifier="id"
 
-    )
+        )
+
+        # Create the relationships between the questions and the options that LEADS_TO them
+
+        depends_on = question.get('depends_on', None)
+
+        if depends_on:
 
-    # Create the relationships between the questions and the options that LEADS_TO them
+            for option in question.get('value', []):
 
-    depends_on = question.get('depends_on', None)
+                start_node_properties = {"text": option, "question_id": depends_on}
 
-    if depends_on:
+                end_node_properties = {"id": question.get("id")}
 
-        for option in question.get('value', []):
+                neo4j.create(tx_type="relationship",
 
-            start_node_properties = {"text": option, "question_id": depends_on}
+                          start_node_label="Option",
 
-            end_node_properties = {"id": question.get("id")}
+                          start_node_properties=start_node_properties,
+
+                          end_node_label="Question",
+
+                          end_node_properties=end_node_properties,
+
+                          relation_type="LEADS_TO")
+
+        # Create the relationships between the sections and the questions
+
+        neo4j.create(tx_type="relationship",
+
+                  start_node_label="Section",
+
+                  start_node_properties={"id": question.get("section_id")},
+
+                  end_node_label="Question",
+
+                  end_node_properties={"id":question.get("id")},
+
+                  relation_type="HAS_QUESTION")
+
+    # Insert the options
+
+    for option in source.options():
+
+        neo4j.create(
+
+            tx_type="node",  # transaction function
+
+            node_label="Option", # resource (node label),
+
+            properties={k: v for k, v in option.items() if k not in ['applicable_languages', 'applicable_project_types']},  # unpacked section data as kwargs
+
+            identifier="text"
+
+        )
+
+        # Create the relationships between the options and the tags
+
+        for tag in option.get('tags', []):
 
             neo4j.create(tx_type="relationship",
 
                       start_node_label="Option",
 
-                      start_node_properties=start_node_properties,
+                      start_node_properties={"text": option.get('text')},
 
-                      end_node_label="Question",
+                      end_node_label="Tag",
 
-                      end_node_properties=end_node_properties,
+                      end_node_properties={"name": tag},
 
-                      relation_type="LEADS_TO")
+                      relation_type="HAS_TAG" )
 
-    # Create the relationships between the sections and the questions
+        # Create the relationships between the options and questions
 
-    neo4j.create(tx_type="relationship",
+        neo4j.create(tx_type="relationship",
 
-              start_node_label="Section",
+                  start_node_label="Question",
 
-              start_node_properties={"id": question.get("section_id")},
+                  start_node_properties={"id": option.get("question_id")},
 
-              end_node_label="Question",
+                  end_node_label="Option",
 
-              end_node_properties={"id":question.get("id")},
+                  end_node_properties={"text": option.get("text")},
 
-              relation_type="HAS_QUESTION")
+                  relation_type="HAS_OPTION" )
 
-# Insert the options
 
-for option in options:
+def run_incremental(mongo, neo4j, source, batch_size=1000, dry_run=False):
 
-    neo4j.create(
+    # Print the plan, apply only the changed entities, then print the timings.
+    # The diff needs every key of the source, so the records are materialized.
 
-        tx_type="node",  # transaction function  
+    ingestion = IncrementalIngestion(mongo, neo4j, batch_size=batch_size)
 
-        node_label="Option", # resource (node label),
+    ingestion.run(
+        list(source.templates()),
+        list(source.sections()),
+        list(source.questions()),
+        list(source.options()),
+        dry_run=dry_run,
+    )
 
-        properties={k: v for k, v in option.items() if k not in ['applicable_languages', 'applicable_project_types']},  # unpacked section data as kwargs
 
-        identifier="text"
+def run_stream(mongo, neo4j, source, batch_size=1000):
 
-    )  
+    # Load the nodes then the relationships, one batch in memory at a time
 
-    # Create the relationships between the options and the tags
+    StreamingIngestion(mongo, neo4j, batch_size=batch_size).run(source)
 
-    for tag in option.get('tags', []):
 
-        neo4j.create(tx_type="relationship",
+def run_staged(mongo, neo4j, source, batch_size=1000, workers=4):
+
+    # Load the node labels concurrently, then the relationships whose endpoints are loaded
+
+    StagedIngestion(mongo, neo4j, batch_size=batch_size, workers=workers).run(source)
+
 
-                  start_node_label="Option",
+def main():
+    parser = argparse.ArgumentParser(description="Fill the databases with the ingestion data.")
+    parser.add_argument("--mode", choices=["full", "incremental", "stream", "staged"], default="full")
+    parser.add_argument("--source", help="Directory of JSONL/YAML source files.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4, help="Writer threads per stage (staged mode).")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the incremental plan.")
+    parser.add_argument("--write-source", help="Write the source as JSONL files to this directory and exit.")
+    parser.add_argument("--strict", action="store_true", help="Reject the questionnaire warnings too.")
+    parser.add_argument("--skip-validation", action="store_true",
+                        help="Load without validating the questionnaire (the stored index is deleted).")
+    args = parser.parse_args()
+    if args.dry_run and args.mode != "incremental":
+        parser.error("--dry-run only applies to --mode incremental")
 
-                  start_node_properties={"text": option.get('text')},
+    source = FileSource(args.source) if args.source else ModuleSource()
 
-                  end_node_label="Tag",
+    if args.write_source:
+        print(dump_source(source, args.write_source))
+        return
 
-                  end_node_properties={"name": tag},
+    report = None
+    if not args.skip_validation:
+        try:
+            report = validate_source(source, strict=args.strict)
+        except QuestionnaireGraphError as error:
+            raise SystemExit("Invalid questionnaire:\n  " + "\n  ".join(error.problems))
+        for warning in report["warnings"]:
+            print(f"Warning: {warning}")
 
-                  relation_type="HAS_TAG" )
+    mongo = get_mongo_db()
 
-    # Create the relationships between the options and questions
+    neo4j = get_neo4j_db()
 
-    neo4j.create(tx_type="relationship",
+    if args.mode == "incremental":
+        run_incremental(mongo, neo4j, source, batch_size=args.batch_size, dry_run=args.dry_run)
+        if args.dry_run:
+            return
+    elif args.mode == "stream":
+        run_stream(mongo, neo4j, source, batch_size=args.batch_size)
+    elif args.mode == "staged":
+        run_staged(mongo, neo4j, source, batch_size=args.batch_size, workers=args.workers)
+    else:
+        run_full(mongo, neo4j, source)
 
-              start_node_label="Question",
+    if report is not None:
+        store_index(neo4j, report["index"])
+    else:
+        # the previous index may not match what was loaded
+        delete_index(neo4j)
 
-              start_node_properties={"id": option.get("question_id")},
+    # After the load: the full mode drops the templates collection and its indexes
 
-              end_node_label="Option",
+    ensure_indexes(mongo, neo4j)
 
-              end_node_properties={"text": option.get("text")},
 
-              relation_type="HAS_OPTION" )
\ No newline at end of file
+if __name__ == "__main__":
+    main()
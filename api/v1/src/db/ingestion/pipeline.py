@@ -0,0 +1,172 @@
+"""
+Staged, parallel ingestion.
+
+Templates, sections, questions, options and tags are independent until
+their relationships are written, so each node label is loaded by its own
+stage, all stages running at the same time. A relationship stage starts as
+soon as the stages of both of its endpoint labels are complete.
+
+Within a stage, batches are written by a pool of `workers` threads, with at
+most two batches per worker in flight. Concurrent MERGEs on a shared node
+(e.g. a popular Tag) can deadlock; the driver retries those transactions.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.db.ingestion.graph import (
+    EDGE_GROUPS,
+    NODE_KEYS,
+    NODE_LABELS,
+    option_edges,
+    option_node,
+    question_edges,
+    question_node,
+    section_node,
+    tag_node,
+    template_edges,
+)
+from src.db.ingestion.sources import batched
+from src.db.ingestion.streaming import upsert_templates
+
+# Source kind the relationships of each group are built from.
+EDGE_SOURCES = {
+    ("Template", "HAS_TAG", "Tag"): ("templates", template_edges),
+    ("Tag", "RECOMMENDS", "Template"): ("templates", template_edges),
+    ("Section", "HAS_QUESTION", "Question"): ("questions", question_edges),
+    ("Option", "LEADS_TO", "Question"): ("questions", question_edges),
+    ("Question", "HAS_OPTION", "Option"): ("options", option_edges),
+    ("Option", "HAS_TAG", "Tag"): ("options", option_edges),
+}
+
+
+class StagedIngestion:
+    """
+    Class to load an ingestion source with dependency-aware parallel stages.
+    """
+
+    def __init__(self, mongo, neo4j, batch_size: int = 1000, workers: int = 4):
+        self.mongo = mongo
+        self.neo4j = neo4j
+        self.batch_size = batch_size
+        self.workers = workers
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _run_stage(self, name: str, batches, write):
+        """
+        Write the batches of a stage on a pool of workers.
+
+        Args:
+            name (str): The stage name.
+            batches (Iterable[list]): The batches of rows.
+            write (Callable): Writes a batch and returns the number of records written.
+        """
+        start = time.perf_counter()
+        count = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name) as pool:
+            pending = set()
+            for batch in batches:
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    count += sum(future.result() for future in done)
+                pending.add(pool.submit(write, batch))
+            count += sum(future.result() for future in wait(pending).done)
+        with self._lock:
+            self.stages[name] = {"records": count, "seconds": time.perf_counter() - start}
+
+    def _node_batches(self, source, label: str):
+        if label == "Section":
+            rows = (section_node(section) for section in source.sections())
+        elif label == "Question":
+            rows = (question_node(question) for question in source.questions())
+        elif label == "Option":
+            rows = (option_node(option) for option in source.options())
+        elif label == "Tag":
+            # Tags are only known from the records using them: the (small) tag
+            # vocabulary is collected before being written.
+            tags = {tag for template in source.templates() for tag in template.get("template_tags", [])}
+            tags.update(tag for option in source.options() for tag in option.get("tags", []))
+            rows = (tag_node(tag) for tag in sorted(tags))
+        else:
+            rows = source.templates()
+        # Generator: the source is only read once the stage runs, in its own thread.
+        yield from batched(rows, self.batch_size)
+
+    def _node_writer(self, label: str):
+        def write(batch):
+            if label == "Template":
+                batch = upsert_templates(self.mongo, batch, batch_size=self.batch_size)
+            self.neo4j.merge_nodes(label, NODE_KEYS[label], batch, batch_size=self.batch_size)
+            return len(batch)
+        return write
+
+    def _edge_batches(self, source, group: tuple):
+        kind, build_edges = EDGE_SOURCES[group]
+        rows = (
+            row
+            for record in getattr(source, kind)()
+            for edge_group, row in build_edges(record)
+            if edge_group == group
+        )
+        yield from batched(rows, self.batch_size)
+
+    def _edge_writer(self, group: tuple):
+        start_label, relation_type, end_label = group
+
+        def write(batch):
+            self.neo4j.merge_relationships(
+                start_label, NODE_KEYS[start_label], relation_type,
+                end_label, NODE_KEYS[end_label],
+                batch, batch_size=self.batch_size,
+            )
+            return len(batch)
+        return write
+
+    def run(self, source) -> dict:
+        """
+        Load a source: every node label in parallel, then each relationship
+        group once both of its endpoint labels are loaded.
+
+        Returns:
+            dict: The records written and the time spent per stage.
+        """
+        start = time.perf_counter()
+        stage_count = len(NODE_LABELS) + len(EDGE_GROUPS)
+        with ThreadPoolExecutor(max_workers=stage_count, thread_name_prefix="stage") as stages:
+            running = {}
+            for label in NODE_LABELS:
+                future = stages.submit(
+                    self._run_stage, f"(:{label})",
+                    self._node_batches(source, label), self._node_writer(label),
+                )
+                running[future] = label
+
+            loaded, waiting = set(), list(EDGE_GROUPS)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    stage = running.pop(future)
+                    if stage in NODE_LABELS:
+                        loaded.add(stage)
+                for group in [g for g in waiting if g[0] in loaded and g[2] in loaded]:
+                    waiting.remove(group)
+                    future = stages.submit(
+                        self._run_stage, f"(:{group[0]})-[:{group[1]}]->(:{group[2]})",
+                        self._edge_batches(source, group), self._edge_writer(group),
+                    )
+                    running[future] = group
+
+        self.print_summary(time.perf_counter() - start)
+        return self.stages
+
+    def print_summary(self, elapsed: float):
+        """
+        Print the throughput of each stage.
+        """
+        print(f"Staged ingestion ({self.workers} workers per stage, batches of {self.batch_size}):")
+        for name, stage in self.stages.items():
+            rate = stage["records"] / stage["seconds"] if stage["seconds"] else 0.0
+            print(f"  {name:<40} {stage['records']:>10} {stage['seconds']:8.3f}s {rate:10.0f}/s")
+        print(f"  {'wall time':<40} {sum(s['records'] for s in self.stages.values()):>10} {elapsed:8.3f}s")
@@ -0,0 +1,263 @@
+"""
+Graph snapshots.
+
+Exports the questionnaire and catalog (the `templates` collection, the
+Section/Question/Option/Tag/Template nodes and their relationships) to a
+compact snapshot file, and reloads it with bulk UNWIND writes.
+
+Usage:
+    python -m src.db.ingestion.snapshot export PATH [--chunk-size N]
+    python -m src.db.ingestion.snapshot import PATH [--batch-size N] [--drop]
+
+A snapshot is a gzip-compressed stream of msgpack objects: a header, then
+columnar chunks of at most `chunk_size` rows (documents, then nodes, then
+relationships, so a sequential import always finds the endpoints of a
+relationship), then a footer with the counts. A chunk lists, per column, the
+rows without that key, so a missing key and a None value both round-trip. Both directions stream: a
+single chunk is held in memory at a time.
+"""
+import argparse
+import datetime
+import gzip
+import time
+from typing import Iterator, List, Optional
+
+import msgpack
+from bson.objectid import ObjectId
+
+from src.db.ingestion.graph import EDGE_GROUPS, NODE_KEYS, NODE_LABELS
+from src.db.ingestion.sources import batched
+from src.dependencies import get_mongo_db, get_neo4j_db
+
+FORMAT = "gocod-snapshot"
+VERSION = 2
+# version 1 chunks have no `missing` rows: their None values are dropped
+SUPPORTED_VERSIONS = (1, 2)
+OBJECT_ID_EXT = 1
+COLLECTIONS = ("templates",)
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(OBJECT_ID_EXT, obj.binary)
+    if isinstance(obj, datetime.datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=datetime.timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} in a snapshot")
+
+
+def _ext_hook(code, data):
+    if code == OBJECT_ID_EXT:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+def to_columns(rows: List[dict]) -> tuple:
+    """
+    Turn rows into (columns, values per column, missing rows per column).
+
+    A missing value is None in its column, and its row index is in the
+    missing rows of the column.
+    """
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    data = [[row.get(column) for row in rows] for column in columns]
+    missing = [[index for index, row in enumerate(rows) if column not in row] for column in columns]
+    return columns, data, missing
+
+
+def from_columns(columns: List[str], data: List[list], missing: Optional[List[list]] = None) -> List[dict]:
+    """
+    Turn (columns, values per column, missing rows per column) back into rows.
+
+    Without the missing rows (a version 1 chunk), the None values are dropped.
+    """
+    rows = [{} for _ in data[0]] if data else []
+    for index, column in enumerate(columns):
+        absent = set(missing[index]) if missing is not None else None
+        for row_index, value in enumerate(data[index]):
+            if absent is None:
+                if value is not None:
+                    rows[row_index][column] = value
+            elif row_index not in absent:
+                rows[row_index][column] = value
+    return rows
+
+
+def write_snapshot(path: str, chunks: Iterator[dict]) -> dict:
+    """
+    Write a header, the chunks and a footer to a snapshot file.
+
+    Returns:
+        dict: The number of rows written per chunk name.
+    """
+    counts = {}
+    packer = msgpack.Packer(default=_default)
+    with gzip.open(path, "wb") as file:
+        file.write(packer.pack({
+            "format": FORMAT,
+            "version": VERSION,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }))
+        for chunk in chunks:
+            rows = len(chunk["data"][0]) if chunk["data"] else 0
+            counts[chunk["name"]] = counts.get(chunk["name"], 0) + rows
+            file.write(packer.pack(chunk))
+        file.write(packer.pack({"type": "end", "counts": counts}))
+    return counts
+
+
+def read_snapshot(path: str) -> Iterator[dict]:
+    """
+    Yield the chunks of a snapshot file.
+
+    Raises:
+        ValueError: If the file is not a snapshot of a supported version, or is truncated.
+    """
+    with gzip.open(path, "rb") as file:
+        unpacker = msgpack.Unpacker(file, ext_hook=_ext_hook, timestamp=3, raw=False)
+        header = next(unpacker, None)
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a {FORMAT} file")
+        if header.get("version") not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported snapshot version {header.get('version')}")
+        for chunk in unpacker:
+            if chunk.get("type") == "end":
+                return
+            yield chunk
+    raise ValueError(f"{path} is truncated")
+
+
+def _chunk(chunk_type: str, name: str, rows: List[dict], **extra) -> dict:
+    columns, data, missing = to_columns(rows)
+    return {"type": chunk_type, "name": name, "columns": columns, "data": data, "missing": missing, **extra}
+
+
+def iter_chunks(mongo, neo4j, chunk_size: int = 10000) -> Iterator[dict]:
+    """
+    Yield the snapshot chunks of the databases: documents, nodes, then relationships.
+    """
+    for collection in COLLECTIONS:
+        cursor = mongo.db[collection].find({}).batch_size(chunk_size)
+        for rows in batched(cursor, chunk_size):
+            yield _chunk("documents", collection, rows, collection=collection)
+
+    for label in NODE_LABELS:
+        records = neo4j.stream(f"MATCH (n:{label}) RETURN properties(n) AS properties")
+        for rows in batched((record["properties"] for record in records), chunk_size):
+            yield _chunk("nodes", f"(:{label})", rows, label=label)
+
+    for group in EDGE_GROUPS:
+        start_label, relation_type, end_label = group
+        start_keys = ", ".join(f".{field}" for field in NODE_KEYS[start_label])
+        end_keys = ", ".join(f".{field}" for field in NODE_KEYS[end_label])
+        records = neo4j.stream(
+            f"MATCH (a:{start_label})-[r:{relation_type}]->(b:{end_label}) "
+            f"RETURN a{{{start_keys}}} AS start, b{{{end_keys}}} AS end, properties(r) AS properties"
+        )
+        flat = (
+            {
+                **{f"start.{k}": v for k, v in record["start"].items()},
+                **{f"end.{k}": v for k, v in record["end"].items()},
+                **record["properties"],
+            }
+            for record in records
+        )
+        for rows in batched(flat, chunk_size):
+            yield _chunk("edges", f"(:{start_label})-[:{relation_type}]->(:{end_label})", rows, group=list(group))
+
+
+def export_snapshot(mongo, neo4j, path: str, chunk_size: int = 10000) -> dict:
+    """
+    Export the questionnaire and catalog to a snapshot file.
+
+    Returns:
+        dict: The number of rows exported per chunk name.
+    """
+    return write_snapshot(path, iter_chunks(mongo, neo4j, chunk_size=chunk_size))
+
+
+def _edge_row(row: dict) -> dict:
+    edge = {"start": {}, "end": {}, "properties": {}}
+    for column, value in row.items():
+        side, _, field = column.partition(".")
+        if field and side in ("start", "end"):
+            edge[side][field] = value
+        else:
+            edge["properties"][column] = value
+    return edge
+
+
+def import_snapshot(mongo, neo4j, path: str, batch_size: int = 1000, drop: bool = False) -> dict:
+    """
+    Load a snapshot file with bulk writes.
+
+    Args:
+        path (str): The snapshot file.
+        batch_size (int): Number of rows per transaction.
+        drop (bool): Whether to wipe the snapshot labels and collections first.
+
+    Returns:
+        dict: The number of rows imported per chunk name.
+    """
+    if drop:
+        neo4j.drop(label=list(NODE_LABELS))
+        for collection in COLLECTIONS:
+            mongo.drop_collection(collection)
+
+    # MERGE on the node keys needs an index to stay linear.
+    for label in NODE_LABELS:
+        neo4j.ensure_index(label, NODE_KEYS[label])
+
+    counts = {}
+    for chunk in read_snapshot(path):
+        rows = from_columns(chunk["columns"], chunk["data"], chunk.get("missing"))
+        if chunk["type"] == "documents":
+            mongo.bulk_upsert(rows, chunk["collection"], key="_id", batch_size=batch_size)
+        elif chunk["type"] == "nodes":
+            label = chunk["label"]
+            neo4j.merge_nodes(label, NODE_KEYS[label], rows, batch_size=batch_size)
+        elif chunk["type"] == "edges":
+            start_label, relation_type, end_label = chunk["group"]
+            neo4j.merge_relationships(
+                start_label, NODE_KEYS[start_label], relation_type,
+                end_label, NODE_KEYS[end_label],
+                [_edge_row(row) for row in rows], batch_size=batch_size,
+            )
+        counts[chunk["name"]] = counts.get(chunk["name"], 0) + len(rows)
+    return counts
+
+
+def print_counts(title: str, counts: dict, elapsed: float):
+    print(title)
+    for name, count in counts.items():
+        print(f"  {name:<40} {count:>10}")
+    print(f"  {'total':<40} {sum(counts.values()):>10} in {elapsed:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a graph snapshot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the databases to a snapshot file.")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--chunk-size", type=int, default=10000)
+    import_parser = commands.add_parser("import", help="Load a snapshot file into the databases.")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--drop", action="store_true", help="Wipe the snapshot labels and collections first.")
+    args = parser.parse_args()
+
+    mongo = get_mongo_db()
+    neo4j = get_neo4j_db()
+    start = time.perf_counter()
+    if args.command == "export":
+        counts = export_snapshot(mongo, neo4j, args.path, chunk_size=args.chunk_size)
+        print_counts(f"Exported {args.path}:", counts, time.perf_counter() - start)
+    else:
+        counts = import_snapshot(mongo, neo4j, args.path, batch_size=args.batch_size, drop=args.drop)
+        print_counts(f"Imported {args.path}:", counts, time.perf_counter() - start)
+    neo4j.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Ingestion sources.
+
+A source gives the templates, sections, questions and options to ingest as
+iterators of validated records:
+
+- `ModuleSource` reads the Python modules under `db/ingestion/data/`.
+- `FileSource` streams JSONL or YAML files from a directory, one record per
+  line (JSONL) or per document (YAML `---` stream), so memory use does not
+  grow with the size of the catalog.
+
+Each record is validated against the pydantic model of its kind.
+"""
+import json
+import os
+from itertools import islice
+from typing import Iterable, Iterator
+
+from pydantic import ValidationError
+
+from src.models.option import Option
+from src.models.question import Question
+from src.models.section import Section
+from src.models.template import TemplateInsertFields
+
+KINDS = ("templates", "sections", "questions", "options")
+
+MODELS = {
+    "templates": TemplateInsertFields,
+    "sections": Section,
+    "questions": Question,
+    "options": Option,
+}
+
+EXTENSIONS = (".jsonl", ".yaml", ".yml")
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """
+    Split an iterable into lists of at most `size` items.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def validate_record(kind: str, record: dict, origin: str = "") -> dict:
+    """
+    Validate a record against the model of its kind.
+
+    Fields unknown to the model (e.g. `depends_on`, `tags`) are kept as is.
+
+    Raises:
+        ValueError: If the record does not match the model.
+    """
+    try:
+        validated = MODELS[kind].model_validate(record)
+    except ValidationError as e:
+        raise ValueError(f"Invalid {kind} record {origin}: {e}") from e
+    record.update(validated.model_dump(exclude_unset=True))
+    return record
+
+
+def iter_jsonl(path: str) -> Iterator[tuple]:
+    """
+    Stream the records of a JSONL file, with their line number.
+    """
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+def iter_yaml(path: str) -> Iterator[tuple]:
+    """
+    Stream the documents of a YAML file, with their position in the stream.
+    """
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError("PyYAML is required to read YAML ingestion sources") from e
+
+    with open(path, encoding="utf-8") as file:
+        for number, document in enumerate(yaml.safe_load_all(file), start=1):
+            if document is not None:
+                yield number, document
+
+
+def write_jsonl(path: str, records: Iterable[dict]) -> int:
+    """
+    Write records to a JSONL file, one per line.
+
+    Returns:
+        int: The number of records written.
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    return count
+
+
+class ModuleSource:
+    """
+    Source reading the Python data modules.
+    """
+
+    def _records(self, kind: str) -> Iterator[dict]:
+        if kind == "templates":
+            from src.db.ingestion.data.templates import templates as records
+        elif kind == "sections":
+            from src.db.ingestion.data.sections import sections as records
+        elif kind == "questions":
+            from src.db.ingestion.data.questions import questions as records
+        else:
+            from src.db.ingestion.data.options import options as records
+
+        for number, record in enumerate(records):
+            yield validate_record(kind, dict(record), f"{kind}[{number}]")
+
+    def templates(self) -> Iterator[dict]:
+        return self._records("templates")
+
+    def sections(self) -> Iterator[dict]:
+        return self._records("sections")
+
+    def questions(self) -> Iterator[dict]:
+        return self._records("questions")
+
+    def options(self) -> Iterator[dict]:
+        return self._records("options")
+
+
+class FileSource:
+    """
+    Source streaming `<kind>.jsonl` or `<kind>.yaml` files from a directory.
+
+    A missing file is an empty source.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, kind: str):
+        for extension in EXTENSIONS:
+            path = os.path.join(self.directory, f"{kind}{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _records(self, kind: str) -> Iterator[dict]:
+        path = self.path(kind)
+        if path is None:
+            return
+        reader = iter_jsonl if path.endswith(".jsonl") else iter_yaml
+        for number, record in reader(path):
+            yield validate_record(kind, record, f"{path}:{number}")
+
+    def templates(self) -> Iterator[dict]:
+        return self._records("templates")
+
+    def sections(self) -> Iterator[dict]:
+        return self._records("sections")
+
+    def questions(self) -> Iterator[dict]:
+        return self._records("questions")
+
+    def options(self) -> Iterator[dict]:
+        return self._records("options")
+
+
+def dump_source(source, directory: str) -> dict:
+    """
+    Write every record of a source as JSONL files readable by `FileSource`.
+
+    Returns:
+        dict: The number of records written per kind.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return {
+        kind: write_jsonl(os.path.join(directory, f"{kind}.jsonl"), getattr(source, kind)())
+        for kind in KINDS
+    }
@@ -0,0 +1,152 @@
+"""
+Streaming ingestion.
+
+Loads a source batch by batch through the bulk writers, without ever
+holding more than one batch of records in memory. Nodes are loaded in a
+first pass over the source and relationships in a second one, so every
+relationship finds both of its endpoints.
+
+Writes are MERGE-based: a load can be re-run on a populated graph.
+"""
+import time
+
+from src.db.ingestion.graph import (
+    NODE_KEYS,
+    content_hash,
+    option_edges,
+    option_node,
+    question_edges,
+    question_node,
+    section_node,
+    tag_node,
+    template_edges,
+    template_node,
+)
+from src.db.ingestion.sources import batched
+
+
+def upsert_templates(mongo, templates: list, batch_size: int = 1000) -> list:
+    """
+    Upsert template documents in Mongo, matched on `template_name`.
+
+    Args:
+        mongo (MongoDB): The Mongo database.
+        templates (list): The source templates.
+        batch_size (int): Number of documents per bulk write.
+
+    Returns:
+        list: The Template node of each template, with the `tid` of its document.
+    """
+    documents = []
+    for template in templates:
+        document = {k: v for k, v in template.items() if k not in ("_id", "tid")}
+        document["content_hash"] = content_hash(document)
+        documents.append(document)
+    mongo.bulk_upsert(documents, "templates", key="template_name", batch_size=batch_size)
+    stored = mongo.read(
+        {"template_name": {"$in": [doc["template_name"] for doc in documents]}, "is_private": False},
+        "templates",
+        many=True,
+        projection={"template_name": 1},
+        limit=0,
+    ).get("result") or []
+
+    tids = {doc["template_name"]: str(doc["_id"]) for doc in stored}
+    rows = []
+    for template in templates:
+        node = template_node(template)
+        node["tid"] = tids.get(template["template_name"])
+        rows.append(node)
+    return rows
+
+
+class StreamingIngestion:
+    """
+    Class to load an ingestion source with bulk writes.
+    """
+
+    def __init__(self, mongo, neo4j, batch_size: int = 1000):
+        self.mongo = mongo
+        self.neo4j = neo4j
+        self.batch_size = batch_size
+        self.counts = {}
+        self.timings = {}
+
+    def _count(self, name: str, count: int, seconds: float):
+        self.counts[name] = self.counts.get(name, 0) + count
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def _merge_nodes(self, label: str, rows: list):
+        start = time.perf_counter()
+        self.neo4j.merge_nodes(label, NODE_KEYS[label], rows, batch_size=self.batch_size)
+        self._count(f"(:{label})", len(rows), time.perf_counter() - start)
+
+    def _merge_edges(self, edges: list):
+        groups = {}
+        for group, row in edges:
+            groups.setdefault(group, []).append(row)
+        for (start_label, relation_type, end_label), rows in groups.items():
+            start = time.perf_counter()
+            self.neo4j.merge_relationships(
+                start_label, NODE_KEYS[start_label], relation_type,
+                end_label, NODE_KEYS[end_label],
+                rows, batch_size=self.batch_size,
+            )
+            self._count(f"[:{relation_type}]", len(rows), time.perf_counter() - start)
+
+    def _merge_tags(self, records: list, field: str):
+        tags = {tag for record in records for tag in record.get(field, [])}
+        if tags:
+            self._merge_nodes("Tag", [tag_node(tag) for tag in sorted(tags)])
+
+    def load_templates(self, templates):
+        """
+        Upsert the template documents in Mongo, then their Template nodes with their `tid`.
+        """
+        for batch in batched(templates, self.batch_size):
+            start = time.perf_counter()
+            rows = upsert_templates(self.mongo, batch, batch_size=self.batch_size)
+            self._count("templates (mongo)", len(rows), time.perf_counter() - start)
+            self._merge_nodes("Template", rows)
+            self._merge_tags(batch, "template_tags")
+
+    def load_nodes(self, source):
+        """
+        First pass: every node of the source.
+        """
+        self.load_templates(source.templates())
+        for batch in batched(source.sections(), self.batch_size):
+            self._merge_nodes("Section", [section_node(section) for section in batch])
+        for batch in batched(source.questions(), self.batch_size):
+            self._merge_nodes("Question", [question_node(question) for question in batch])
+        for batch in batched(source.options(), self.batch_size):
+            self._merge_nodes("Option", [option_node(option) for option in batch])
+            self._merge_tags(batch, "tags")
+
+    def load_edges(self, source):
+        """
+        Second pass: every relationship of the source.
+        """
+        for batch in batched(source.templates(), self.batch_size):
+            self._merge_edges([edge for template in batch for edge in template_edges(template)])
+        for batch in batched(source.questions(), self.batch_size):
+            self._merge_edges([edge for question in batch for edge in question_edges(question)])
+        for batch in batched(source.options(), self.batch_size):
+            self._merge_edges([edge for option in batch for edge in option_edges(option)])
+
+    def print_summary(self):
+        """
+        Print the number of records written and the time spent per entity.
+        """
+        print("Ingestion summary:")
+        for name, count in self.counts.items():
+            print(f"  {name:<40} {count:>10} {self.timings[name]:8.3f}s")
+        print(f"  {'total':<40} {sum(self.counts.values()):>10} {sum(self.timings.values()):8.3f}s")
+
+    def run(self, source):
+        """
+        Load every node, then every relationship of a source.
+        """
+        self.load_nodes(source)
+        self.load_edges(source)
+        self.print_summary()
@@ -0,0 +1,288 @@
+"""
+Synthetic catalogs.
+
+Generates a consistent catalog of any size, for scaling tests:
+
+- `templates`, `sections`, `questions` and `options` JSONL files, in the
+  ingestion source format (read them with `FileSource` / `--source`);
+- `users.jsonl`: users owning private templates, and `projects.jsonl`:
+  projects of these users, loaded with `load_accounts`.
+
+Template and option tags follow a Zipf distribution over the tag
+vocabulary, as in the real catalog a few tags (Python, API...) are on most
+templates. Each section is a tree of questions `depth` levels deep: every
+option of a question LEADS_TO a question of the next level, up to `width`
+questions per level. The output only depends on the parameters and `seed`.
+
+Usage:
+    python -m src.db.ingestion.synthetic DIR [--scale N] [--seed N]
+                                         [--templates N] [--users N] [--projects N] [--tags N]
+                                         [--sections N] [--depth N] [--width N] [--options N]
+    python -m src.db.ingestion.job --mode stream --source DIR
+    python -m src.db.ingestion.synthetic DIR --load-accounts
+"""
+import argparse
+import itertools
+import os
+import random
+from typing import Iterator, List
+
+from bson.objectid import ObjectId
+
+from src.db.ingestion.sources import batched, iter_jsonl, write_jsonl
+from src.models.project import ProjectInsertFields
+
+PROJECT_TYPES = ["Backend", "Frontend", "Full-Stack", "Data Science", "Mobile Application", "Library"]
+ARCHITECTURES = ["Monolithic", "Microservices", "Serverless"]
+ADMIN_ID = "653e4964f9e328a046420984"
+# The password of every synthetic user is "password".
+PASSWORD_HASH = "$2b$12$I0hSqWTwkI1dpsVdWXf7aukNg2xI68jzbCnKeaQOMtYfd05j4TvsO"
+
+# Size of the seed data (`db/ingestion/data`), the unit of `--scale`.
+BASE = {"templates": 19, "users": 1, "projects": 5, "tags": 60, "questions": 17}
+
+
+def scaled(scale: int) -> dict:
+    """
+    The generator parameters for `scale` times the size of the seed data.
+
+    Sections keep their number; the question trees get deeper and wider.
+    """
+    depth = 3 + len(str(scale))
+    return {
+        "templates": BASE["templates"] * scale,
+        "users": BASE["users"] * scale,
+        "projects": BASE["projects"] * scale,
+        "tags": BASE["tags"] * max(1, int(scale ** 0.5)),
+        "sections": 7,
+        "depth": depth,
+        "width": max(2, -(-BASE["questions"] * scale // (7 * depth))),
+        "options": len(PROJECT_TYPES),
+    }
+
+
+class ZipfSampler:
+    """
+    Class to draw distinct tags with a Zipf distribution over a vocabulary.
+    """
+
+    def __init__(self, vocabulary: List[str], rng: random.Random, exponent: float = 1.1):
+        self.vocabulary = vocabulary
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, len(vocabulary) + 1)))
+
+    def sample(self, low: int, high: int) -> List[str]:
+        count = self.rng.randint(low, min(high, len(self.vocabulary)))
+        tags = []
+        while len(tags) < count:
+            tag = self.rng.choices(self.vocabulary, cum_weights=self.cum_weights)[0]
+            if tag not in tags:
+                tags.append(tag)
+        return tags
+
+
+def object_id(kind: int, number: int) -> str:
+    """
+    A deterministic ObjectId string, unique per (kind, number).
+    """
+    return f"{kind:08x}{number:016x}"
+
+
+class SyntheticCatalog:
+    """
+    Class to generate the records of a synthetic catalog.
+    """
+
+    def __init__(
+        self,
+        templates: int = 190,
+        users: int = 10,
+        projects: int = 50,
+        tags: int = 180,
+        sections: int = 7,
+        depth: int = 4,
+        width: int = 8,
+        options: int = 4,
+        seed: int = 0,
+    ):
+        self.counts = {"templates": templates, "users": users, "projects": projects}
+        self.sections_count = sections
+        self.depth = depth
+        self.width = width
+        self.options_count = max(options, len(PROJECT_TYPES))
+        self.seed = seed
+        self.vocabulary = PROJECT_TYPES + [f"Tag {rank:05d}" for rank in range(max(0, tags - len(PROJECT_TYPES)))]
+
+    def _tags(self, salt: str) -> ZipfSampler:
+        # One random stream per kind: the templates do not change when, e.g.,
+        # the number of users does.
+        return ZipfSampler(self.vocabulary, random.Random(f"{self.seed}:{salt}"))
+
+    def templates(self) -> Iterator[dict]:
+        tags = self._tags("templates")
+        for number in range(self.counts["templates"]):
+            template_tags = tags.sample(2, 8)
+            yield {
+                "created_by": ADMIN_ID,
+                "is_private": False,
+                "template_name": f"Template {number:07d}",
+                "template_url": f"https://example.com/templates/{number}",
+                "template_description": f"Synthetic template {number} for {', '.join(template_tags[:2])}.",
+                "template_tags": template_tags,
+                "template_tree": "",
+            }
+
+    def sections(self) -> Iterator[dict]:
+        for number in range(self.sections_count):
+            yield {
+                "id": f"section-{number:03d}",
+                "name": f"Section {number}",
+                "order": number + 1,
+                "description": f"Synthetic section {number}.",
+                "is_conditional": number > 0,
+            }
+
+    def _level_width(self, level: int) -> int:
+        return min(self.width, self.options_count ** level)
+
+    def _option_texts(self, question_id: str) -> List[str]:
+        if question_id == "section-000-l0-q0":
+            # The project type question: recommendations match these texts.
+            return PROJECT_TYPES + [f"Option {n}" for n in range(self.options_count - len(PROJECT_TYPES))]
+        return [f"Option {n}" for n in range(self.options_count)]
+
+    def questions(self) -> Iterator[dict]:
+        for section in range(self.sections_count):
+            for level in range(self.depth):
+                for number in range(self._level_width(level)):
+                    question_id = f"section-{section:03d}-l{level}-q{number}"
+                    question = {
+                        "id": question_id,
+                        "statement": f"Question {number} of level {level} in section {section}?",
+                        "question_type": "select",
+                        "section_id": f"section-{section:03d}",
+                        "order": level + 1,
+                        "required": True,
+                        "is_first": section == 0 and level == 0 and number == 0,
+                    }
+                    if level:
+                        parent = f"section-{section:03d}-l{level - 1}-q{number // self.options_count}"
+                        question["depends_on"] = parent
+                        question["value"] = [self._option_texts(parent)[number % self.options_count]]
+                    yield question
+
+    def options(self) -> Iterator[dict]:
+        tags = self._tags("options")
+        for question in self.questions():
+            for number, text in enumerate(self._option_texts(question["id"])):
+                yield {
+                    "question_id": question["id"],
+                    "text": text,
+                    "is_default": number == 0,
+                    "tags": ([text] if text in PROJECT_TYPES else []) + tags.sample(1, 3),
+                }
+
+    def users(self) -> Iterator[dict]:
+        rng = random.Random(f"{self.seed}:users")
+        tags = self._tags("users")
+        for number in range(self.counts["users"]):
+            user_id = object_id(1, number)
+            templates = []
+            for private in range(rng.randint(0, 3)):
+                name = f"Private template {number}-{private}"
+                templates.append({
+                    "tid": name,
+                    "created_by": user_id,
+                    "is_private": True,
+                    "template_name": name,
+                    "template_description": f"Private template {private} of user {number}.",
+                    "template_tags": tags.sample(1, 5),
+                })
+            yield {
+                "_id": user_id,
+                "username": f"user{number:07d}",
+                "email": f"user{number:07d}@example.com",
+                "password": PASSWORD_HASH,
+                "templates": templates,
+            }
+
+    def projects(self) -> Iterator[dict]:
+        rng = random.Random(f"{self.seed}:projects")
+        tags = self._tags("projects")
+        users = max(1, self.counts["users"])
+        for number in range(self.counts["projects"]):
+            project = ProjectInsertFields(
+                created_by=object_id(1, rng.randrange(users)),
+                project_name=f"Project {number:07d}",
+                project_type=rng.choice(PROJECT_TYPES),
+                project_architecture=rng.choice(ARCHITECTURES),
+                project_tags=tags.sample(1, 5),
+            ).model_dump()
+            yield {"_id": object_id(2, number), **project}
+
+    def write(self, directory: str) -> dict:
+        """
+        Write the catalog to `<kind>.jsonl` files.
+
+        Returns:
+            dict: The number of records written per kind.
+        """
+        os.makedirs(directory, exist_ok=True)
+        return {
+            kind: write_jsonl(os.path.join(directory, f"{kind}.jsonl"), getattr(self, kind)())
+            for kind in ("templates", "sections", "questions", "options", "users", "projects")
+        }
+
+
+def load_accounts(mongo, neo4j, directory: str, batch_size: int = 1000) -> dict:
+    """
+    Load the `users.jsonl` and `projects.jsonl` files of a directory, like
+    the services would create them: the documents in MongoDB, and a Project
+    node per project in Neo4j.
+
+    Returns:
+        dict: The number of records loaded per kind.
+    """
+    counts = {}
+    for kind in ("users", "projects"):
+        path = os.path.join(directory, f"{kind}.jsonl")
+        counts[kind] = 0
+        if not os.path.exists(path):
+            continue
+        for batch in batched((record for _, record in iter_jsonl(path)), batch_size):
+            documents = [{**record, "_id": ObjectId(record["_id"])} for record in batch]
+            mongo.bulk_upsert(documents, kind, key="_id", batch_size=batch_size)
+            if kind == "projects":
+                nodes = [
+                    {**{k: v for k, v in record.items() if k != "_id"}, "pid": record["_id"], "id": record["_id"]}
+                    for record in batch
+                ]
+                neo4j.merge_nodes("Project", ("id",), nodes, batch_size=batch_size)
+            counts[kind] += len(batch)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic catalog in the ingestion source format.")
+    parser.add_argument("directory")
+    parser.add_argument("--scale", type=int, default=10, help="Size, as a multiple of the seed data.")
+    parser.add_argument("--seed", type=int, default=0)
+    for name in ("templates", "users", "projects", "tags", "sections", "depth", "width", "options"):
+        parser.add_argument(f"--{name}", type=int, help=f"Override the number of {name} of the scale.")
+    parser.add_argument("--load-accounts", action="store_true", help="Load the users and projects of DIR and exit.")
+    args = parser.parse_args()
+
+    if args.load_accounts:
+        # Imported here: generating a catalog does not need the databases.
+        from src.dependencies import get_mongo_db, get_neo4j_db
+
+        print(load_accounts(get_mongo_db(), get_neo4j_db(), args.directory))
+        return
+
+    parameters = scaled(args.scale)
+    parameters.update({k: getattr(args, k) for k in parameters if getattr(args, k) is not None})
+    print(SyntheticCatalog(seed=args.seed, **parameters).write(args.directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Questionnaire graph validation.
+
+Checks the questionnaire of a source before it is loaded, and precomputes
+its topology:
+
+- errors: a question of an unknown section, a `depends_on` on an unknown
+  question, a `value` that is not an option of the `depends_on` question
+  (a LEADS_TO without its start), an option of an unknown question, a
+  duplicate section, question or option, a LEADS_TO cycle;
+- warnings: an option text shared by several questions (the `full` mode
+  merges the Option nodes on their text; `--strict` rejects them).
+
+The index of a valid questionnaire is stored in the graph, in the
+`QuestionnaireIndex` node:
+
+- `order`: the question ids in topological order (every question after the
+  questions leading to it), the section and question order breaking the ties;
+- `reachable`: for each question id, the ids of every question its options
+  lead to, directly or not (JSON-encoded: a property cannot be a map);
+- `edges_hash`: the hash of the LEADS_TO question pairs it was built from,
+  which tells whether it still matches the graph.
+
+    report = validate_source(source)           # raises QuestionnaireGraphError
+    ...load...
+    store_index(neo4j, report["index"])
+"""
+import collections
+import heapq
+import json
+from typing import Iterable, List, Optional
+
+from src.db.ingestion.graph import content_hash
+
+INDEX_LABEL = "QuestionnaireIndex"
+INDEX_ID = "questionnaire"
+
+
+class QuestionnaireGraphError(ValueError):
+    """
+    The questionnaire of a source is not a valid graph.
+
+    Args:
+        problems (list): The description of each problem.
+    """
+
+    def __init__(self, problems: List[str]):
+        self.problems = problems
+        super().__init__(f"{len(problems)} questionnaire problem(s): " + "; ".join(problems[:10]))
+
+
+def leads_to_edges(questions: Iterable[dict]) -> List[tuple]:
+    """
+    The (question id, follow-up question id) pairs of the LEADS_TO relationships of the questions.
+    """
+    return [(question["depends_on"], question["id"]) for question in questions if question.get("depends_on")]
+
+
+def edges_hash(edges: Iterable[tuple]) -> str:
+    """
+    The hash of a set of (question id, follow-up question id) pairs, independent of their order and repeats.
+    """
+    return content_hash(sorted({(start, end) for start, end in edges}))
+
+
+def topological_order(question_ids: Iterable[str], edges: Iterable[tuple], position=None) -> tuple:
+    """
+    Sort questions so that each one comes after the questions leading to it (Kahn).
+
+    Args:
+        question_ids (Iterable[str]): The question ids.
+        edges (Iterable[tuple]): The (question id, follow-up question id) pairs.
+        position (Callable, optional): The sort key breaking the ties (default: the id).
+
+    Returns:
+        tuple: The sorted ids, and the ids left out because they are on (or after) a cycle.
+    """
+    position = position or (lambda question_id: question_id)
+    question_ids = list(dict.fromkeys(question_ids))
+    known = set(question_ids)
+    successors = collections.defaultdict(set)
+    indegree = dict.fromkeys(question_ids, 0)
+    for start, end in edges:
+        if start in known and end in known and end not in successors[start]:
+            successors[start].add(end)
+            indegree[end] += 1
+
+    ready = [(position(question_id), question_id) for question_id in question_ids if not indegree[question_id]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, question_id = heapq.heappop(ready)
+        order.append(question_id)
+        for successor in successors[question_id]:
+            indegree[successor] -= 1
+            if not indegree[successor]:
+                heapq.heappush(ready, (position(successor), successor))
+    sorted_ids = set(order)
+    return order, [question_id for question_id in question_ids if question_id not in sorted_ids]
+
+
+def find_cycles(question_ids: Iterable[str], edges: Iterable[tuple]) -> List[List[str]]:
+    """
+    The cycles among questions (e.g. those left out by `topological_order`), each as a list of ids.
+    """
+    question_ids = list(question_ids)
+    remaining = set(question_ids)
+    predecessors = collections.defaultdict(list)
+    for start, end in edges:
+        if start in remaining and end in remaining:
+            predecessors[end].append(start)
+
+    cycles, visited = [], set()
+    for first in question_ids:
+        if first in visited:
+            continue
+        # every question left out has a predecessor left out: walking them back ends on a cycle
+        path, index = [], {}
+        question_id = first
+        while question_id is not None and question_id not in index and question_id not in visited:
+            index[question_id] = len(path)
+            path.append(question_id)
+            question_id = next(iter(predecessors[question_id]), None)
+        if question_id in index:
+            cycle = path[index[question_id]:][::-1]
+            # start it on its first question
+            first_index = min(range(len(cycle)), key=lambda i: question_ids.index(cycle[i]))
+            cycle = cycle[first_index:] + cycle[:first_index]
+            cycles.append(cycle + [cycle[0]])
+        visited.update(path)
+    return cycles
+
+
+def reachability(order: List[str], edges: Iterable[tuple]) -> dict:
+    """
+    The ids of the questions reachable from each question, in one pass in reverse topological order.
+    """
+    successors = collections.defaultdict(set)
+    for start, end in edges:
+        successors[start].add(end)
+    reachable = {}
+    for question_id in reversed(order):
+        found = set()
+        for successor in successors[question_id]:
+            found.add(successor)
+            found.update(reachable.get(successor, ()))
+        reachable[question_id] = found
+    return {question_id: sorted(found) for question_id, found in reachable.items()}
+
+
+def question_position(sections: Iterable[dict], questions: Iterable[dict]):
+    """
+    The questionnaire position of a question id: its section order, then its own order.
+    """
+    section_order = {section.get("id"): section.get("order") or 0 for section in sections}
+    positions = {
+        question.get("id"): (section_order.get(question.get("section_id"), float("inf")), question.get("order") or 0)
+        for question in questions
+    }
+    return lambda question_id: (*positions.get(question_id, (float("inf"), 0)), question_id)
+
+
+def build_index(sections: List[dict], questions: List[dict], edges: List[tuple]) -> Optional[dict]:
+    """
+    Build the questionnaire index node.
+
+    Args:
+        sections (List[dict]): The sections.
+        questions (List[dict]): The questions.
+        edges (List[tuple]): The (question id, follow-up question id) pairs.
+
+    Returns:
+        dict: The properties of the index node, None when the questions have a cycle.
+    """
+    order, cyclic = topological_order(
+        (question["id"] for question in questions), edges, question_position(sections, questions)
+    )
+    if cyclic:
+        return None
+    index = {
+        "id": INDEX_ID,
+        "order": order,
+        "reachable": json.dumps(reachability(order, edges), sort_keys=True),
+        "edges_hash": edges_hash(edges),
+    }
+    index["content_hash"] = content_hash(index)
+    return index
+
+
+def decode_index(node: dict) -> dict:
+    """
+    The `order` and `reachable` (by question id) of an index node.
+    """
+    return {"order": list(node.get("order") or []), "reachable": json.loads(node.get("reachable") or "{}")}
+
+
+def validate_questionnaire(sections: Iterable[dict], questions: Iterable[dict], options: Iterable[dict]) -> dict:
+    """
+    Validate the questionnaire records of a source.
+
+    Args:
+        sections (Iterable[dict]): The source sections.
+        questions (Iterable[dict]): The source questions.
+        options (Iterable[dict]): The source options (only their keys are kept).
+
+    Returns:
+        dict: The `errors` and `warnings` found, and the `index` node (None
+            when the questions have a cycle).
+    """
+    errors, warnings = [], []
+    sections, questions = list(sections), list(questions)
+
+    section_ids = collections.Counter(section.get("id") for section in sections)
+    question_ids = collections.Counter(question.get("id") for question in questions)
+    errors += [f"duplicate section {section_id!r}" for section_id, count in section_ids.items() if count > 1]
+    errors += [f"duplicate question {question_id!r}" for question_id, count in question_ids.items() if count > 1]
+
+    texts = collections.defaultdict(set)
+    questions_by_text = collections.defaultdict(set)
+    for option in options:
+        question_id, text = option.get("question_id"), option.get("text")
+        if question_id not in question_ids:
+            errors.append(f"option {text!r} of unknown question {question_id!r}")
+        elif text in texts[question_id]:
+            errors.append(f"duplicate option {text!r} of question {question_id!r}")
+        texts[question_id].add(text)
+        questions_by_text[text].add(question_id)
+    warnings += [f"option text {text!r} shared by questions {sorted(ids)}"
+                 for text, ids in questions_by_text.items() if len(ids) > 1]
+
+    for question in questions:
+        question_id = question.get("id")
+        if question.get("section_id") not in section_ids:
+            errors.append(f"question {question_id!r} of unknown section {question.get('section_id')!r}")
+        depends_on = question.get("depends_on")
+        if not depends_on:
+            continue
+        if depends_on not in question_ids:
+            errors.append(f"question {question_id!r} depends on unknown question {depends_on!r}")
+            continue
+        for value in question.get("value") or []:
+            if value not in texts[depends_on]:
+                errors.append(f"question {question_id!r} depends on {value!r}, not an option of {depends_on!r}")
+
+    edges = leads_to_edges(questions)
+    index = build_index(sections, questions, edges)
+    if index is None:
+        _, cyclic = topological_order(question_ids, edges)
+        errors += ["LEADS_TO cycle " + " -> ".join(cycle) for cycle in find_cycles(cyclic, edges)]
+    return {"errors": errors, "warnings": warnings, "index": index}
+
+
+def validate_source(source, strict: bool = False) -> dict:
+    """
+    Validate the questionnaire of a source (see `validate_questionnaire`).
+
+    Args:
+        source: The ingestion source.
+        strict (bool): Reject the warnings too.
+
+    Returns:
+        dict: The validation report.
+
+    Raises:
+        QuestionnaireGraphError: The questionnaire has errors (or warnings, when strict).
+    """
+    report = validate_questionnaire(source.sections(), source.questions(), source.options())
+    problems = report["errors"] + (report["warnings"] if strict else [])
+    if problems:
+        raise QuestionnaireGraphError(problems)
+    return report
+
+
+def store_index(neo4j, index: dict) -> dict:
+    """
+    Write the questionnaire index node, replacing the previous one.
+    """
+    return neo4j.merge_nodes(INDEX_LABEL, ("id",), [index])
+
+
+def delete_index(neo4j) -> dict:
+    """
+    Delete the questionnaire index node (e.g. after a load without validation).
+    """
+    return neo4j.delete_nodes(INDEX_LABEL, ("id",), [(INDEX_ID,)])
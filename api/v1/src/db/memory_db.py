@@ -0,0 +1,596 @@
+"""
+In-memory database backends.
+
+Drop-in replacements for `MongoDB` and `Neo4jDB` that keep everything in the
+process, selected with `DB_BACKEND=memory` (see `src.dependencies`). They let
+the test suite and the benchmarks run offline, in seconds.
+
+- `InMemoryMongoDB` is the `MongoDB` wrapper over a mongomock database.
+- `InMemoryNeo4jDB` implements the node/relationship operations of
+  `Neo4jDB` on Python objects. Raw Cypher (custom queries, `execute_read`
+  with a transaction function) is only supported for the queries the
+  services issue, registered in `CUSTOM_QUERIES`; any other query raises
+  `NotImplementedError`.
+
+Both backends are process-wide singletons, seeded with the ingestion data on
+first use unless `MEMORY_DB_SEED=0`. `MEMORY_DB_SOURCE=DIR` seeds them with
+the JSONL files of DIR instead (see `src.db.ingestion.synthetic`).
+"""
+import os
+import re
+import threading
+from typing import Callable, List, Union
+
+import mongomock
+
+from src.db.ingestion.sources import batched
+from src.db.mongo_db import MongoDB
+from src.db.neo4j_db import Neo4jDB
+from src.db.neo4j_profiling import profiled
+from src.utils.handlers import handle_db_operations
+
+
+class InMemoryMongoDB(MongoDB):
+    """
+    A class to manage the database operations on a mongomock database.
+    """
+
+    @handle_db_operations
+    def bulk_upsert(
+        self, documents: List[dict], collection_name: str, key: str, batch_size: int = 1000
+    ) -> int:
+        # mongomock rejects the bulk operations of recent pymongo versions, and
+        # scans the collection on every replace_one: the batch is replaced as a
+        # whole, keeping the _id of the documents already there.
+        collection = self.db[collection_name]
+        written = 0
+        for batch in batched(documents, batch_size):
+            keys = {document[key] for document in batch}
+            existing = {
+                document[key]: document["_id"]
+                for document in collection.find({}, {key: 1}) if document.get(key) in keys
+            }
+            if existing:
+                collection.delete_many({"_id": {"$in": list(existing.values())}})
+            replaced = []
+            for document in batch:
+                document = dict(document)
+                if document[key] in existing:
+                    document["_id"] = existing[document[key]]
+                replaced.append(document)
+            collection.insert_many(replaced)
+            written += len(replaced)
+        return written
+
+
+class Node(dict):
+    """
+    A node: its properties, with the `labels` and `_properties` of a driver node.
+    """
+
+    def __init__(self, label: str, properties: dict):
+        super().__init__(properties)
+        self.labels = frozenset([label])
+
+    @property
+    def _properties(self) -> dict:
+        return self
+
+    def __eq__(self, other):
+        return self is other
+
+    __hash__ = object.__hash__
+
+
+class Relationship:
+    """
+    A relationship between two nodes.
+    """
+
+    def __init__(self, start: Node, relation_type: str, end: Node, properties: dict = None):
+        self.start = start
+        self.type = relation_type
+        self.end = end
+        self.properties = dict(properties or {})
+
+
+class Record(tuple):
+    """
+    A record: a tuple also indexable by column name.
+    """
+
+    def __new__(cls, keys, values):
+        record = super().__new__(cls, values)
+        record._keys = tuple(keys)
+        return record
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = self._keys.index(key)
+        return super().__getitem__(key)
+
+    def keys(self):
+        return self._keys
+
+    def data(self) -> dict:
+        return dict(zip(self._keys, self))
+
+
+class Counters:
+    """
+    The update counters of a write, like the driver's `SummaryCounters`.
+    """
+
+    FIELDS = (
+        "nodes_created", "nodes_deleted", "relationships_created",
+        "relationships_deleted", "properties_set",
+    )
+
+    def __init__(self, **counts):
+        for field in self.FIELDS:
+            setattr(self, field, counts.get(field, 0))
+
+    @property
+    def contains_updates(self) -> bool:
+        return any(getattr(self, field) for field in self.FIELDS)
+
+    _contains_updates = contains_updates
+
+
+class Result:
+    """
+    The result of a query run on an `InMemoryTransaction`.
+    """
+
+    def __init__(self, records: List[Record], counters: Counters = None):
+        self._records = records
+        self._counters = counters or Counters()
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def data(self) -> List[dict]:
+        return [record.data() for record in self._records]
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return self
+
+    @property
+    def counters(self) -> Counters:
+        return self._counters
+
+
+class InMemoryTransaction:
+    """
+    A transaction of `InMemoryNeo4jDB`, running the registered custom queries.
+    """
+
+    def __init__(self, db: "InMemoryNeo4jDB"):
+        self.db = db
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> Result:
+        params = {**(parameters or {}), **kwargs}
+        normalized = " ".join(query.split()).removeprefix("PROFILE ")
+        for pattern, handler in CUSTOM_QUERIES:
+            match = pattern.search(normalized)
+            if match:
+                return handler(self.db, params, **match.groupdict())
+        raise NotImplementedError(f"The in-memory Neo4j backend does not support: {normalized}")
+
+
+def _question_options(db, params, question_id):
+    options = [
+        rel.end for rel in db.relationships
+        if rel.type == "HAS_OPTION" and "Question" in rel.start.labels and rel.start.get("id") == question_id
+    ]
+    return Result([Record(("o",), (option,)) for option in options])
+
+
+def _recommended_templates(db, params):
+    project = next(iter(db._match("Project", {"id": params.get("project_id")})), None)
+    if project is None:
+        return Result([])
+    project_type = str(project.get("project_type", "")).lower()
+    options = [o for o in db._match("Option", {}) if str(o.get("text", "")).lower() == project_type]
+    tags = {str(tag).lower() for option in options for tag in option.get("tags", [])}
+    templates = [
+        t for t in db._match("Template", {})
+        if tags & {str(tag).lower() for tag in t.get("template_tags", [])}
+    ]
+    return Result([Record(("template_name",), (t.get("template_name"),)) for t in templates[:1]])
+
+
+# (pattern on the whitespace-normalized query, handler(db, params, **groups))
+CUSTOM_QUERIES = [
+    (
+        re.compile(r"^MATCH \(q:Question \{id: '(?P<question_id>[^']*)'\}\)-\[:HAS_OPTION\]->\(o:Option\) RETURN o$"),
+        _question_options,
+    ),
+    (
+        re.compile(r"^MATCH \(p:Project \{id: \$project_id\}\).*RETURN t\.template_name AS template_name"),
+        _recommended_templates,
+    ),
+]
+
+
+class InMemoryNeo4jDB(Neo4jDB):
+    """
+    A class to manage the database operations for an in-memory graph.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.relationships = []
+        self._lock = threading.RLock()
+
+    def close(self):
+        pass
+
+    def execute_write(self, func, **kwargs):
+        with self._lock:
+            return profiled(func)(InMemoryTransaction(self), **kwargs)
+
+    def execute_read(self, func, **kwargs):
+        with self._lock:
+            result = profiled(func)(InMemoryTransaction(self), **kwargs)
+        if not result:
+            return None
+        return result
+
+    def execute_auto(self, query: str, **params) -> list:
+        return self.execute_write(lambda tx: tx.run(query, **params).data())
+
+    def stream(self, query: str, **params):
+        yield from self.execute_read(lambda tx: tx.run(query, **params).data()) or []
+
+    def _match(self, label: str, properties: dict) -> List[Node]:
+        return [
+            node for node in self.nodes.get(label, [])
+            if all(node.get(k) == v for k, v in properties.items())
+        ]
+
+    def _merge(self, label: str, properties: dict) -> List[Node]:
+        nodes = self._match(label, properties)
+        if not nodes:
+            node = Node(label, properties)
+            self.nodes.setdefault(label, []).append(node)
+            nodes = [node]
+        return nodes
+
+    def _index(self, label: str, key_fields: tuple) -> dict:
+        # The nodes of a label by key, for the bulk operations.
+        index = {}
+        for node in self.nodes.get(label, []):
+            index.setdefault(tuple(node.get(field) for field in key_fields), []).append(node)
+        return index
+
+    def _match_relationships(self, start_label, start_properties, relation_type, end_label, end_properties):
+        return [
+            rel for rel in self.relationships
+            if rel.type == relation_type
+            and start_label in rel.start.labels and end_label in rel.end.labels
+            and all(rel.start.get(k) == v for k, v in start_properties.items())
+            and all(rel.end.get(k) == v for k, v in end_properties.items())
+        ]
+
+    def _detach_delete(self, nodes: List[Node]) -> Counters:
+        doomed = {id(node) for node in nodes}
+        kept = [r for r in self.relationships if id(r.start) not in doomed and id(r.end) not in doomed]
+        relationships_deleted = len(self.relationships) - len(kept)
+        self.relationships = kept
+        for label in self.nodes:
+            self.nodes[label] = [node for node in self.nodes[label] if id(node) not in doomed]
+        return Counters(nodes_deleted=len(doomed), relationships_deleted=relationships_deleted)
+
+    @handle_db_operations
+    def drop(
+        self,
+        label: Union[str, List[str]] = None,
+        batch_size: int = 10000,
+        chunk_size: int = 100000,
+        on_progress: Callable[[str, int, int], None] = None,
+    ) -> dict:
+        labels = [label] if isinstance(label, str) else (label or [None])
+        deleted_by_label = {}
+        with self._lock:
+            for current_label in labels:
+                if current_label:
+                    nodes = list(self.nodes.get(current_label, []))
+                else:
+                    nodes = [node for label_nodes in self.nodes.values() for node in label_nodes]
+                deleted = 0
+                for start in range(0, len(nodes), chunk_size):
+                    deleted += self._detach_delete(nodes[start:start + chunk_size]).nodes_deleted
+                    if on_progress:
+                        on_progress(current_label or "*", deleted, len(nodes))
+                deleted_by_label[current_label or "*"] = deleted
+        return deleted_by_label
+
+    @handle_db_operations
+    def ensure_index(self, node_label: str, property_names: tuple) -> dict:
+        return Counters()
+
+    @handle_db_operations
+    def create_index(self, node_label: str, property_name: str) -> dict:
+        return Counters()
+
+    @handle_db_operations
+    def read_hashes(self, node_label: str, key_fields: tuple) -> dict:
+        with self._lock:
+            return {
+                tuple(node.get(field) for field in key_fields): node["content_hash"]
+                for node in self._match(node_label, {}) if node.get("content_hash") is not None
+            }
+
+    @handle_db_operations
+    def read_relationship_hashes(
+        self, start_node_label, start_key_fields, relation_type, end_node_label, end_key_fields
+    ) -> dict:
+        with self._lock:
+            return {
+                (
+                    tuple(rel.start.get(field) for field in start_key_fields),
+                    tuple(rel.end.get(field) for field in end_key_fields),
+                ): rel.properties["content_hash"]
+                for rel in self._match_relationships(start_node_label, {}, relation_type, end_node_label, {})
+                if rel.properties.get("content_hash") is not None
+            }
+
+    @handle_db_operations
+    def read_nodes(self, node_label: str) -> List[dict]:
+        with self._lock:
+            return [dict(node) for node in self._match(node_label, {})]
+
+    @handle_db_operations
+    def read_relationship_keys(
+        self, start_node_label, start_key_fields, relation_type, end_node_label, end_key_fields
+    ) -> List[tuple]:
+        with self._lock:
+            return [
+                (
+                    tuple(rel.start.get(field) for field in start_key_fields),
+                    tuple(rel.end.get(field) for field in end_key_fields),
+                )
+                for rel in self._match_relationships(start_node_label, {}, relation_type, end_node_label, {})
+            ]
+
+    @handle_db_operations
+    def read_section_questions(self, section_ids: List[str], with_options: bool = False) -> List[tuple]:
+        with self._lock:
+            options = {}
+            if with_options:
+                for rel in self._match_relationships("Question", {}, "HAS_OPTION", "Option", {}):
+                    options.setdefault(id(rel.start), []).append(dict(rel.end))
+            rows = [
+                (rel.start, rel.end)
+                for rel in self._match_relationships("Section", {}, "HAS_QUESTION", "Question", {})
+                if rel.start.get("id") in section_ids
+            ]
+            rows.sort(key=lambda row: (row[0].get("order"), row[1].get("order")))
+            return [
+                (
+                    section.get("id"),
+                    dict(question),
+                    sorted(options.get(id(question), []), key=lambda o: o.get("text")) if with_options else None,
+                )
+                for section, question in rows
+            ]
+
+    @handle_db_operations
+    def read_follow_ups(self, question_ids: List[str], hops: int) -> List[tuple]:
+        with self._lock:
+            outgoing = {}
+            for rel in self.relationships:
+                if rel.type in ("HAS_OPTION", "LEADS_TO"):
+                    outgoing.setdefault(id(rel.start), []).append(rel)
+            frontier = [node for node in self._match("Question", {}) if node.get("id") in question_ids]
+            seen_nodes = {id(node) for node in frontier}
+            seen = {}
+            for _ in range(hops):
+                next_frontier = []
+                for node in frontier:
+                    for rel in outgoing.get(id(node), []):
+                        seen.setdefault(id(rel), rel)
+                        if id(rel.end) not in seen_nodes:
+                            seen_nodes.add(id(rel.end))
+                            next_frontier.append(rel.end)
+                frontier = next_frontier
+            return [(rel.type, dict(rel.start), dict(rel.end)) for rel in seen.values()]
+
+    @handle_db_operations
+    def merge_nodes(self, node_label: str, key_fields: tuple, rows: List[dict], batch_size: int = 1000) -> int:
+        with self._lock:
+            index = self._index(node_label, key_fields)
+            for row in rows:
+                key = tuple(row.get(field) for field in key_fields)
+                if key not in index:
+                    index[key] = [Node(node_label, {})]
+                    self.nodes.setdefault(node_label, []).extend(index[key])
+                for node in index[key]:
+                    node.clear()
+                    node.update(row)
+        return len(rows)
+
+    @handle_db_operations
+    def delete_nodes(self, node_label: str, key_fields: tuple, keys: List[tuple], batch_size: int = 1000) -> int:
+        with self._lock:
+            nodes = [node for key in keys for node in self._match(node_label, dict(zip(key_fields, key)))]
+            self._detach_delete(nodes)
+        return len(keys)
+
+    @handle_db_operations
+    def merge_relationships(
+        self, start_node_label, start_key_fields, relation_type, end_node_label, end_key_fields,
+        rows: List[dict], batch_size: int = 1000,
+    ) -> int:
+        with self._lock:
+            starts = self._index(start_node_label, start_key_fields)
+            ends = self._index(end_node_label, end_key_fields)
+            existing = {
+                (id(rel.start), id(rel.end)): rel for rel in self.relationships if rel.type == relation_type
+            }
+            for row in rows:
+                start_key = tuple(row["start"].get(field) for field in start_key_fields)
+                end_key = tuple(row["end"].get(field) for field in end_key_fields)
+                for start in starts.get(start_key, []):
+                    for end in ends.get(end_key, []):
+                        rel = existing.get((id(start), id(end)))
+                        if rel is not None:
+                            rel.properties = dict(row.get("properties", {}))
+                        else:
+                            rel = Relationship(start, relation_type, end, row.get("properties"))
+                            existing[(id(start), id(end))] = rel
+                            self.relationships.append(rel)
+        return len(rows)
+
+    @handle_db_operations
+    def delete_relationships(
+        self, start_node_label, start_key_fields, relation_type, end_node_label, end_key_fields,
+        keys: List[tuple], batch_size: int = 1000,
+    ) -> int:
+        with self._lock:
+            doomed = set()
+            for start, end in keys:
+                doomed.update(id(rel) for rel in self._match_relationships(
+                    start_node_label, dict(zip(start_key_fields, start)),
+                    relation_type,
+                    end_node_label, dict(zip(end_key_fields, end)),
+                ))
+            self.relationships = [rel for rel in self.relationships if id(rel) not in doomed]
+        return len(keys)
+
+    def create_node(self, tx, node_label: str, properties: dict, identifier: str = "id"):
+        node = Node(node_label, properties)
+        self.nodes.setdefault(node_label, []).append(node)
+        return Record(("n",), (node,))
+
+    def read_node(self, tx, node_label: str, properties: dict, many: bool = False, limit: int = None, sort: tuple = None):
+        nodes = self._match(node_label, properties)
+        if sort is not None:
+            field, order = sort
+            nodes = sorted(nodes, key=lambda node: node.get(field), reverse=order.lower() == "desc")
+        if limit is not None:
+            nodes = nodes[:limit]
+        if many:
+            return {"result": [dict(node) for node in nodes]}
+        return dict(nodes[0]) if nodes else {}
+
+    def update_node(self, tx, node_label: str, match_properties: dict, set_properties: dict):
+        nodes = self._match(node_label, match_properties)
+        for node in nodes:
+            node.update(set_properties)
+        return [{"a": dict(node)} for node in nodes]
+
+    def delete_node(self, tx, node_label: str, properties: dict):
+        return self._detach_delete(self._match(node_label, properties)[:1])
+
+    def create_relationship(
+        self, tx, start_node_label, start_node_properties, end_node_label, end_node_properties, relation_type
+    ):
+        starts = self._merge(start_node_label, start_node_properties)
+        ends = self._merge(end_node_label, end_node_properties)
+        for start in starts:
+            for end in ends:
+                self.relationships.append(Relationship(start, relation_type, end))
+        return (starts[0], relation_type, ends[0])
+
+    def read_relationship(
+        self, tx, start_node_label, start_node_properties, end_node_label, end_node_properties,
+        relation_type, many=False, sort: tuple = None,
+    ):
+        records = [
+            Record(("a", "relationType", "b"), (rel.start, rel.type, rel.end))
+            for rel in self._match_relationships(
+                start_node_label, start_node_properties, relation_type, end_node_label, end_node_properties
+            )
+        ]
+        if many:
+            return records
+        return tuple(records[0]) if records else None
+
+    def update_relationship(
+        self, tx, start_node_label, start_node_properties, end_node_label, end_node_properties,
+        relation_type, new_properties,
+    ):
+        relationships = self._match_relationships(
+            start_node_label, start_node_properties, relation_type, end_node_label, end_node_properties
+        )
+        if not relationships:
+            return None
+        relationships[0].properties.update(new_properties)
+        return Counters(properties_set=len(new_properties))
+
+    def delete_relationship(
+        self, tx, start_node_label, start_node_properties, end_node_label, end_node_properties, relation_type
+    ):
+        relationships = self._match_relationships(
+            start_node_label, start_node_properties, relation_type, end_node_label, end_node_properties
+        )
+        if relationships:
+            self.relationships.remove(relationships[0])
+        return Counters(relationships_deleted=len(relationships[:1]))
+
+
+_lock = threading.Lock()
+# Held while the graph is created and seeded: the other threads wait for a seeded graph.
+_seed_lock = threading.RLock()
+_mongo_client = None
+_neo4j = None
+
+
+def _seed(neo4j: "InMemoryNeo4jDB"):
+    # Imported here: the ingestion job imports src.dependencies.
+    from src.db.ingestion.job import run_full, run_stream
+    from src.db.ingestion.sources import FileSource, ModuleSource
+    from src.db.ingestion.synthetic import load_accounts
+    from src.db.ingestion.validation import store_index, validate_source
+
+    mongo = _memory_mongo_db("test_db")
+    directory = os.getenv("MEMORY_DB_SOURCE")
+    if directory:
+        # e.g. a synthetic catalog: bulk writes, and its users and projects.
+        source = FileSource(directory)
+        run_stream(mongo, neo4j, source, batch_size=10000)
+        load_accounts(mongo, neo4j, directory, batch_size=10000)
+    else:
+        source = ModuleSource()
+        run_full(mongo, neo4j, source)
+    store_index(neo4j, validate_source(source)["index"])
+
+
+def _memory_mongo_db(database_name: str) -> InMemoryMongoDB:
+    global _mongo_client
+    with _lock:
+        if _mongo_client is None:
+            _mongo_client = mongomock.MongoClient()
+    return InMemoryMongoDB(_mongo_client[database_name])
+
+
+def get_memory_mongo_db(database_name: str = "test_db") -> InMemoryMongoDB:
+    """
+    Get the in-memory Mongo database `database_name` (seeded with the graph).
+    """
+    get_memory_neo4j_db()
+    return _memory_mongo_db(database_name)
+
+
+def get_memory_neo4j_db() -> InMemoryNeo4jDB:
+    """
+    Get the in-memory graph, seeded with the ingestion data on first use.
+
+    The graph is only published once seeded: a concurrent caller waits for
+    the seeding instead of getting an empty graph.
+    """
+    global _neo4j
+    if _neo4j is not None:
+        return _neo4j
+    with _seed_lock:
+        if _neo4j is None:
+            neo4j = InMemoryNeo4jDB()
+            if os.getenv("MEMORY_DB_SEED", "1") == "1":
+                _seed(neo4j)
+            _neo4j = neo4j
+    return _neo4j
@@ -136,6 +136,33 @@ class MongoDB:
             result = collection.insert_one(document_data)
             return str(result.inserted_id)
 
+    @handle_db_operations
+    def bulk_upsert(
+        self, documents: List[dict], collection_name: str, key: str, batch_size: int = 1000
+    ) -> int:
+        """
+        Replace or insert documents matched on `key`, with one bulk write per batch.
+
+        Args:
+            documents (List[dict]): The documents to be written.
+            collection_name (str): The name of the MongoDB collection.
+            key (str): The field identifying a document.
+            batch_size (int, optional): Number of documents per bulk write. Defaults to 1000.
+
+        Returns:
+            int: The number of documents inserted or modified.
+        """
+        collection = self.db[collection_name]
+        written = 0
+        for start in range(0, len(documents), batch_size):
+            operations = [
+                pymongo.ReplaceOne({key: document[key]}, document, upsert=True)
+                for document in documents[start:start + batch_size]
+            ]
+            result = collection.bulk_write(operations, ordered=False)
+            written += result.upserted_count + result.modified_count
+        return written
+
     @handle_db_operations
     def read(
         self,
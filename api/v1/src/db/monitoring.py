@@ -0,0 +1,374 @@
+"""
+MongoDB command monitoring.
+
+`CommandMonitor` is a pymongo command listener, registered on the clients of
+`get_mongo_db`. For every command it records the collection, the operation,
+the duration and the number of documents returned, aggregated per query
+shape: the command with its literal values replaced by "?", so that
+`{"template_name": "FastAPI"}` and `{"template_name": "Django"}` are the
+same shape.
+
+Commands slower than `MONGO_SLOW_MS` (default 100) are also written to the
+slow-query log:
+
+- `MONGO_SLOW_LOG=log` (default): JSON lines on the `gocod.mongo.slow` logger;
+- `MONGO_SLOW_LOG=file`: JSON lines in `MONGO_SLOW_LOG_PATH` (required),
+  rotated every 10 MB, 5 files kept;
+- `MONGO_SLOW_LOG=collection`: the capped `slow_queries` collection, written
+  by a background thread;
+- `MONGO_SLOW_LOG=off`: no log, the shapes are still aggregated.
+
+The plan summary of a shape (e.g. `IXSCAN { template_name: 1 }`) is not
+known to the listener: `explain_shape` runs an `explain` of a sample of the
+shape on demand.
+"""
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from typing import List, Optional
+
+from pymongo import MongoClient, monitoring
+from pymongo.server_api import ServerApi
+
+# Commands whose first value is the collection name.
+COLLECTION_COMMANDS = (
+    "find", "aggregate", "count", "distinct", "insert", "update", "delete",
+    "findAndModify", "createIndexes", "dropIndexes", "drop", "listIndexes",
+)
+# Parts of a command that are not part of its shape.
+SESSION_FIELDS = ("lsid", "txnNumber", "$clusterTime", "$db", "$readPreference", "apiVersion",
+                  "apiStrict", "apiDeprecationErrors", "autocommit", "startTransaction", "readConcern",
+                  "writeConcern")
+# Parts of a command holding documents (their values are not part of the shape).
+DOCUMENT_FIELDS = ("documents",)
+EXPLAINABLE = ("find", "aggregate", "count", "distinct", "update", "delete", "findAndModify")
+SLOW_COLLECTION = "slow_queries"
+
+
+def normalize(value):
+    """
+    The shape of a query value: operators and field names are kept, literals become "?".
+    """
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = normalize(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def command_shape(command_name: str, command: dict) -> dict:
+    """
+    The shape of a command: its parameters with normalized filters, without
+    session fields and inserted documents.
+    """
+    shape = {}
+    for key, value in command.items():
+        if key in SESSION_FIELDS or key == command_name:
+            continue
+        if key in DOCUMENT_FIELDS:
+            shape[key] = f"[{len(value)} documents]"
+        elif key in ("limit", "batchSize", "skip", "ordered", "singleBatch", "new", "upsert"):
+            shape[key] = value
+        else:
+            shape[key] = normalize(value)
+    return shape
+
+
+def command_sample(command: dict) -> dict:
+    """
+    The part of a command kept as the sample of its shape, enough to explain
+    it: without session fields and inserted documents, with only the first
+    statement of a bulk update or delete, and the shape of the update
+    documents (the filter values are kept: they drive the plan).
+    """
+    sample = {}
+    for key, value in command.items():
+        if key in SESSION_FIELDS or key in DOCUMENT_FIELDS:
+            continue
+        if key in ("updates", "deletes") and isinstance(value, list):
+            value = [{k: normalize(v) if k == "u" else v for k, v in statement.items()} for statement in value[:1]]
+        elif key == "update" and isinstance(value, (dict, list)):
+            value = normalize(value)
+        sample[key] = value
+    return sample
+
+
+def command_collection(command_name: str, command: dict) -> Optional[str]:
+    if command_name == "getMore":
+        return command.get("collection")
+    if command_name in COLLECTION_COMMANDS:
+        value = command.get(command_name)
+        return value if isinstance(value, str) else None
+    return None
+
+
+def documents_returned(reply: dict) -> int:
+    """
+    The number of documents of a reply: the cursor batch, or `n` for a write or count.
+    """
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "values" in reply:
+        return len(reply["values"])
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+def winning_plan(explain: dict) -> dict:
+    """
+    The root stage of the winning plan of an explain.
+    """
+    planner = explain.get("queryPlanner") or {}
+    if not planner and explain.get("stages"):
+        # aggregate: the plan of the $cursor stage
+        planner = explain["stages"][0].get("$cursor", {}).get("queryPlanner", {})
+    stage = planner.get("winningPlan", {})
+    return stage.get("queryPlan", stage)
+
+
+def plan_stages(explain: dict) -> list:
+    """
+    The stage names of the winning plan of an explain, root first.
+    """
+    stages = []
+    pending = [winning_plan(explain)]
+    while pending:
+        stage = pending.pop()
+        if stage:
+            stages.append(stage.get("stage"))
+            pending.extend(stage.get("inputStages") or [stage.get("inputStage")])
+    return stages
+
+
+def plan_summary(explain: dict) -> str:
+    """
+    The summary of a winning plan, as in the MongoDB slow-query log (`IXSCAN { a: 1 }, FETCH`).
+    """
+    stage = winning_plan(explain)
+    summary = []
+    while stage:
+        name = stage.get("stage")
+        if name == "IXSCAN":
+            keys = ", ".join(f"{k}: {v}" for k, v in stage.get("keyPattern", {}).items())
+            summary.append(f"IXSCAN {{ {keys} }}")
+        elif name in ("COLLSCAN", "IDHACK", "COUNT_SCAN", "EOF", "SORT"):
+            summary.append(name)
+        stage = stage.get("inputStage") or (stage.get("inputStages") or [None])[0]
+    return ", ".join(reversed(summary)) or "?"
+
+
+class SlowQueryLog:
+    """
+    Slow-query sink writing JSON lines to the `gocod.mongo.slow` logger.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("gocod.mongo.slow")
+
+    def write(self, entry: dict):
+        self.logger.warning(json.dumps(entry, default=str))
+
+
+class SlowQueryFile:
+    """
+    Slow-query sink writing JSON lines to a rotating file.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5):
+        self.logger = logging.getLogger(f"gocod.mongo.slow.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+
+    def write(self, entry: dict):
+        self.logger.info(json.dumps(entry, default=str))
+
+
+class SlowQueryCollection:
+    """
+    Slow-query sink writing to a capped collection from a background thread.
+
+    The sink has its own client, without the monitor. Entries are dropped when
+    more than `max_pending` are waiting.
+    """
+
+    def __init__(self, mongo_uri: str, database_name: str, size_bytes: int = 64 * 1024 * 1024,
+                 max_pending: int = 10000):
+        self.db = MongoClient(mongo_uri, server_api=ServerApi('1'))[database_name]
+        self.size_bytes = size_bytes
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name="mongo-slow-log", daemon=True)
+        self.thread.start()
+
+    def write(self, entry: dict):
+        try:
+            self.pending.put_nowait(entry)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        if SLOW_COLLECTION not in self.db.list_collection_names():
+            self.db.create_collection(SLOW_COLLECTION, capped=True, size=self.size_bytes)
+        while True:
+            entries = [self.pending.get()]
+            while not self.pending.empty() and len(entries) < 100:
+                entries.append(self.pending.get_nowait())
+            try:
+                self.db[SLOW_COLLECTION].insert_many(entries, ordered=False)
+            except Exception as e:  # the log must not stop on a write error
+                logging.error(f"Could not write the slow queries: {e}")
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Class to aggregate the MongoDB commands per query shape, and log the slow ones.
+    """
+
+    def __init__(self, slow_ms: float = 100, sink=None, max_shapes: int = 1000):
+        self.slow_ms = slow_ms
+        self.sink = sink
+        self.max_shapes = max_shapes
+        # the monitored client, to explain the query shapes
+        self.client = None
+        self.shapes = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = command_collection(event.command_name, event.command)
+        if collection == SLOW_COLLECTION:
+            return
+        self._pending[(event.connection_id, event.request_id)] = (collection, event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, "success", event.reply)
+
+    def failed(self, event):
+        self._finish(event, "failure", {})
+
+    def _finish(self, event, outcome: str, reply: dict):
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        collection, database, command = started
+        duration_ms = event.duration_micros / 1000
+        documents = documents_returned(reply)
+        shape = command_shape(event.command_name, command)
+        key = (database, collection, event.command_name, json.dumps(shape, sort_keys=True, default=str))
+        slow = duration_ms >= self.slow_ms
+
+        with self._lock:
+            stats = self.shapes.get(key)
+            if stats is None and len(self.shapes) < self.max_shapes:
+                stats = self.shapes[key] = {
+                    "database": database,
+                    "collection": collection,
+                    "operation": event.command_name,
+                    "shape": shape,
+                    "count": 0,
+                    "failures": 0,
+                    "slow": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "documents": 0,
+                    "sample": None,
+                }
+            # past max_shapes, a new shape is not aggregated (but still logged when slow)
+            if stats is not None:
+                stats["count"] += 1
+                stats["failures"] += outcome == "failure"
+                stats["slow"] += slow
+                stats["total_ms"] += duration_ms
+                stats["documents"] += documents
+                if duration_ms >= stats["max_ms"]:
+                    stats["max_ms"] = duration_ms
+                    stats["sample"] = command_sample(command)
+
+        if slow and self.sink is not None:
+            self.sink.write({
+                "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "database": database,
+                "collection": collection,
+                "operation": event.command_name,
+                "shape": shape,
+                "duration_ms": duration_ms,
+                "documents": documents,
+                "outcome": outcome,
+            })
+
+    def top(self, limit: int = 10, sort: str = "max_ms", slow_only: bool = False) -> List[dict]:
+        """
+        The `limit` query shapes with the highest `sort` value (`max_ms`,
+        `total_ms`, `mean_ms`, `count` or `slow`).
+        """
+        with self._lock:
+            shapes = [dict(stats) for stats in self.shapes.values() if stats["slow"] or not slow_only]
+        for stats in shapes:
+            stats["mean_ms"] = stats["total_ms"] / stats["count"]
+        shapes.sort(key=lambda stats: stats[sort], reverse=True)
+        return shapes[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.shapes.clear()
+
+
+def explain_command(client, stats: dict) -> dict:
+    """
+    Explain the sample command of a query shape (`queryPlanner` verbosity: the command is not run).
+    """
+    command = {k: v for k, v in stats["sample"].items() if k not in SESSION_FIELDS}
+    return client[stats["database"]].command({"explain": command, "verbosity": "queryPlanner"})
+
+
+def explain_shape(client, stats: dict) -> str:
+    """
+    Explain the sample command of a query shape and summarize its plan.
+    """
+    if stats["operation"] not in EXPLAINABLE:
+        return "-"
+    return plan_summary(explain_command(client, stats))
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_command_monitor(mongo_uri: str = None, database_name: str = "test_db") -> CommandMonitor:
+    """
+    The process-wide command monitor, configured from the environment.
+
+    Args:
+        mongo_uri (str): The URI of the capped collection, for `MONGO_SLOW_LOG=collection`.
+        database_name (str): The database of the capped collection.
+    """
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            sink_type = os.getenv("MONGO_SLOW_LOG", "log")
+            path = os.getenv("MONGO_SLOW_LOG_PATH")
+            sink = None
+            if sink_type == "file" and not path:
+                logging.warning("MONGO_SLOW_LOG=file without MONGO_SLOW_LOG_PATH: the slow queries are logged")
+                sink_type = "log"
+            if sink_type == "log":
+                sink = SlowQueryLog()
+            elif sink_type == "file":
+                sink = SlowQueryFile(path)
+            elif sink_type == "collection" and mongo_uri:
+                sink = SlowQueryCollection(mongo_uri, database_name)
+            _monitor = CommandMonitor(slow_ms=float(os.getenv("MONGO_SLOW_MS", "100")), sink=sink)
+        return _monitor
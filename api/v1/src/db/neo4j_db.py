@@ -1,6 +1,8 @@
+from typing import Callable, Iterator, List, Union
 from neo4j import GraphDatabase, Transaction
 from src.utils.parsing import format_dict_for_cypher
 from src.utils.handlers import handle_db_operations
+from src.db.neo4j_profiling import get_query_profiler, profiled
 
 
 class Neo4jDB:
@@ -22,46 +24,342 @@ class Neo4jDB:
 
     def execute_write(self, func, **kwargs):
         with self._driver.session() as session:
-            return session.execute_write(func, **kwargs)
+            return session.execute_write(profiled(func), **kwargs)
 
     def execute_read(self, func, **kwargs):
         with self._driver.session() as session:
-            result = session.execute_read(func, **kwargs)
+            result = session.execute_read(profiled(func), **kwargs)
             # Vérifier si le résultat est vide
             if not result:
                 return None
             return result
 
 
+    def execute_auto(self, query: str, **params) -> list:
+        """
+        Run a query in an implicit (auto-commit) transaction.
+
+        `CALL {} IN TRANSACTIONS` is rejected inside managed transactions,
+        so batched writes have to go through this method.
+        """
+        profiler = get_query_profiler()
+        with self._driver.session() as session:
+            if profiler is not None:
+                return profiler.run(session, query, params).data()
+            return session.run(query, **params).data()
+
+    def stream(self, query: str, **params) -> Iterator[dict]:
+        """
+        Yield the records of a read query one by one, as the driver fetches them.
+
+        The session stays open until the generator is exhausted or closed.
+        """
+        with self._driver.session(default_access_mode="READ") as session:
+            for record in session.run(query, **params):
+                yield record.data()
+
     @handle_db_operations
-    def drop(self, label=None):
+    def drop(
+        self,
+        label: Union[str, List[str]] = None,
+        batch_size: int = 10000,
+        chunk_size: int = 100000,
+        on_progress: Callable[[str, int, int], None] = None,
+    ) -> dict:
         """
-        Delete all or certains nodes and relationships.
+        Delete all or certains nodes and relationships, in bounded batches.
+
+        Nodes are detached and deleted `batch_size` at a time with
+        `CALL {} IN TRANSACTIONS`, one auto-commit query per `chunk_size`
+        nodes. Every batch is committed on its own, so an interrupted drop
+        can be resumed by running it again: it only sees what is left.
 
         Args:
-            tx (Transaction): Neo4j transaction.
-            label (str): Label for the node.
+            label (Union[str, List[str]], optional): Label(s) to delete. Deletes every node if None.
+            batch_size (int): Number of nodes deleted per inner transaction.
+            chunk_size (int): Number of nodes handled per outer query, between two progress reports.
+            on_progress (Callable, optional): Called with (label, deleted, total) after each chunk.
 
         Returns:
-            dict: The result of the operation.
+            dict: The number of nodes deleted per label.
         """
+        labels = [label] if isinstance(label, str) else (label or [None])
+        deleted_by_label = {}
+
+        for current_label in labels:
+            match = f"MATCH (n:{current_label})" if current_label else "MATCH (n)"
+            total = self.execute_auto(f"{match} RETURN count(n) AS total")[0]["total"]
+            deleted = 0
+
+            while True:
+                query = (
+                    f"{match} WITH n LIMIT $chunk_size "
+                    "CALL { WITH n DETACH DELETE n } "
+                    "IN TRANSACTIONS OF $batch_size ROWS "
+                    "RETURN count(*) AS deleted"
+                )
+                result = self.execute_auto(
+                    query, chunk_size=chunk_size, batch_size=batch_size
+                )
+                chunk_deleted = result[0]["deleted"] if result else 0
+                if not chunk_deleted:
+                    break
+                deleted += chunk_deleted
+                if on_progress:
+                    on_progress(current_label or "*", deleted, total)
+
+            deleted_by_label[current_label or "*"] = deleted
+
+        return deleted_by_label
 
-        def delete_all(tx: Transaction):
-            query = f"MATCH (n) DETACH DELETE n"
-            result = tx.run(query)
-            return result.consume().counters
+    @handle_db_operations
+    def read_hashes(self, node_label: str, key_fields: tuple) -> dict:
+        """
+        Read the `content_hash` of every hashed node of a label.
 
-        def delete_label(tx: Transaction, label: str):
-            query = f"MATCH (n:{label}) DETACH DELETE n"
-            result = tx.run(query)
-            return result.consume().counters
+        Args:
+            node_label (str): Label for the nodes.
+            key_fields (tuple): Properties identifying a node.
 
-        if label:
-            result = self.execute_write(delete_label, label=label)
-            return result
+        Returns:
+            dict: The content hash of each node, by key tuple.
+        """
+        keys = ", ".join(f"n.{field} AS {field}" for field in key_fields)
+        query = (
+            f"MATCH (n:{node_label}) WHERE n.content_hash IS NOT NULL "
+            f"RETURN {keys}, n.content_hash AS content_hash"
+        )
+        records = self.execute_read(lambda tx: tx.run(query).data()) or []
+        return {
+            tuple(record[field] for field in key_fields): record["content_hash"]
+            for record in records
+        }
+
+    @handle_db_operations
+    def read_relationship_hashes(
+        self, start_node_label, start_key_fields, relation_type, end_node_label, end_key_fields
+    ) -> dict:
+        """
+        Read the `content_hash` of every hashed relationship of a type between two labels.
+
+        Returns:
+            dict: The content hash of each relationship, by (start key, end key).
+        """
+        start_keys = ", ".join(f"a.{field} AS start_{field}" for field in start_key_fields)
+        end_keys = ", ".join(f"b.{field} AS end_{field}" for field in end_key_fields)
+        query = (
+            f"MATCH (a:{start_node_label})-[r:{relation_type}]->(b:{end_node_label}) "
+            "WHERE r.content_hash IS NOT NULL "
+            f"RETURN {start_keys}, {end_keys}, r.content_hash AS content_hash"
+        )
+        records = self.execute_read(lambda tx: tx.run(query).data()) or []
+        return {
+            (
+                tuple(record[f"start_{field}"] for field in start_key_fields),
+                tuple(record[f"end_{field}"] for field in end_key_fields),
+            ): record["content_hash"]
+            for record in records
+        }
+
+    @handle_db_operations
+    def read_nodes(self, node_label: str) -> List[dict]:
+        """
+        Read the properties of every node of a label.
+
+        Args:
+            node_label (str): Label for the nodes.
+
+        Returns:
+            List[dict]: The properties of each node.
+        """
+        query = f"MATCH (n:{node_label}) RETURN properties(n) AS properties"
+        records = self.execute_read(lambda tx: tx.run(query).data()) or []
+        return [record["properties"] for record in records]
+
+    @handle_db_operations
+    def read_relationship_keys(
+        self, start_node_label, start_key_fields, relation_type, end_node_label, end_key_fields
+    ) -> List[tuple]:
+        """
+        Read the (start key, end key) of every relationship of a type between two labels.
+
+        Returns:
+            List[tuple]: The key tuples of the start and end node of each relationship.
+        """
+        start_keys = ", ".join(f"a.{field} AS start_{field}" for field in start_key_fields)
+        end_keys = ", ".join(f"b.{field} AS end_{field}" for field in end_key_fields)
+        query = (
+            f"MATCH (a:{start_node_label})-[:{relation_type}]->(b:{end_node_label}) "
+            f"RETURN {start_keys}, {end_keys}"
+        )
+        records = self.execute_read(lambda tx: tx.run(query).data()) or []
+        return [
+            (
+                tuple(record[f"start_{field}"] for field in start_key_fields),
+                tuple(record[f"end_{field}"] for field in end_key_fields),
+            )
+            for record in records
+        ]
+
+    @handle_db_operations
+    def read_section_questions(self, section_ids: List[str], with_options: bool = False) -> List[tuple]:
+        """
+        Read the questions of some sections, in order, in one query.
+
+        Args:
+            section_ids (List[str]): The ids of the sections.
+            with_options (bool): Also read the options of each question, ordered by text.
+
+        Returns:
+            List[tuple]: The (section id, question properties, option properties)
+                of each question, by section order then question order (the
+                options are None without `with_options`).
+        """
+        if with_options:
+            query = (
+                "MATCH (s:Section)-[:HAS_QUESTION]->(q:Question) WHERE s.id IN $section_ids "
+                "OPTIONAL MATCH (q)-[:HAS_OPTION]->(o:Option) "
+                "WITH s, q, o ORDER BY o.text "
+                "WITH s, q, collect(properties(o)) AS options "
+                "RETURN s.id AS section_id, properties(q) AS question, options "
+                "ORDER BY s.order, q.order"
+            )
         else:
-            result = self.execute_write(delete_all)
-            return result
+            query = (
+                "MATCH (s:Section)-[:HAS_QUESTION]->(q:Question) WHERE s.id IN $section_ids "
+                "RETURN s.id AS section_id, properties(q) AS question, null AS options "
+                "ORDER BY s.order, q.order"
+            )
+        records = self.execute_read(lambda tx: tx.run(query, section_ids=section_ids).data()) or []
+        return [(record["section_id"], record["question"], record["options"]) for record in records]
+
+    @handle_db_operations
+    def read_follow_ups(self, question_ids: List[str], hops: int) -> List[tuple]:
+        """
+        Read the questionnaire below some questions, in one bounded traversal:
+        the HAS_OPTION and LEADS_TO relationships of the paths of at most
+        `hops` relationships from them (Question -> Option -> Question -> ...).
+
+        Args:
+            question_ids (List[str]): The ids of the starting questions.
+            hops (int): The maximum length of the paths.
+
+        Returns:
+            List[tuple]: The (type, start properties, end properties) of each relationship.
+        """
+        query = (
+            "MATCH (q:Question) WHERE q.id IN $question_ids "
+            f"MATCH (q)-[rels:HAS_OPTION|LEADS_TO*1..{int(hops)}]->() "
+            "UNWIND rels AS r WITH DISTINCT r "
+            "RETURN type(r) AS type, properties(startNode(r)) AS start, properties(endNode(r)) AS end"
+        )
+        records = self.execute_read(lambda tx: tx.run(query, question_ids=question_ids).data()) or []
+        return [(record["type"], record["start"], record["end"]) for record in records]
+
+    @handle_db_operations
+    def merge_nodes(
+        self, node_label: str, key_fields: tuple, rows: List[dict], batch_size: int = 1000
+    ) -> int:
+        """
+        Create or replace nodes with UNWIND, one transaction per batch.
+
+        Args:
+            node_label (str): Label for the nodes.
+            key_fields (tuple): Properties identifying a node.
+            rows (List[dict]): The full properties of each node.
+            batch_size (int): Number of nodes per transaction.
+
+        Returns:
+            int: The number of nodes written.
+        """
+        match = ", ".join(f"{field}: row.{field}" for field in key_fields)
+        query = f"UNWIND $rows AS row MERGE (n:{node_label} {{{match}}}) SET n = row"
+        return self._write_batches(query, rows, batch_size)
+
+    @handle_db_operations
+    def delete_nodes(
+        self, node_label: str, key_fields: tuple, keys: List[tuple], batch_size: int = 1000
+    ) -> int:
+        """
+        Detach and delete nodes by key, one transaction per batch.
+
+        Returns:
+            int: The number of keys processed.
+        """
+        match = ", ".join(f"{field}: row.{field}" for field in key_fields)
+        query = f"UNWIND $rows AS row MATCH (n:{node_label} {{{match}}}) DETACH DELETE n"
+        rows = [dict(zip(key_fields, key)) for key in keys]
+        return self._write_batches(query, rows, batch_size)
+
+    @handle_db_operations
+    def merge_relationships(
+        self,
+        start_node_label,
+        start_key_fields,
+        relation_type,
+        end_node_label,
+        end_key_fields,
+        rows: List[dict],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Create or update relationships between existing nodes with UNWIND.
+
+        Args:
+            rows (List[dict]): The `start` and `end` node keys and the `properties` of each relationship.
+
+        Returns:
+            int: The number of relationships written.
+        """
+        start_match = ", ".join(f"{field}: row.start.{field}" for field in start_key_fields)
+        end_match = ", ".join(f"{field}: row.end.{field}" for field in end_key_fields)
+        query = (
+            "UNWIND $rows AS row "
+            f"MATCH (a:{start_node_label} {{{start_match}}}) "
+            f"MATCH (b:{end_node_label} {{{end_match}}}) "
+            f"MERGE (a)-[r:{relation_type}]->(b) "
+            "SET r = row.properties"
+        )
+        return self._write_batches(query, rows, batch_size)
+
+    @handle_db_operations
+    def delete_relationships(
+        self,
+        start_node_label,
+        start_key_fields,
+        relation_type,
+        end_node_label,
+        end_key_fields,
+        keys: List[tuple],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Delete relationships by (start key, end key), one transaction per batch.
+
+        Returns:
+            int: The number of keys processed.
+        """
+        start_match = ", ".join(f"{field}: row.start.{field}" for field in start_key_fields)
+        end_match = ", ".join(f"{field}: row.end.{field}" for field in end_key_fields)
+        query = (
+            "UNWIND $rows AS row "
+            f"MATCH (a:{start_node_label} {{{start_match}}})"
+            f"-[r:{relation_type}]->(b:{end_node_label} {{{end_match}}}) "
+            "DELETE r"
+        )
+        rows = [
+            {"start": dict(zip(start_key_fields, start)), "end": dict(zip(end_key_fields, end))}
+            for start, end in keys
+        ]
+        return self._write_batches(query, rows, batch_size)
+
+    def _write_batches(self, query: str, rows: List[dict], batch_size: int) -> int:
+        def write_batch(tx: Transaction, batch: List[dict]):
+            tx.run(query, rows=batch).consume()
+
+        for start in range(0, len(rows), batch_size):
+            self.execute_write(write_batch, batch=rows[start:start + batch_size])
+        return len(rows)
 
     @handle_db_operations
     def create_index(self, node_label: str, property_name: str) -> dict:
@@ -87,6 +385,22 @@ class Neo4jDB:
         )
         return index
 
+    @handle_db_operations
+    def ensure_index(self, node_label: str, property_names: tuple) -> dict:
+        """
+        Create a (composite) range index on a node label if it does not exist yet.
+
+        Args:
+            node_label (str): Label for the node.
+            property_names (tuple): Properties to index.
+
+        Returns:
+            dict: The result of the operation.
+        """
+        properties = ", ".join(f"n.{name}" for name in property_names)
+        query = f"CREATE INDEX IF NOT EXISTS FOR (n:{node_label}) ON ({properties})"
+        return self.execute_write(lambda tx: tx.run(query).consume().counters)
+
     def create_node(
         self, tx: Transaction, node_label: str, properties: dict, identifier: str = "id"
     ) -> dict:
@@ -131,7 +445,6 @@ class Neo4jDB:
         
         # Construction de la requête Cypher
         query = f"MATCH (u:{node_label} {properties}) RETURN u"
-        print(query)
         # Ajout des fonctionnalités de tri et de limitation
         if sort is not None:
             field, order = sort
@@ -301,8 +614,6 @@ class Neo4jDB:
             "RETURN a, type(r) AS relationType, b"
         )
 
-        print(query)
-
         result = tx.run(query)
 
         if many:
@@ -0,0 +1,246 @@
+"""
+Neo4j query profiling.
+
+Opt-in with `NEO4J_PROFILE=1`: the transactions of `Neo4jDB` are then
+wrapped in a `ProfiledTransaction`, and every query they run is timed and
+aggregated per query template, the query with its literal values replaced by
+"?" (the queries of `Neo4jDB` inline their properties, so `{id: 'q1'}` and
+`{id: 'q2'}` are the same template).
+
+- A sample of the queries (`NEO4J_PROFILE_SAMPLE`, default 0.01) runs with
+  `PROFILE`: their db hits, rows and plan operators are recorded;
+- the queries slower than `NEO4J_SLOW_MS` (default 100) are logged, with the
+  shape of their parameters, as JSON lines on the `gocod.neo4j.slow` logger.
+
+Each template keeps its last query as a sample, to be explained, with its
+parameters trimmed to the first item of each list (one row of an UNWIND
+batch is enough for a plan). The templates are served by `GET /v1/admin/neo4j/queries`.
+"""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger("gocod.neo4j.slow")
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER_LITERAL = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?(?![\w.])")
+LIST_LITERAL = re.compile(r"\[\?(?:, \?)*\]")
+# Queries PROFILE cannot be prefixed to.
+NOT_PROFILEABLE = re.compile(r"^\s*(?:PROFILE|EXPLAIN|CREATE (?:INDEX|CONSTRAINT)|DROP|SHOW)\b|IN TRANSACTIONS",
+                             re.IGNORECASE)
+
+
+def query_template(query: str) -> str:
+    """
+    The template of a query: whitespace normalized, literals replaced by "?".
+    """
+    template = STRING_LITERAL.sub("?", " ".join(query.split()))
+    template = NUMBER_LITERAL.sub("?", template)
+    return LIST_LITERAL.sub("[?]", template)
+
+
+def parameter_shape(params: dict) -> dict:
+    """
+    The shape of query parameters: the type of each value (`list[dict]` for a list).
+    """
+    shape = {}
+    for name, value in params.items():
+        kind = type(value).__name__
+        if isinstance(value, (list, tuple)):
+            kind = f"list[{type(value[0]).__name__}]" if value else "list"
+        shape[name] = kind
+    return shape
+
+
+def parameter_sample(params: dict) -> dict:
+    """
+    The parameters kept with the sample of a template: the first item of each list.
+    """
+    return {name: list(value[:1]) if isinstance(value, (list, tuple)) else value for name, value in params.items()}
+
+
+def plan_operators(plan, depth: int = 0) -> List[dict]:
+    """
+    The operators of a profiled plan, depth first, with their db hits and rows.
+    """
+    if not plan:
+        return []
+    operator = {
+        "operator": plan.get("operatorType", "?").split("@")[0],
+        "depth": depth,
+        "db_hits": plan.get("dbHits", 0),
+        "rows": plan.get("rows", 0),
+    }
+    operators = [operator]
+    for child in plan.get("children", []):
+        operators.extend(plan_operators(child, depth + 1))
+    return operators
+
+
+class ProfiledResult:
+    """
+    The result of a profiled query, fetched in full: it supports the `Result`
+    methods `Neo4jDB` uses.
+    """
+
+    def __init__(self, records: list, summary):
+        self._records = records
+        self._summary = summary
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def data(self) -> List[dict]:
+        return [record.data() for record in self._records]
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def consume(self):
+        return self._summary
+
+
+class ProfiledTransaction:
+    """
+    A transaction whose queries are run by a `QueryProfiler`.
+    """
+
+    def __init__(self, tx, profiler: "QueryProfiler"):
+        self._tx = tx
+        self._profiler = profiler
+
+    def run(self, query: str, parameters: dict = None, **kwargs) -> ProfiledResult:
+        return self._profiler.run(self._tx, query, {**(parameters or {}), **kwargs})
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+class QueryProfiler:
+    """
+    Class to time the Neo4j queries, profile a sample of them, and aggregate
+    them per query template.
+    """
+
+    def __init__(self, sample_rate: float = 0.01, slow_ms: float = 100, max_templates: int = 1000):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_templates = max_templates
+        self.templates = {}
+        self._lock = threading.Lock()
+
+    def run(self, tx, query: str, params: dict) -> ProfiledResult:
+        """
+        Run a query on `tx` and record it, with `PROFILE` if it is sampled.
+        """
+        profile = random.random() < self.sample_rate and not NOT_PROFILEABLE.search(query)
+        start = time.perf_counter()
+        result = tx.run(f"PROFILE {query}" if profile else query, params)
+        records = list(result)
+        summary = result.consume()
+        duration_ms = 1000 * (time.perf_counter() - start)
+        plan = getattr(summary, "profile", None) if profile else None
+        self.record(query, params, duration_ms, len(records), plan, profile)
+        return ProfiledResult(records, summary)
+
+    def record(self, query: str, params: dict, duration_ms: float, rows: int, plan: dict = None,
+               profiled: bool = False):
+        template = query_template(query)
+        slow = duration_ms >= self.slow_ms
+        operators = plan_operators(plan) if plan else None
+
+        with self._lock:
+            stats = self.templates.get(template)
+            if stats is None:
+                if len(self.templates) >= self.max_templates:
+                    return
+                stats = self.templates[template] = {
+                    "template": template,
+                    "parameters": parameter_shape(params),
+                    "count": 0,
+                    "slow": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "profiled": 0,
+                    "db_hits": 0,
+                    "operators": None,
+                    "sample": None,
+                }
+            stats["count"] += 1
+            stats["slow"] += slow
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["rows"] += rows
+            stats["sample"] = {"query": query, "parameters": parameter_sample(params)}
+            if profiled:
+                stats["profiled"] += 1
+            if operators:
+                stats["db_hits"] += sum(operator["db_hits"] for operator in operators)
+                stats["operators"] = operators
+
+        if slow:
+            logger.warning(json.dumps({
+                "template": template,
+                "parameters": parameter_shape(params),
+                "duration_ms": round(duration_ms, 3),
+                "rows": rows,
+            }))
+
+    def top(self, limit: int = 10, sort: str = "total_ms") -> List[dict]:
+        """
+        The `limit` query templates with the highest `sort` value (`total_ms`,
+        `max_ms`, `mean_ms`, `count`, `slow` or `db_hits_per_query`).
+        """
+        with self._lock:
+            templates = [dict(stats) for stats in self.templates.values()]
+        for stats in templates:
+            stats["mean_ms"] = stats["total_ms"] / stats["count"]
+            stats["db_hits_per_query"] = stats["db_hits"] / stats["profiled"] if stats["profiled"] else None
+        templates.sort(key=lambda stats: stats[sort] or 0, reverse=True)
+        return templates[:limit]
+
+    def reset(self):
+        with self._lock:
+            self.templates.clear()
+
+
+_profiler = None
+_configured = False
+_profiler_lock = threading.Lock()
+
+
+def get_query_profiler() -> Optional[QueryProfiler]:
+    """
+    The process-wide query profiler, or None unless `NEO4J_PROFILE=1`.
+    """
+    global _profiler, _configured
+    if not _configured:
+        with _profiler_lock:
+            if not _configured:
+                if os.getenv("NEO4J_PROFILE", "0") == "1":
+                    _profiler = QueryProfiler(
+                        sample_rate=float(os.getenv("NEO4J_PROFILE_SAMPLE", "0.01")),
+                        slow_ms=float(os.getenv("NEO4J_SLOW_MS", "100")),
+                    )
+                _configured = True
+    return _profiler
+
+
+def profiled(func):
+    """
+    Wrap a transaction function to run its queries on a `ProfiledTransaction`,
+    when profiling is enabled.
+    """
+    profiler = get_query_profiler()
+    if profiler is None:
+        return func
+
+    def profiled_func(tx, *args, **kwargs):
+        return func(ProfiledTransaction(tx, profiler), *args, **kwargs)
+    return profiled_func
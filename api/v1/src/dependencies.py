@@ -1,10 +1,12 @@
 import os
+import threading
 from dotenv import load_dotenv
 
 from pymongo import MongoClient,errors
 from pymongo.server_api import ServerApi
 from src.db.mongo_db import MongoDB
 from src.db.neo4j_db import Neo4jDB
+from src.db.monitoring import get_command_monitor
 
 
 load_dotenv()
@@ -15,7 +17,13 @@ uri = os.getenv("URI","neo4j://34.163.193.20:7687")
 user = os.getenv("USER", "neo4j")
 password = os.getenv("PASSWORD","izaga_neo4j")
 
+# "memory" swaps both databases for the in-memory backends of src.db.memory_db
+db_backend = os.getenv("DB_BACKEND", "remote")
+
 def get_neo4j_db():
+    if db_backend == "memory":
+        from src.db.memory_db import get_memory_neo4j_db
+        return get_memory_neo4j_db()
     # TODO(neo4j): Create Neo4j database connection.
     # You can use the Neo4jDB class for this task.
     # Refer to Neo4j documentation: https://neo4j.com/docs/driver-manual/current/client-applications/
@@ -28,10 +36,16 @@ def get_neo4j_db():
 
 
 def get_mongo_db(database_name="test_db"):
+    if db_backend == "memory":
+        from src.db.memory_db import get_memory_mongo_db
+        return get_memory_mongo_db(database_name)
     if mongo_uri is None:
         raise EnvironmentError("La variable d'environnement 'MONGO_URI' n'est pas définie.")
     # Connexion au client MongoDB en utilisant l'URI
-    client = MongoClient(mongo_uri, server_api=ServerApi('1'))
+    # Every command is recorded by the command monitor (see src.db.monitoring)
+    monitor = get_command_monitor(mongo_uri, database_name)
+    client = MongoClient(mongo_uri, server_api=ServerApi('1'), event_listeners=[monitor])
+    monitor.client = client
     
  
     # Tentative de récupération d'une liste de bases de données pour tester la connexion
@@ -47,3 +61,23 @@ def get_mongo_db(database_name="test_db"):
     dbs=MongoDB(db)
     
     return dbs
+
+
+_questionnaire_service = None
+_questionnaire_lock = threading.Lock()
+
+
+def get_questionnaire_service():
+    """
+    The questionnaire service shared by the routers (offloaded): one bundle
+    cache and one version history, so that every route answers with the
+    same questionnaire version.
+    """
+    global _questionnaire_service
+    with _questionnaire_lock:
+        if _questionnaire_service is None:
+            # Imported here: the services import the database modules.
+            from src.services.questionnaire_service import QuestionnaireService
+            from src.utils.concurrency import offloaded
+            _questionnaire_service = offloaded(QuestionnaireService(get_neo4j_db()))
+    return _questionnaire_service
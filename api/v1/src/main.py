@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .routers import projects, users, templates, sections 
+from .routers import admin, projects, users, templates, sections, questionnaire
 
 
 router = APIRouter()
@@ -8,3 +8,5 @@ router.include_router(users.router, prefix="/users", tags=["users"])
 router.include_router(projects.router, prefix="/projects", tags=["projects"])
 router.include_router(templates.router, prefix="/templates", tags=["templates"])
 router.include_router(sections.router, prefix="/sections", tags=["sections"])
+router.include_router(questionnaire.router, prefix="/questionnaire", tags=["questionnaire"])
+router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Union
+
+
+class AnswerSet(BaseModel):
+    # the option text(s) chosen, or the text typed, for each question id
+    answers: Dict[str, Union[str, List[str]]]
+
+
+class ResolvedQuestion(BaseModel):
+    id: str
+    statement: Optional[str] = Field(None)
+    question_type: Optional[str] = Field(None)
+    section_id: Optional[str] = Field(None)
+    order: Optional[int] = Field(None)
+    required: Optional[bool] = Field(None)
+    is_first: Optional[bool] = Field(None)
+    answer: Optional[List[str]] = Field(None)
+
+
+class Resolution(BaseModel):
+    version: str
+    questions: List[ResolvedQuestion]
+    missing: List[str]
+    unreachable_answers: List[str]
+    invalid_answers: Dict[str, List[str]]
+    complete: bool
@@ -0,0 +1,196 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from src.db.monitoring import explain_shape, get_command_monitor
+from src.db.neo4j_profiling import get_query_profiler
+from src.utils import concurrency, memory, profiling
+from src.utils.oauth import require_admin
+from src.utils.timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute, dependencies=[Depends(require_admin)])
+
+
+@router.get("/mongo/slow-queries")
+def get_mongo_slow_queries(
+    limit: int = Query(10, ge=1, le=100),
+    sort: Literal["max_ms", "total_ms", "mean_ms", "count", "slow"] = "max_ms",
+    slow_only: bool = False,
+    explain: bool = False,
+):
+    """
+    Get the slowest MongoDB query shapes recorded by the command monitor.
+
+    Args:
+        limit (int): The number of query shapes.
+        sort (str): The statistic to sort on.
+        slow_only (bool): Only the shapes with commands over the slow threshold.
+        explain (bool): Add the plan summary of each shape (runs an explain per shape).
+
+    Returns:
+        dict: The slow threshold and the query shapes.
+    """
+    monitor = get_command_monitor()
+    shapes = monitor.top(limit, sort, slow_only)
+    for stats in shapes:
+        sample = stats.pop("sample")
+        if explain:
+            if monitor.client is None:
+                raise HTTPException(status_code=409, detail="No MongoDB client is monitored")
+            try:
+                stats["plan"] = explain_shape(monitor.client, {**stats, "sample": sample})
+            except Exception as e:
+                stats["plan"] = f"explain failed: {e}"
+    return {"slow_ms": monitor.slow_ms, "shapes": shapes}
+
+
+@router.get("/neo4j/queries")
+def get_neo4j_queries(
+    limit: int = Query(10, ge=1, le=100),
+    sort: Literal["total_ms", "max_ms", "mean_ms", "count", "slow", "db_hits_per_query"] = "total_ms",
+):
+    """
+    Get the Neo4j query templates recorded by the query profiler (`NEO4J_PROFILE=1`).
+
+    Args:
+        limit (int): The number of query templates.
+        sort (str): The statistic to sort on.
+
+    Returns:
+        dict: The profiler settings and the query templates.
+    """
+    profiler = get_query_profiler()
+    if profiler is None:
+        return {"enabled": False, "templates": []}
+    return {
+        "enabled": True,
+        "sample_rate": profiler.sample_rate,
+        "slow_ms": profiler.slow_ms,
+        "templates": [
+            {k: v for k, v in stats.items() if k != "sample"} for stats in profiler.top(limit, sort)
+        ],
+    }
+
+
+@router.get("/profiles")
+def list_profiles():
+    """
+    List the request profiles kept in memory, the last first (see `src.utils.profiling`).
+    """
+    return profiling.store.list()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: Literal["raw", "text"] = "raw", limit: int = Query(50, ge=1)):
+    """
+    Get a request profile.
+
+    Args:
+        profile_id (str): The `X-Profile-Id` of the profiled response.
+        format (str): `raw` for the collapsed stacks or the pstats file, `text` for
+            the `print_stats` report of a pstats profile.
+        limit (int): The number of functions of the `text` report.
+
+    Returns:
+        Response: The profile.
+    """
+    entry = profiling.store.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if entry["mode"] == "collapsed":
+        return PlainTextResponse(entry["data"])
+    if format == "text":
+        return PlainTextResponse(profiling.pstats_text(entry["data"], limit=limit))
+    return Response(
+        entry["data"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
+
+@router.get("/memory")
+def get_memory_status():
+    """
+    Get the tracemalloc status and the snapshots taken (see `src.utils.memory`).
+    """
+    return memory.status()
+
+
+@router.post("/memory/start")
+def start_memory_tracing(frames: int = Query(25, ge=1, le=100)):
+    """
+    Start tracing the allocations, keeping `frames` frames per allocation.
+    """
+    memory.start(frames)
+    return memory.status()
+
+
+@router.post("/memory/stop")
+def stop_memory_tracing():
+    """
+    Stop tracing the allocations, and drop the snapshots.
+    """
+    memory.stop()
+    return memory.status()
+
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot(
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """
+    Take a heap snapshot.
+
+    Returns:
+        dict: The snapshot id and totals, and its top allocating call sites.
+    """
+    try:
+        info = memory.snapshots.take()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {**info, "top": memory.top(memory.snapshots.get(info["id"]), group_by, limit)}
+
+
+@router.get("/memory/snapshots/{snapshot_id}")
+def get_memory_snapshot(
+    snapshot_id: int,
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """
+    Get the top allocating call sites of a snapshot.
+    """
+    snapshot = memory.snapshots.get(snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return memory.top(snapshot, group_by, limit)
+
+
+@router.get("/memory/diff")
+def diff_memory_snapshots(
+    base: int,
+    target: int,
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """
+    Get the call sites whose memory changed the most between two snapshots.
+
+    Args:
+        base (int): The id of the first snapshot.
+        target (int): The id of the second snapshot.
+    """
+    base_snapshot, target_snapshot = memory.snapshots.get(base), memory.snapshots.get(target)
+    if base_snapshot is None or target_snapshot is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return memory.diff(base_snapshot, target_snapshot, group_by, limit)
+
+
+@router.get("/event-loop")
+def get_event_loop_status():
+    """
+    Get the event-loop lag, its last stalls with the blocking stack and route,
+    and the service thread pool (see `src.utils.concurrency`).
+    """
+    monitor = concurrency.monitor
+    return {"monitor": monitor.status() if monitor else None, "pool": concurrency.pool_status()}
@@ -0,0 +1,45 @@
+"""
+Questionnaire routes.
+"""
+import os
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.dependencies import get_questionnaire_service
+from src.utils.serialization import FastJSONResponse
+from src.utils.timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+questionnaire_service = get_questionnaire_service()
+MAX_AGE = int(os.getenv("QUESTIONNAIRE_MAX_AGE", "300"))
+
+
+def _cache_headers(version: str) -> dict:
+    # Served from the cache for MAX_AGE, then revalidated with the ETag (a 304
+    # while the version is unchanged); a stale copy is usable for a day
+    # while it is revalidated.
+    return {
+        "ETag": f'W/"{version}"',
+        "Cache-Control": f"public, max-age={MAX_AGE}, stale-while-revalidate=86400",
+    }
+
+
+@router.get("/")
+async def get_questionnaire(since: Optional[str] = None):
+    """
+    Get the whole questionnaire (sections, questions, options and the
+    questions each option leads to) as one bundle, with its `version`.
+
+    With `since=<version>`, only the sections and questions that changed
+    since that version, and the ids of the removed ones. When the version is
+    unknown (too old), the whole bundle is returned.
+    """
+    if since is not None:
+        delta = await questionnaire_service.get_delta(since)
+        if delta is not None:
+            headers = _cache_headers(f"{since}-{delta['version']}")
+            return FastJSONResponse(delta, headers=headers)
+    current = await questionnaire_service.current()
+    return Response(current["body"], media_type="application/json", headers=_cache_headers(current["version"]))
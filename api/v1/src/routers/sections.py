@@ -1,21 +1,27 @@
 # app/api/routes/projects.py
 import os
-from typing import List
-from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 from src.models.question import Question
 from src.models.option import Option
 from src.models.section import Section
-from src.dependencies import get_neo4j_db
+from src.models.questionnaire import AnswerSet, Resolution
+from src.dependencies import get_neo4j_db, get_questionnaire_service
 from src.services.sections_service import SectionService
+from src.utils.concurrency import offloaded
+from src.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 neo4j = get_neo4j_db()
-sections_service = SectionService(neo4j)
+sections_service = offloaded(SectionService(neo4j))
+questionnaire_service = get_questionnaire_service()
+# Deepest look-ahead of `prefetch`: the traversal grows with the branching of the questionnaire.
+MAX_PREFETCH_DEPTH = int(os.getenv("PREFETCH_MAX_DEPTH", "3"))
 
 
 @router.get("/", response_model=List[Section])
 async def get_sections() -> Section:
-    sections = sections_service.get_sections()
+    sections = await sections_service.get_sections()
     if sections is None:
         raise HTTPException(status_code=404, detail="Section not found")
     return sections
@@ -24,7 +30,7 @@ async def get_sections() -> Section:
 async def find_section_by_property(
     property: str, value: str
 ) -> Section:
-    section = sections_service.get_section_by_property(property, value)
+    section = await sections_service.get_section_by_property(property, value)
     if section is None:
         raise HTTPException(status_code=404, detail="Section not found")
     return section
@@ -32,17 +38,21 @@ async def find_section_by_property(
 
 @router.get("/{section_id}/next-section", response_model=Section)
 async def get_next_section(section_id: str) -> Section:
-    next_section = sections_service.get_next_section(section_id)
+    next_section = await sections_service.get_next_section(section_id)
     if next_section is None:
         raise HTTPException(status_code=404, detail="Next section not found")
     return next_section
 
 @router.get("/next-questions", response_model=List[Question])
 async def get_next_questions(
-    question_id: str, option_text: str
+    question_id: str, option_text: str, prefetch: int = Query(0, ge=0, le=MAX_PREFETCH_DEPTH)
 ) -> List[Question]:
-    
-    questions = sections_service.get_next_questions(question_id, option_text)
+    """
+    Get the questions an option leads to. With `prefetch=N`, each of their
+    options also holds the questions it leads to, N answers ahead.
+    """
+    questions = await sections_service.get_next_questions(question_id, option_text)
+    questions = await sections_service.prefetch_follow_ups(questions, prefetch)
 
     if questions is None or len(questions) == 0:
         raise HTTPException(
@@ -54,10 +64,18 @@ async def get_next_questions(
 
 @router.get("/{section_id}/questions", response_model=List[Question])
 async def get_questions_for_section(
-    section_id: str
+    section_id: str,
+    include: Optional[Literal["options"]] = None,
+    prefetch: int = Query(0, ge=0, le=MAX_PREFETCH_DEPTH),
 ) -> List[Question]:
-    
-    questions = sections_service.get_questions_for_section(section_id)
+    """
+    Get the questions of a section, in order. With `include=options`, each
+    question holds its options, read in the same query. With `prefetch=N`,
+    they hold their options, each with the questions it leads to, N answers
+    ahead.
+    """
+    questions = await sections_service.get_questions_for_section(section_id, include == "options")
+    questions = await sections_service.prefetch_follow_ups(questions, prefetch)
 
     if questions is None or len(questions) == 0:
         raise HTTPException(
@@ -67,4 +85,11 @@ async def get_questions_for_section(
     return questions
 
 
-
+@router.post("/resolve", response_model=Resolution)
+async def resolve_answers(answer_set: AnswerSet) -> Resolution:
+    """
+    Resolve a whole answer set: the questions reachable under the answers,
+    in order, the required ones left unanswered, and the answers to
+    unreachable questions or to options that do not exist.
+    """
+    return await questionnaire_service.resolve(answer_set.answers)
@@ -5,16 +5,20 @@ from fastapi import APIRouter, HTTPException
 
 from src.models.template import TemplateInsertFields, TemplateReadFields
 from src.dependencies import get_mongo_db, get_neo4j_db
-from src.utils.parsing import parse_mongo_id
+from src.utils.serialization import TrustedSerializer
 from src.services.templates_service import TemplateService
+from src.utils.concurrency import offloaded
+from src.utils.timing import TimedRoute
 
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 mongo = get_mongo_db()
 neo4j = get_neo4j_db()
-template_service = TemplateService(mongo, 
-                                #    neo4j
-                                   )
+template_service = offloaded(TemplateService(mongo,
+                                             #    neo4j
+                                             ))
+templates_serializer = TrustedSerializer(TemplateReadFields, "template")
+user_templates_serializer = TrustedSerializer(TemplateReadFields)
 
 
 @router.post("/", response_model=TemplateReadFields)
@@ -23,7 +27,7 @@ async def create_template_endpoint(template: TemplateInsertFields):
     Create a new template.
     """
     template_data = template.model_dump()
-    created_template_dict = template_service.create_template(template_data).get(
+    created_template_dict = (await template_service.create_template(template_data)).get(
         "result"
     )
     if created_template_dict is None:
@@ -40,10 +44,10 @@ async def get_templates_endpoint(user_id: str = None):
     """
     Get all public/private templates.
     """
-    templates = template_service.list_templates(user_id).get("result")
+    templates = (await template_service.list_templates(user_id)).get("result")
     if user_id is None:
-        templates = parse_mongo_id(templates, "template")
-    return templates
+        return templates_serializer.response(templates)
+    return user_templates_serializer.response(templates)
 
 
 @router.get("/{template_id}", response_model=TemplateReadFields)
@@ -51,17 +55,17 @@ async def get_template_endpoint(template_id: str, user_id: str = None):
     """
     Get a template by id.
     """
-    template = template_service.read_template(template_id, user_id=user_id).get(
+    template = (await template_service.read_template(template_id, user_id=user_id)).get(
         "result"
     )
-    if user_id is not None:
+    if template is not None and user_id is not None:
         template = template['templates'][0]
     print(f"Template: {template}")
-    if user_id is None:
-        template = parse_mongo_id(template, "template")
     if template is None:
         raise HTTPException(status_code=404, detail="template not found")
-    return template
+    if user_id is None:
+        return templates_serializer.response(template)
+    return user_templates_serializer.response(template)
 
 
 @router.delete("/{template_id}", response_model=dict)
@@ -69,9 +73,9 @@ async def delete_template_endpoint(template_id: str, user_id: str = None):
     """
     Delete a template by id.
     """
-    deleted_template = template_service.delete_template(
+    deleted_template = (await template_service.delete_template(
         template_id, user_id=user_id
-    ).get("result")
+    )).get("result")
 
     # deleted_template = mongo_delete_template(template_id)
     if deleted_template is None:
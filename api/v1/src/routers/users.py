@@ -9,8 +9,9 @@ from src.models.user import LoginResponse, SignUpResponse, UserLogged, UserSignU
 from src.utils.jwttoken import create_access_token
 from src.utils.parsing import parse_mongo_id
 from src.services.users_service import UserService
+from src.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 db = get_mongo_db()
 user_service = UserService(db)
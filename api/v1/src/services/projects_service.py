@@ -244,7 +244,6 @@ class ProjectService:
             """
             params = {'project_id': project_id}
             result = tx.run(query, params)
-            print(query)
             return result.data()
 
         templates = self.neo4j.execute_read(find_recommended_templates, project_id=project_id)
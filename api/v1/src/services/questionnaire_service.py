@@ -0,0 +1,266 @@
+"""
+Questionnaire Service
+"""
+import collections
+import os
+import threading
+import time
+from typing import Optional
+
+from src.db.ingestion.graph import content_hash
+from src.db.ingestion.validation import INDEX_LABEL, build_index, decode_index, edges_hash
+from src.db.neo4j_db import Neo4jDB
+from src.utils.concurrency import single_flight
+from src.utils.serialization import dumps
+
+# Properties of the graph that are not part of the bundle.
+INTERNAL_FIELDS = ("content_hash",)
+VERSION_LENGTH = 16
+
+
+def _public(properties: dict, *excluded: str) -> dict:
+    return {k: v for k, v in properties.items() if k not in INTERNAL_FIELDS and k not in excluded}
+
+
+def build_bundle(sections: list, questions: list, options: list, leads_to: list, index: dict = None) -> dict:
+    """
+    Build the questionnaire bundle from the graph.
+
+    Args:
+        sections (list): The properties of the Section nodes.
+        questions (list): The properties of the Question nodes.
+        options (list): The properties of the Option nodes.
+        leads_to (list): The ((question_id, option text), (question id,)) keys of the LEADS_TO relationships.
+        index (dict, optional): The properties of the QuestionnaireIndex node stored by the
+            ingestion; recomputed when absent, or built from other questions or LEADS_TO.
+
+    Returns:
+        dict: The sections in order, each with the ids of its questions in
+            order, the questions by id, each with its options, the ids of the
+            questions each option leads to and the ids of every question
+            reachable from it (`reachable`), and the question ids in
+            topological `order`.
+    """
+    next_questions = collections.defaultdict(list)
+    for (question_id, text), (next_id,) in leads_to:
+        next_questions[(question_id, text)].append(next_id)
+
+    # by question id and text: the option nodes duplicated with partial properties are merged
+    options_by_question = collections.defaultdict(dict)
+    for option in options:
+        key = (option.get("question_id"), option.get("text"))
+        entry = options_by_question[key[0]].setdefault(key[1], {})
+        entry.update(_public(option, "question_id"))
+        entry["next"] = sorted(set(next_questions.get(key, [])))
+
+    questions_by_section = collections.defaultdict(list)
+    bundle_questions = {}
+    for question in sorted(questions, key=lambda q: (q.get("order") or 0, q.get("id"))):
+        entry = _public(question)
+        entry["options"] = sorted(options_by_question.get(question.get("id"), {}).values(),
+                                  key=lambda o: str(o.get("text")))
+        bundle_questions[question.get("id")] = entry
+        questions_by_section[question.get("section_id")].append(question.get("id"))
+
+    bundle_sections = {}
+    for section in sorted(sections, key=lambda s: (s.get("order") or 0, s.get("id"))):
+        entry = _public(section)
+        entry["questions"] = questions_by_section.get(section.get("id"), [])
+        bundle_sections[section.get("id")] = entry
+
+    edges = [(question_id, next_id) for (question_id, _), (next_id,) in leads_to]
+    topology = decode_index(index) if index and index.get("edges_hash") == edges_hash(edges) else None
+    if topology is None or set(topology["order"]) != set(bundle_questions):
+        topology = decode_index(build_index(sections, questions, edges) or {})
+    for question_id, entry in bundle_questions.items():
+        entry["reachable"] = topology["reachable"].get(question_id, [])
+
+    return {"sections": bundle_sections, "questions": bundle_questions, "order": topology["order"]}
+
+
+def entity_hashes(bundle: dict) -> dict:
+    """
+    The content hash of each section and question of a bundle, by (kind, id).
+    """
+    return {
+        (kind, entity_id): content_hash(entity)
+        for kind in ("sections", "questions")
+        for entity_id, entity in bundle[kind].items()
+    }
+
+
+def bundle_version(hashes: dict) -> str:
+    """
+    The version of a bundle: a hash of the hashes of its entities.
+    """
+    return content_hash(sorted(f"{kind}:{entity_id}:{digest}" for (kind, entity_id), digest in hashes.items()))[
+        :VERSION_LENGTH
+    ]
+
+
+def resolve(bundle: dict, answers: dict) -> dict:
+    """
+    Resolve a whole answer set against a questionnaire bundle, in one pass
+    over its questions in topological order.
+
+    The questions no option leads to are always reachable; the others are
+    reachable when a chosen option of a reachable question leads to them:
+    in topological order, the questions leading to a question are resolved
+    before it.
+
+    Args:
+        bundle (dict): The questionnaire bundle (see `build_bundle`).
+        answers (dict): The option texts (a text or a list of texts) chosen for each question id.
+
+    Returns:
+        dict: The reachable `questions` in questionnaire order, with their
+            `answer`; the reachable required questions without an answer
+            (`missing`); the answers to unknown or unreachable questions
+            (`unreachable_answers`); the answers that are not options of
+            their question (`invalid_answers`); and whether the answer set is
+            `complete` (nothing missing).
+    """
+    questions = bundle["questions"]
+    sections = bundle["sections"]
+    answers = {question_id: [value] if isinstance(value, str) else list(value)
+               for question_id, value in answers.items()}
+
+    led_to = {next_id for question in questions.values()
+              for option in question["options"] for next_id in option["next"]}
+    reachable = {question_id for question_id in questions if question_id not in led_to}
+    invalid = {}
+    for question_id in bundle.get("order") or questions:
+        if question_id not in reachable:
+            continue
+        question = questions[question_id]
+        chosen = answers.get(question_id)
+        if not chosen or not question["options"]:
+            continue
+        options = {option["text"]: option for option in question["options"]}
+        unknown = [text for text in chosen if text not in options]
+        if unknown:
+            invalid[question_id] = unknown
+        for text in chosen:
+            reachable.update(next_id for next_id in options.get(text, {}).get("next", ()) if next_id in questions)
+
+    def position(question_id):
+        question = questions[question_id]
+        section = sections.get(question.get("section_id")) or {}
+        return (section.get("order", float("inf")), question.get("order") or 0, question_id)
+
+    resolved = []
+    for question_id in sorted(reachable, key=position):
+        entry = {k: v for k, v in questions[question_id].items() if k != "options"}
+        entry["answer"] = answers.get(question_id)
+        resolved.append(entry)
+    missing = [entry["id"] for entry in resolved if entry.get("required") and not entry["answer"]]
+    return {
+        "version": bundle.get("version"),
+        "questions": resolved,
+        "missing": missing,
+        "unreachable_answers": sorted(question_id for question_id in answers if question_id not in reachable),
+        "invalid_answers": invalid,
+        "complete": not missing,
+    }
+
+
+class QuestionnaireService:
+    """
+    Class to serve the questionnaire as one versioned bundle.
+
+    The bundle is read from the graph at most every `ttl` seconds
+    (`QUESTIONNAIRE_TTL`, default 60). The entity hashes of the last `keep`
+    versions are kept to answer the deltas.
+    """
+
+    def __init__(self, neo4j: Neo4jDB = None, ttl: float = None, keep: int = 20):
+        self.neo4j = neo4j
+        self.ttl = float(os.getenv("QUESTIONNAIRE_TTL", "60")) if ttl is None else ttl
+        self.keep = keep
+        self._current = None
+        self._loaded_at = 0.0
+        self._history = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _read_graph(self) -> dict:
+        read_nodes = self.neo4j.read_nodes
+        leads_to = self.neo4j.read_relationship_keys(
+            "Option", ("question_id", "text"), "LEADS_TO", "Question", ("id",)
+        ).get("result") or []
+        return build_bundle(
+            read_nodes("Section").get("result") or [],
+            read_nodes("Question").get("result") or [],
+            read_nodes("Option").get("result") or [],
+            leads_to,
+            next(iter(read_nodes(INDEX_LABEL).get("result") or []), None),
+        )
+
+    def _load(self) -> dict:
+        bundle = self._read_graph()
+        hashes = entity_hashes(bundle)
+        version = bundle_version(hashes)
+        body = {"version": version, **bundle}
+        return {"version": version, "bundle": bundle, "hashes": hashes, "body": dumps(body)}
+
+    def current(self, refresh: bool = False) -> dict:
+        """
+        The current bundle: its `version`, `bundle`, entity `hashes` and encoded `body`.
+        """
+        with self._lock:
+            if refresh or self._current is None or time.monotonic() - self._loaded_at >= self.ttl:
+                current = self._load()
+                if self._current is None or current["version"] != self._current["version"]:
+                    self._current = current
+                    self._history[current["version"]] = current["hashes"]
+                    while len(self._history) > self.keep:
+                        self._history.popitem(last=False)
+                self._loaded_at = time.monotonic()
+            return self._current
+
+    @single_flight
+    def get_bundle(self) -> dict:
+        """
+        Get the whole questionnaire.
+
+        Returns:
+            dict: The `version` and the questionnaire.
+        """
+        current = self.current()
+        return {"version": current["version"], **current["bundle"]}
+
+    @single_flight
+    def get_delta(self, since: str) -> Optional[dict]:
+        """
+        Get what changed in the questionnaire since a version.
+
+        Args:
+            since (str): The version the client has.
+
+        Returns:
+            dict: The `version`, the changed (or added) sections and questions,
+                the ids of the removed ones and the topological `order`; None
+                when `since` is unknown (the client needs the whole bundle).
+        """
+        current = self.current()
+        with self._lock:
+            previous = self._history.get(since)
+        if previous is None:
+            return None
+        hashes = current["hashes"]
+        delta = {"version": current["version"], "since": since, "order": current["bundle"]["order"]}
+        for kind in ("sections", "questions"):
+            delta[kind] = {
+                entity_id: entity for entity_id, entity in current["bundle"][kind].items()
+                if previous.get((kind, entity_id)) != hashes[(kind, entity_id)]
+            }
+            delta[f"removed_{kind}"] = sorted(
+                entity_id for (entity_kind, entity_id) in previous
+                if entity_kind == kind and (kind, entity_id) not in hashes
+            )
+        return delta
+
+    def resolve(self, answers: dict) -> dict:
+        """
+        Resolve a whole answer set against the current questionnaire (see `resolve`).
+        """
+        return resolve(self.get_bundle(), answers)
@@ -2,7 +2,11 @@
 Section Service
 """
 # pylint: disable=W0212
+import collections
 from src.db.neo4j_db import Neo4jDB
+from src.utils.concurrency import single_flight
+
+INTERNAL_FIELDS = ("content_hash",)
 
 
 class SectionService:
@@ -14,6 +18,7 @@ class SectionService:
         self.neo4j = neo4j
 
 
+    @single_flight
     def get_options_for_question(self, question_id: str) -> list:
         """
         Get options for a question.
@@ -38,6 +43,7 @@ class SectionService:
         options = [option[2] for option in options]
         return options
 
+    @single_flight
     def get_sections(self) -> list:
         """
         Get all sections.
@@ -50,6 +56,7 @@ class SectionService:
 
         return sections.get('result', [])
 
+    @single_flight
     def get_section_by_property(self, property: str, value: str) -> dict:
         """
         Get a section by a specific property.
@@ -72,6 +79,7 @@ class SectionService:
 
         return section
 
+    @single_flight
     def get_next_section(self, section_id: str) -> dict:
         # Query for the current section using its ID
         dico = {"id": section_id}
@@ -103,42 +111,46 @@ class SectionService:
         return next_section
 
 
-    def get_questions_for_section(self, section_id: str) -> list:
+    @single_flight
+    def get_questions_for_section(self, section_id: str, include_options: bool = False) -> list:
         """
         Get all questions for a section.
 
         Args:
             section_id (str): The section ID.
+            include_options (bool): Add the options of each question.
 
         Returns:
-            List[dict]: The questions.
+            List[dict]: The questions, in order.
         """
-        # Get all Question nodes related to the section
-        questions = self.neo4j.read(
-            tx_type="relationship",
-            start_node_label="Section",
-            start_node_properties={"id": section_id},
-            end_node_label="Question",
-            end_node_properties={},
-            relation_type="HAS_QUESTION",
-            many=True,
-        ).get("result")
-        
-        questions_processed = []
-        for relation in questions:
-            # Extract the Node object for the question
-            question_node = relation[2]  # Adjust index based on the structure of your result
-
-            # Convert the Node object to a dictionary
-            question_dict = dict(question_node.items())
+        return self.get_questions_for_sections([section_id], include_options).get(section_id, [])
 
-            questions_processed.append(question_dict)
-
-        questions_processed = sorted(questions_processed, key=lambda x: x['order'])
+    @single_flight
+    def get_questions_for_sections(self, section_ids: list, include_options: bool = False) -> dict:
+        """
+        Get the questions of several sections, and optionally their options, in one query.
 
-        print(questions_processed)
+        Args:
+            section_ids (list): The section IDs.
+            include_options (bool): Add the options of each question, ordered by text.
 
-        return questions_processed
+        Returns:
+            dict: The questions of each section, in order, by section ID.
+        """
+        rows = self.neo4j.read_section_questions(section_ids, include_options).get("result") or []
+        questions = {}
+        for section_id, question, options in rows:
+            question = {k: v for k, v in question.items() if k not in INTERNAL_FIELDS}
+            if include_options:
+                # by text: the option nodes duplicated with partial properties are merged
+                merged = {}
+                for option in options:
+                    merged.setdefault(option.get("text"), {}).update(
+                        {k: v for k, v in option.items() if k not in INTERNAL_FIELDS}
+                    )
+                question["options"] = list(merged.values())
+            questions.setdefault(section_id, []).append(question)
+        return questions
 
 
 
@@ -146,6 +158,7 @@ class SectionService:
 
 
 
+    @single_flight
     def get_next_questions(self, question_id: str, option_text: str) -> list:
         # Dictionnaire pour faire correspondre le noeud de départ ('Option')
         start_node_properties = {"question_id": question_id, "text": option_text}
@@ -199,4 +212,51 @@ class SectionService:
             print("Format de données related_questions_data inattendu")
 
         return next_questions
-    
+
+    def prefetch_follow_ups(self, questions: list, depth: int) -> list:
+        """
+        Add to each option of `questions` the questions it leads to, with
+        their options, down to `depth` answers ahead, read in one traversal.
+
+        Args:
+            questions (list): The questions, as returned by the other methods.
+            depth (int): The number of answers to look ahead (0: none).
+
+        Returns:
+            list: The questions, each option with a `next` list of questions
+                (the options of the deepest questions have no `next`).
+        """
+        if depth <= 0 or not questions:
+            return questions
+        # Question -HAS_OPTION-> Option -LEADS_TO-> Question ... : 2 hops per answer,
+        # and the options of the deepest questions.
+        relationships = self.neo4j.read_follow_ups(
+            [question["id"] for question in questions], 2 * depth + 1
+        ).get("result") or []
+
+        # by question id and option text, by option key and question id: the
+        # nodes duplicated with partial properties are merged
+        options_of = collections.defaultdict(dict)
+        leads_to = collections.defaultdict(dict)
+        for relation_type, start, end in relationships:
+            if relation_type == "HAS_OPTION":
+                options_of[start.get("id")].setdefault(end.get("text"), {}).update(end)
+            else:
+                leads_to[(start.get("question_id"), start.get("text"))].setdefault(end.get("id"), {}).update(end)
+
+        def expand_option(question_id: str, option: dict, level: int) -> dict:
+            option = {k: v for k, v in option.items() if k not in INTERNAL_FIELDS and k != "question_id"}
+            if level < depth:
+                next_questions = sorted(leads_to.get((question_id, option.get("text")), {}).values(),
+                                        key=lambda q: (q.get("order") or 0, q.get("id")))
+                option["next"] = [expand_question(question, level + 1) for question in next_questions]
+            return option
+
+        def expand_question(question: dict, level: int) -> dict:
+            question = {k: v for k, v in question.items() if k not in INTERNAL_FIELDS}
+            options = question.get("options") or sorted(options_of.get(question["id"], {}).values(),
+                                                        key=lambda o: str(o.get("text")))
+            question["options"] = [expand_option(question["id"], option, level) for option in options]
+            return question
+
+        return [expand_question(question, 0) for question in questions]
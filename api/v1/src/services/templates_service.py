@@ -136,7 +136,7 @@ class TemplateService:
             user_data = user_service.read_user(user_id)
             print(f"Données utilisateur récupérées : {user_data}")
 
-            if user_data and user_data.get('success') and 'templates' in user_data.get('result', {}):
+            if user_data and user_data.get('success') and 'templates' in (user_data.get('result') or {}):
                 user_templates = user_data['result']['templates']
                 print(f"Templates associés à l'utilisateur : {user_templates}")
 
@@ -246,9 +246,8 @@ class TemplateService:
         # 2. `inc` the `stars` field of the template document corresponding to the
         # `template_id` provided, depending on whether the template is private or public.
         # Note: The template_id will be the template_name if the template is private.
-        template = self.read_template(template_id, user_id=user_id).get("result")[
-            "templates"
-        ][3]
+        user = self.read_template(template_id, user_id=user_id).get("result")
+        template = next(template for template in user["templates"] if template["template_name"] == template_id)
         user_query = {"_id": ObjectId(user_id)}
         template_query = {"template_name": template_id}
         # (fixme, mongo): Push the template to the `starred_templates` array of the user
@@ -276,7 +275,8 @@ class TemplateService:
             }
             self.mongo.update(template_query, template_update, "templates").get("result")
  
-        template = self.read_template(template_id, user_id=user_id).get("result")["templates"][0]
+        user = self.read_template(template_id, user_id=user_id).get("result")
+        template = next(template for template in user["templates"] if template["template_name"] == template_id)
         return template
 
     @handle_db_operations
@@ -0,0 +1,177 @@
+"""
+Response compression.
+
+`CompressionMiddleware` compresses the responses whose body is at least
+`COMPRESS_MIN_BYTES` (default 1024) with the best encoding the client
+accepts: brotli (`br`, when the `brotli` package is installed) or gzip.
+The template listings (with `template_tree`) and the questionnaire
+payloads compress to a fraction of their size.
+
+- Only textual content types are compressed (JSON, text, XML, JavaScript);
+- responses that already have a `Content-Encoding` are left as they are;
+- streamed responses are compressed chunk by chunk;
+- the compressible responses get `Vary: Accept-Encoding`, so that caches
+  keep one copy per encoding.
+
+Environment:
+    COMPRESS_MIN_BYTES      the size threshold (default 1024);
+    COMPRESS_GZIP_LEVEL     the gzip level (default 6);
+    COMPRESS_BROTLI_QUALITY the brotli quality (default 4: dynamic content).
+"""
+import gzip
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"application/xml", b"+json",
+                      b"+xml")
+
+
+def supported_encodings() -> tuple:
+    """
+    The encodings the server can produce, preferred first.
+    """
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, encodings: tuple = None) -> Optional[str]:
+    """
+    The encoding to use for an `Accept-Encoding` header: the accepted one with
+    the highest quality, the server preference breaking the ties.
+    """
+    encodings = encodings or supported_encodings()
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            qualities[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.finish
+        else:
+            # wbits 16 + MAX_WBITS: the gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress = self._compressor.compress
+            self._flush = self._compressor.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._flush()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    """
+    Compress a whole body.
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing the responses with the negotiated encoding.
+    """
+
+    def __init__(self, app, minimum_size: int = None, gzip_level: int = None, brotli_quality: int = None):
+        self.app = app
+        self.minimum_size = int(os.getenv("COMPRESS_MIN_BYTES", "1024")) if minimum_size is None else minimum_size
+        self.gzip_level = int(os.getenv("COMPRESS_GZIP_LEVEL", "6")) if gzip_level is None else gzip_level
+        self.brotli_quality = (int(os.getenv("COMPRESS_BROTLI_QUALITY", "4")) if brotli_quality is None
+                               else brotli_quality)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"")
+                if not any(kind in content_type for kind in COMPRESSIBLE_TYPES):
+                    await send(message)
+                    return
+                message = {**message, "headers": _vary(message.get("headers", []))}
+                if encoding is None or b"content-encoding" in response_headers:
+                    await send(message)
+                    return
+                # wait for the first body chunk to know the size
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                if not more_body:
+                    compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+                    await send(_encoded(start, encoding, len(compressed)))
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                await send(_encoded(start, encoding, None))
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _vary(headers: list) -> list:
+    headers = list(headers)
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower() and value != b"*":
+                headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def _encoded(start: dict, encoding: str, length: Optional[int]) -> dict:
+    headers = [(name, value) for name, value in start.get("headers", []) if name.lower() != b"content-length"]
+    headers.append((b"content-encoding", encoding.encode("latin-1")))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode("latin-1")))
+    return {**start, "headers": headers}
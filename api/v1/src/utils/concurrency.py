@@ -0,0 +1,310 @@
+"""
+Event-loop monitoring and offloading of the synchronous services.
+
+The services are synchronous (pymongo, the Neo4j driver): called from an
+`async def` endpoint, they block the event loop, and every other request of
+the worker waits.
+
+`offloaded(service)` wraps a service so that its methods run on a bounded
+thread pool and are awaited by the endpoint:
+
+    project_service = offloaded(ProjectService(mongo, neo4j))
+
+    @router.get("/")
+    async def get_projects_endpoint(user_id: str):
+        projects = (await project_service.list_projects(user_id)).get("result")
+
+The pool has `SERVICE_THREADS` threads (default 16): calls beyond that wait
+for a free thread, so that a burst does not open more database connections
+than the pools can serve. The request context (timings, profiling) follows
+the call on its thread.
+
+The read methods decorated with `single_flight` are coalesced: the
+concurrent calls with the same arguments share one call in flight and its
+result, instead of each running the same query (e.g. the
+`GET /v1/sections/` of every user opening the questionnaire at once):
+
+    class SectionService:
+        @single_flight
+        def get_sections(self) -> list:
+            ...
+
+The result is shared by the callers: they must not mutate it. The calls
+are counted in `gocod_single_flight_calls_total{method,outcome}` (`leader`:
+ran the call, `coalesced`: shared it). `SINGLE_FLIGHT=0` disables the
+coalescing.
+
+`LoopMonitor` measures the event-loop lag: a heartbeat task sleeps
+`LOOP_MONITOR_INTERVAL_MS` (default 50) and records how late it wakes up in
+`gocod_event_loop_lag_seconds`. A watchdog thread catches the stalls longer
+than `LOOP_STALL_MS` (default 100) while they happen: it reads the stack of
+the loop thread, which tells the blocking code and the route of the request
+running it. The stalls are recorded in `gocod_event_loop_stall_seconds{route}`
+and the last ones are served by `GET /v1/admin/event-loop`.
+`LOOP_MONITOR=0` disables the monitor.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import datetime
+import functools
+import os
+import sys
+import threading
+import time
+import weakref
+from typing import Optional
+
+from src.utils import metrics
+from src.utils.profiling import profile_thread
+from src.utils.timing import route_path
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """
+    The thread pool of the offloaded service calls, of `SERVICE_THREADS` threads.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=int(os.getenv("SERVICE_THREADS", "16")), thread_name_prefix="service"
+                )
+    return _executor
+
+
+def _profiled(func, args, kwargs):
+    # in the request context: the profile of the request is in it
+    with profile_thread():
+        return func(*args, **kwargs)
+
+
+def _run_in_context(context: contextvars.Context, func, args, kwargs):
+    global _pending
+    try:
+        return context.run(_profiled, func, args, kwargs)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run a synchronous function on the service thread pool, in the current context.
+    """
+    global _pending
+    with _pending_lock:
+        _pending += 1
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), _run_in_context, context, func, args, kwargs)
+
+
+def pool_status() -> dict:
+    executor = get_executor()
+    return {"threads": executor._max_workers, "started": len(executor._threads), "pending": _pending}
+
+
+def single_flight(method):
+    """
+    Opt a synchronous read method in to the coalescing of its concurrent offloaded calls.
+    """
+    method.single_flight = True
+    return method
+
+
+def _flight_key(value):
+    # the arguments as a hashable key: lists and dicts compare by content
+    if isinstance(value, (list, tuple)):
+        return tuple(_flight_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _flight_key(item)) for key, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    hash(value)
+    return value
+
+
+class Offloaded:
+    """
+    A proxy of a synchronous service whose method calls return awaitables
+    run on the service thread pool.
+    """
+
+    def __init__(self, service, coalesce: bool = None):
+        self._service = service
+        self._coalesce = os.getenv("SINGLE_FLIGHT", "1") == "1" if coalesce is None else coalesce
+        # the calls in flight of each event loop, by method and arguments
+        self._flights = weakref.WeakKeyDictionary()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._service, name)
+        if not callable(attribute):
+            return attribute
+
+        if self._coalesce and getattr(attribute, "single_flight", False):
+            return self._single_flight(name, attribute)
+
+        @functools.wraps(attribute)
+        async def offloaded_method(*args, **kwargs):
+            return await run_sync(attribute, *args, **kwargs)
+        return offloaded_method
+
+    def _single_flight(self, name, attribute):
+        method = f"{type(self._service).__name__}.{name}"
+
+        @functools.wraps(attribute)
+        async def coalesced_method(*args, **kwargs):
+            try:
+                key = (name, _flight_key(args), _flight_key(kwargs))
+            except TypeError:
+                return await run_sync(attribute, *args, **kwargs)
+            flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+            flight = flights.get(key)
+            if flight is None:
+                flight = flights[key] = asyncio.ensure_future(run_sync(attribute, *args, **kwargs))
+                flight.add_done_callback(lambda _: flights.pop(key, None))
+                metrics.single_flight_calls.inc((method, "leader"))
+            else:
+                metrics.single_flight_calls.inc((method, "coalesced"))
+            # a cancelled caller does not cancel the call of the others
+            return await asyncio.shield(flight)
+        return coalesced_method
+
+
+def offloaded(service, coalesce: bool = None) -> Offloaded:
+    """
+    Wrap a synchronous service to run its methods on the service thread pool,
+    coalescing the concurrent calls of its `single_flight` methods.
+    """
+    return Offloaded(service, coalesce)
+
+
+def _request_route(frame) -> Optional[str]:
+    """
+    The route of the request whose code runs in `frame`: the ASGI scope of an enclosing frame.
+    """
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            return route_path(scope) or scope.get("path")
+        frame = frame.f_back
+    return None
+
+
+def _stack(frame, limit: int = 30) -> list:
+    stack = []
+    while frame is not None and len(stack) < limit:
+        code = frame.f_code
+        # co_qualname is Python 3.11+
+        name = getattr(code, "co_qualname", code.co_name)
+        stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno}:{name}")
+        frame = frame.f_back
+    return stack
+
+
+class LoopMonitor:
+    """
+    Class to measure the lag of an event loop, and catch its stalls.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, keep: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = collections.deque(maxlen=keep)
+        self.max_lag = 0.0
+        self._beat = time.perf_counter()
+        self._stall = None
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        loop = loop or asyncio.get_running_loop()
+        self._task = loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        self._loop_thread = threading.get_ident()
+        while not self._stop.is_set():
+            self._beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - self._beat - self.interval)
+            metrics.event_loop_lag.observe((), lag)
+            self.max_lag = max(self.max_lag, lag)
+            stall, self._stall = self._stall, None
+            if stall is not None:
+                stall["duration_ms"] = round(1000 * lag, 3)
+                metrics.event_loop_stall.observe((stall["route"] or "unknown",), lag)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if self._stall is not None or time.perf_counter() - beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None or beat != self._beat:
+                continue
+            self._stall = {
+                "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "route": _request_route(frame),
+                "duration_ms": None,
+                "stack": _stack(frame),
+            }
+            self.stalls.append(self._stall)
+
+    def status(self) -> dict:
+        return {
+            "interval_ms": 1000 * self.interval,
+            "stall_threshold_ms": 1000 * self.threshold,
+            "max_lag_ms": round(1000 * self.max_lag, 3),
+            "stalls": list(reversed(self.stalls)),
+        }
+
+
+monitor: Optional[LoopMonitor] = None
+
+
+class LoopMonitorMiddleware:
+    """
+    ASGI middleware running a `LoopMonitor` on the loop of the server, from
+    the lifespan startup to its shutdown.
+    """
+
+    def __init__(self, app, enabled: bool = None):
+        self.app = app
+        self.enabled = os.getenv("LOOP_MONITOR", "1") == "1" if enabled is None else enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def receive_lifespan():
+            global monitor
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                monitor = LoopMonitor(
+                    interval=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50")) / 1000,
+                    threshold=float(os.getenv("LOOP_STALL_MS", "100")) / 1000,
+                )
+                monitor.start()
+            elif message["type"] == "lifespan.shutdown" and monitor is not None:
+                monitor.stop()
+            return message
+
+        await self.app(scope, receive_lifespan, send)
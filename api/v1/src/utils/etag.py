@@ -0,0 +1,96 @@
+"""
+Conditional GETs.
+
+`ETagMiddleware` gives the successful GET responses of the read-heavy
+routes (`/v1/sections`, `/v1/templates`, `/v1/questionnaire`) an `ETag`,
+and answers a request whose `If-None-Match` matches it with a
+`304 Not Modified` without a body:
+
+    GET /v1/sections/                          -> 200, ETag: W/"3f0c…"
+    GET /v1/sections/  If-None-Match: W/"3f0c…" -> 304
+
+The ETag is the version stamp the endpoint set in its own `ETag` header
+when it has one (the questionnaire version), otherwise a hash of the body.
+A HEAD response has no body to hash: it only gets the ETag of the endpoint.
+The ETags are weak: the compressed and uncompressed bodies are the same
+resource. The responses get `Cache-Control: no-cache` (unless the endpoint
+set one), so that the clients keep them and revalidate them.
+"""
+import hashlib
+from typing import Iterable
+
+DEFAULT_PATHS = ("/v1/sections", "/v1/templates", "/v1/questionnaire")
+
+
+def content_etag(body: bytes) -> str:
+    """
+    The weak ETag of a body.
+    """
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an `If-None-Match` header matches an ETag (weak comparison).
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class ETagMiddleware:
+    """
+    ASGI middleware adding ETags to the GET responses under `paths`, and answering the matching
+    conditional requests with a 304.
+    """
+
+    def __init__(self, app, paths: Iterable[str] = DEFAULT_PATHS):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] not in ("GET", "HEAD")
+                or not scope["path"].startswith(self.paths)):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = dict(scope.get("headers") or []).get(b"if-none-match", b"").decode("latin-1")
+
+        start = None
+        chunks = []
+
+        async def send_with_etag(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    await send(message)
+                    return
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = [(name, value) for name, value in start.get("headers", [])]
+            names = {name.lower(): value for name, value in headers}
+            etag = names.get(b"etag", b"").decode("latin-1")
+            if not etag and scope["method"] == "GET":
+                etag = content_etag(body)
+                headers.append((b"etag", etag.encode("latin-1")))
+            if b"cache-control" not in names:
+                headers.append((b"cache-control", b"no-cache"))
+
+            if etag and if_none_match and etag_matches(if_none_match, etag):
+                headers = [(name, value) for name, value in headers
+                           if name.lower() not in (b"content-length", b"content-type")]
+                await send({**start, "status": 304, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
@@ -3,6 +3,9 @@ import logging
 from pymongo import errors
 import random
 import string
+import time
+from src.utils.metrics import operation_duration, operation_result_size, result_size
+from src.utils.timing import operation_span, record
 
 def generate_response(success: bool, message: str, result: any = "0") -> dict:
     """
@@ -19,19 +22,39 @@ def generate_response(success: bool, message: str, result: any = "0") -> dict:
     return {"success": success, "message": message, "result": result}
 
 def handle_db_operations(func):
+    """
+    Wrap the result of a database or service operation in a response
+    dictionary, and record its duration, outcome and result size under the
+    operation name (e.g. `MongoDB.read`, `Neo4jDB.read[relationship]`), and
+    its duration in the timings of the current request.
+    """
+    operation = func.__qualname__
+    span = operation_span(func)
+
     @wraps(func)
     def wrapper(*args, **kwargs):
+        name = f"{operation}[{kwargs['tx_type']}]" if "tx_type" in kwargs else operation
+        outcome = "exception"
+        start = time.perf_counter()
         try:
             result = func(*args, **kwargs)
+            outcome = "success"
+            operation_result_size.observe((name,), result_size(result))
             return generate_response(True, "Operation successful", result)
         except errors.WriteError as of:
+            outcome = "error"
             message = f"An error occurred on write operation: {of}"
             logging.error(message)
             return generate_response(False, message)
         except errors.OperationFailure as of:
+            outcome = "error"
             message = f"An operation failure occurred: {of}"
             logging.error(message)
             return generate_response(False, message)
+        finally:
+            duration = time.perf_counter() - start
+            operation_duration.observe((name, outcome), duration)
+            record(span, duration)
     return wrapper
 
 
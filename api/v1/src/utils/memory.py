@@ -0,0 +1,183 @@
+"""
+Memory diagnostics.
+
+Heap snapshots with tracemalloc, served by the admin routes:
+
+    POST /v1/admin/memory/start?frames=25     start tracing (or PYTHONTRACEMALLOC=25)
+    POST /v1/admin/memory/snapshots           take a snapshot
+    GET  /v1/admin/memory/snapshots/{id}      its top allocating call sites
+    GET  /v1/admin/memory/diff?base=1&target=2  what grew between two snapshots
+    POST /v1/admin/memory/stop                stop tracing, drop the snapshots
+
+Take a snapshot, let the worker serve traffic, take another and diff them:
+the call sites whose memory keeps growing are the leaks.
+
+While tracing, `AllocationMiddleware` records the peak of traced memory
+during each request in `gocod_request_peak_allocation_bytes`. The peak is
+process-wide: one request is measured at a time, and the value is an upper
+bound when other requests run concurrently. Tracing slows allocations down,
+and costs memory for each traced block and frame.
+"""
+import collections
+import datetime
+import threading
+import tracemalloc
+from typing import List, Optional
+
+from src.utils import metrics
+from src.utils.timing import route_path
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# Allocations of the diagnostics themselves.
+FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _site(stat, group_by: str):
+    if group_by == "traceback":
+        return [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    frame = stat.traceback[0]
+    return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+class SnapshotStore:
+    """
+    The last snapshots taken, by id.
+    """
+
+    def __init__(self, keep: int = 5):
+        self.keep = keep
+        self._snapshots = collections.OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def take(self) -> dict:
+        """
+        Take a snapshot of the traced memory.
+
+        Returns:
+            dict: The snapshot id and totals.
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        snapshot = tracemalloc.take_snapshot().filter_traces(FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            info = {
+                "id": snapshot_id,
+                "taken_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "traced_bytes": current,
+                "peak_bytes": peak,
+                "frames": tracemalloc.get_traceback_limit(),
+            }
+            self._snapshots[snapshot_id] = (info, snapshot)
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return info
+
+    def get(self, snapshot_id: int) -> Optional[tracemalloc.Snapshot]:
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        return entry[1] if entry else None
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [info for info, _ in self._snapshots.values()]
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+
+def top(snapshot: tracemalloc.Snapshot, group_by: str = "lineno", limit: int = 20) -> List[dict]:
+    """
+    The call sites holding the most memory in a snapshot.
+    """
+    return [
+        {"site": _site(stat, group_by), "size_bytes": stat.size, "count": stat.count}
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+
+def diff(base: tracemalloc.Snapshot, target: tracemalloc.Snapshot, group_by: str = "lineno",
+         limit: int = 20) -> List[dict]:
+    """
+    The call sites whose memory changed the most from `base` to `target`.
+    """
+    return [
+        {
+            "site": _site(stat, group_by),
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in target.compare_to(base, group_by)[:limit]
+    ]
+
+
+def start(frames: int = 25):
+    """
+    Start tracing, keeping `frames` frames per allocation (restarts if already tracing with another limit).
+    """
+    if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != frames:
+        stop()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop():
+    """
+    Stop tracing: the traces and the snapshots are dropped.
+    """
+    tracemalloc.stop()
+    snapshots.clear()
+
+
+def status() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else None,
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "tracemalloc_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+        "snapshots": snapshots.list(),
+    }
+
+
+snapshots = SnapshotStore()
+_measuring = threading.Lock()
+
+
+class AllocationMiddleware:
+    """
+    ASGI middleware recording the peak traced memory of the requests, while tracing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracemalloc.is_tracing() or not _measuring.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            start_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await self.app(scope, receive, send)
+        finally:
+            if tracemalloc.is_tracing():
+                _, peak = tracemalloc.get_traced_memory()
+                route = route_path(scope) or "unmatched"
+                metrics.request_peak_allocation.observe((scope["method"], route), max(0, peak - start_bytes))
+            _measuring.release()
@@ -0,0 +1,220 @@
+"""
+Operation metrics.
+
+Histograms of the duration and result size of every operation wrapped by
+`handle_db_operations`, and counters, exposed in the Prometheus text format
+by `/metrics`.
+
+Recording takes no lock: each thread counts into its own shard (a dict of
+bucket counters), and the shards are only summed when the metrics are
+scraped. A lock is only taken the first time a thread records.
+"""
+from bisect import bisect_left
+import threading
+from typing import Dict, Iterator, List, Tuple
+
+# Bucket upper bounds, the last bucket (+Inf) is implicit.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+ALLOCATION_BUCKETS = tuple(2 ** power for power in range(12, 31, 2))  # 4 KiB to 1 GiB
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _ShardedMetric:
+    """
+    The series of a metric by label set, one shard (dict) per recording thread.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        """
+        The shard of the current thread (the lock is only taken on its first record).
+        """
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _items(self) -> Iterator[tuple]:
+        """
+        The (labels, series) of every shard.
+        """
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            yield from list(shard.items())
+
+    def _label_pairs(self, labels: tuple) -> List[str]:
+        return [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels)]
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Histogram(_ShardedMetric):
+    """
+    A Prometheus histogram with one label set per series, sharded per thread.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets: tuple):
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+
+    def observe(self, labels: tuple, value: float):
+        """
+        Count `value` in the series of `labels` (in the order of `label_names`).
+        """
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # [bucket counts..., +Inf count, sum]
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> Dict[tuple, list]:
+        """
+        Returns:
+            dict: The summed [bucket counts..., +Inf count, sum] of each label set.
+        """
+        total = {}
+        for labels, series in self._items():
+            summed = total.setdefault(labels, [0] * len(series))
+            for index, value in enumerate(list(series)):
+                summed[index] += value
+        return total
+
+    def expose(self) -> str:
+        lines = self._header()
+        for labels, series in sorted(self.collect().items()):
+            label_pairs = self._label_pairs(labels)
+            label_text = f"{{{','.join(label_pairs)}}}" if label_pairs else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                bucket_labels = ",".join(label_pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text} {series[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_ShardedMetric):
+    """
+    A Prometheus counter with one label set per series, sharded per thread.
+    """
+
+    kind = "counter"
+
+    def inc(self, labels: tuple, amount: float = 1):
+        """
+        Add `amount` to the series of `labels` (in the order of `label_names`).
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self) -> Dict[tuple, float]:
+        """
+        Returns:
+            dict: The summed value of each label set.
+        """
+        total = {}
+        for labels, count in self._items():
+            total[labels] = total.get(labels, 0) + count
+        return total
+
+    def expose(self) -> str:
+        lines = self._header()
+        for labels, count in sorted(self.collect().items()):
+            label_pairs = self._label_pairs(labels)
+            label_text = f"{{{','.join(label_pairs)}}}" if label_pairs else ""
+            lines.append(f"{self.name}{label_text} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+operation_duration = Histogram(
+    "gocod_operation_duration_seconds",
+    "Duration of the database and service operations.",
+    ("operation", "outcome"),
+    DURATION_BUCKETS,
+)
+operation_result_size = Histogram(
+    "gocod_operation_result_size",
+    "Number of items returned by the database and service operations.",
+    ("operation",),
+    SIZE_BUCKETS,
+)
+
+request_peak_allocation = Histogram(
+    "gocod_request_peak_allocation_bytes",
+    "Peak traced memory allocated during a request (while tracemalloc traces, see src.utils.memory).",
+    ("method", "route"),
+    ALLOCATION_BUCKETS,
+)
+
+event_loop_lag = Histogram(
+    "gocod_event_loop_lag_seconds",
+    "Delay of the event-loop heartbeat (see src.utils.concurrency).",
+    (),
+    LAG_BUCKETS,
+)
+event_loop_stall = Histogram(
+    "gocod_event_loop_stall_seconds",
+    "Event-loop stalls over the stall threshold, by route of the blocking request.",
+    ("route",),
+    LAG_BUCKETS,
+)
+
+single_flight_calls = Counter(
+    "gocod_single_flight_calls_total",
+    "Calls to the coalesced service methods (see src.utils.concurrency), by outcome: `leader` ran the backend "
+    "call, `coalesced` shared the one in flight.",
+    ("method", "outcome"),
+)
+
+HISTOGRAMS = [operation_duration, operation_result_size, request_peak_allocation, event_loop_lag, event_loop_stall]
+COUNTERS = [single_flight_calls]
+SIZED = frozenset([list, tuple, set])
+
+
+def result_size(result) -> int:
+    """
+    The number of items of an operation result: its length for a list,
+    tuple or set, else 1 (or 0 for None). A document (dict) counts as 1.
+    """
+    if type(result) is dict and "result" in result:
+        # Neo4jDB.read returns {"result": [...]} (many=True) or {"result": document}
+        result = result["result"]
+    if type(result) in SIZED:
+        return len(result)
+    return 0 if result is None else 1
+
+
+def expose() -> str:
+    """
+    All the metrics, in the Prometheus text format.
+    """
+    return "".join(metric.expose() for metric in HISTOGRAMS + COUNTERS)
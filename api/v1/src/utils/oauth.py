@@ -1,4 +1,7 @@
-from fastapi import Depends, HTTPException, status
+import hmac
+import os
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, status
 from .jwttoken import verify_token
 from fastapi.security import OAuth2PasswordBearer
 
@@ -12,3 +15,21 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     return verify_token(token, credentials_exception)
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """
+    Whether `token` is the admin token (`ADMIN_TOKEN`). Always false when no
+    admin token is configured.
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    return bool(admin_token and token) and hmac.compare_digest(token, admin_token)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency of the admin routes: the `X-Admin-Token` header must be the admin token.
+    """
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+    return True
@@ -0,0 +1,280 @@
+"""
+Per-request CPU profiling.
+
+A request sent with the admin token and an `X-Profile` header is profiled
+from the middleware down, through the router, the services, the database
+wrappers and the response serialization:
+
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" -H "X-Profile: collapsed" http://localhost:8000/v1/templates/
+
+- `X-Profile: collapsed`: a sampling profiler (a thread reading the stacks
+  of the request's threads every `PROFILE_INTERVAL_MS`, default 1), with a
+  low overhead; the profile is in the collapsed-stack format of flame graph
+  tools (`frame;frame;frame count` per line);
+- `X-Profile: pstats`: cProfile, exact call counts but a higher overhead;
+  the profile loads with `pstats.Stats(path)`. From Python 3.12 only one
+  cProfile can be enabled at a time in a process: the worker threads of
+  the request are then not profiled, and are listed in the
+  `unprofiled_threads` of the profile.
+
+The response gets an `X-Profile-Id` header (or `X-Profile: busy` when
+another request is being profiled: one at a time). The last `PROFILE_KEEP`
+profiles (default 20) are served by `GET /v1/admin/profiles/{id}`, and are
+also written to `PROFILE_DIR` when set.
+
+The event loop runs every request: under concurrent load, the samples
+taken on it can include other requests. Profile on a quiet worker.
+"""
+import collections
+import contextlib
+import contextvars
+import cProfile
+import datetime
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+from src.utils.oauth import is_admin_token
+
+MODES = ("collapsed", "pstats")
+
+
+def collapse(frame) -> str:
+    """
+    The stack of a frame, root first, in the collapsed-stack format.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        # co_qualname is Python 3.11+
+        names.append(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    A profiler counting the stacks of a set of threads, sampled from a background thread.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def add_thread(self, ident: int):
+        self._threads.add(ident)
+
+    def remove_thread(self, ident: int):
+        self._threads.discard(ident)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self._threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[collapse(frame)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    The profile of one request, over the event loop and the worker threads it runs on.
+    """
+
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.id = uuid.uuid4().hex[:16]
+        self.sampler = SamplingProfiler(interval) if mode == "collapsed" else None
+        self.profiles: List[cProfile.Profile] = []
+        self.unprofiled_threads: List[str] = []
+
+    @contextlib.contextmanager
+    def thread(self):
+        """
+        Profile the current thread for the duration of the block.
+        """
+        if self.sampler is not None:
+            ident = threading.get_ident()
+            self.sampler.add_thread(ident)
+            try:
+                yield
+            finally:
+                self.sampler.remove_thread(ident)
+        else:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+: "Another profiling tool is already active" (the event-loop thread's)
+                self.unprofiled_threads.append(threading.current_thread().name)
+                yield
+                return
+            self.profiles.append(profile)
+            try:
+                yield
+            finally:
+                profile.disable()
+
+    def start(self):
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def data(self) -> bytes:
+        """
+        The profile: collapsed stacks, or marshalled pstats (the `dump_stats` format).
+        """
+        if self.sampler is not None:
+            return self.sampler.collapsed().encode("utf-8")
+        stats = pstats.Stats(*self.profiles)
+        return marshal.dumps(stats.stats)
+
+
+def pstats_text(data: bytes, limit: int = 50, sort: str = "cumulative") -> str:
+    """
+    The `print_stats` report of a marshalled pstats profile.
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    stats.stats = marshal.loads(data)
+    stats.get_top_level_stats()
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfileStore:
+    """
+    The last profiles, and optionally a directory they are written to.
+    """
+
+    def __init__(self, keep: int = 20, directory: str = None):
+        self.keep = keep
+        self.directory = directory
+        self._profiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, entry: dict):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{entry['id']}.{entry['mode']}")
+            with open(path, "wb") as file:
+                file.write(entry["data"])
+        with self._lock:
+            self._profiles[entry["id"]] = entry
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            entries = list(self._profiles.values())
+        return [{k: v for k, v in entry.items() if k != "data"} for entry in reversed(entries)]
+
+
+store = ProfileStore(keep=int(os.getenv("PROFILE_KEEP", "20")), directory=os.getenv("PROFILE_DIR"))
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("request_profile", default=None)
+_active = threading.Lock()
+
+
+@contextlib.contextmanager
+def profile_thread():
+    """
+    Profile the current (worker) thread when the current request is profiled.
+    """
+    profile = _current.get()
+    if profile is None:
+        yield
+    else:
+        with profile.thread():
+            yield
+
+
+class ProfileMiddleware:
+    """
+    ASGI middleware profiling the requests sent with the admin token and an `X-Profile` header.
+    """
+
+    def __init__(self, app, interval: float = None):
+        self.app = app
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000 if interval is None else interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        mode = headers.get(b"x-profile", b"").decode("latin-1").lower()
+        if mode not in MODES or not is_admin_token(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+        if not _active.acquire(blocking=False):
+            await self.app(scope, receive, _with_header(send, b"x-profile", b"busy"))
+            return
+
+        profile = RequestProfile(mode, self.interval)
+        token = _current.set(profile)
+        start = time.perf_counter()
+        status = None
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            profile.start()
+            with profile.thread():
+                await self.app(scope, receive, _with_header(send_status, b"x-profile-id", profile.id.encode()))
+        finally:
+            profile.stop()
+            _current.reset(token)
+            _active.release()
+            store.add({
+                "id": profile.id,
+                "mode": mode,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round(1000 * (time.perf_counter() - start), 3),
+                "samples": profile.sampler.samples if profile.sampler else None,
+                "unprofiled_threads": profile.unprofiled_threads,
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "data": profile.data(),
+            })
+
+
+def _with_header(send, name: bytes, value: bytes):
+    async def send_with_header(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers", [])) + [(name, value)]}
+        await send(message)
+    return send_with_header
@@ -0,0 +1,129 @@
+"""
+Fast serialization of the documents read from our own databases.
+
+The listing endpoints used to return the documents through `parse_mongo_id`
+(which mutates them one by one) and a `response_model`, which validates
+every document with pydantic before encoding it with the default JSON
+encoder. The documents come from our database, written through the same
+models: `TrustedSerializer` skips the validation.
+
+    templates_serializer = TrustedSerializer(TemplateReadFields, "template")
+
+    @router.get("/", response_model=list[TemplateReadFields])
+    async def get_templates_endpoint():
+        templates = ...
+        return templates_serializer.response(templates)
+
+It keeps the fields of the model in each document (with the model
+defaults for the absent optional ones, as `model_construct` does) and sets
+the id field (`tid`, `pid`) from `_id`, without copying or mutating the
+documents. The rows are encoded with orjson (the standard `json` module
+when it is not installed), which converts the ObjectIds and datetimes to
+strings as it meets them: the documents are walked once. The
+`response_model` is kept for the OpenAPI schema only: FastAPI does not
+validate a returned `Response`.
+
+`RESPONSE_VALIDATION=1` validates the rows with a precompiled `TypeAdapter`
+of the model before encoding them, to catch documents that do not match
+their model (e.g. in tests or after a migration).
+"""
+import json
+import os
+from typing import Any, Iterable, List, Optional, Type, Union
+
+from bson.objectid import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode `content` to JSON, ObjectIds and datetimes included.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    A JSON response encoded with `dumps`.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class TrustedSerializer:
+    """
+    Class to serialize trusted database documents as a pydantic model, without validating them.
+
+    Args:
+        model (Type[BaseModel]): The response model.
+        document_type (str): The document type: its first letter prefixes the
+            id field (`template` -> `tid`), set from `_id`. None keeps the
+            documents' own id field.
+    """
+
+    def __init__(self, model: Type[BaseModel], document_type: Optional[str] = None):
+        self.model = model
+        self.id_field = f"{document_type[0]}id" if document_type else None
+        self.defaults = {}
+        self.fields = []
+        for name, field in model.model_fields.items():
+            self.fields.append(name)
+            if not field.is_required():
+                default = field.get_default(call_default_factory=True)
+                if default is not PydanticUndefined:
+                    self.defaults[name] = default
+        self._adapter = TypeAdapter(List[model])
+        self.validate = os.getenv("RESPONSE_VALIDATION", "0") == "1"
+
+    def row(self, document: dict) -> dict:
+        """
+        The fields of the model in a document, in one pass.
+        """
+        row = {}
+        defaults = self.defaults
+        for name in self.fields:
+            value = document.get(name, PydanticUndefined)
+            if value is not PydanticUndefined:
+                row[name] = value
+            elif name in defaults:
+                row[name] = defaults[name]
+        if self.id_field and "_id" in document:
+            row[self.id_field] = str(document["_id"])
+        return row
+
+    def rows(self, documents: Union[dict, Iterable[dict]]) -> Union[dict, List[dict]]:
+        """
+        The rows of a document or a list of documents (None documents are skipped).
+        """
+        if isinstance(documents, dict):
+            return self.row(documents)
+        return [self.row(document) for document in documents if document is not None]
+
+    def response(self, documents: Union[dict, Iterable[dict]], status_code: int = 200) -> FastJSONResponse:
+        """
+        The response of a document or a list of documents.
+        """
+        rows = self.rows(documents)
+        if self.validate:
+            self._adapter.validate_python([rows] if isinstance(rows, dict) else rows)
+        return FastJSONResponse(rows, status_code=status_code)
@@ -0,0 +1,193 @@
+"""
+Request timings.
+
+Collects, per request, the time spent and the number of calls per backend,
+and returns them in a `Server-Timing` response header:
+
+    Server-Timing: mongo;dur=4.1;desc="3 calls", neo4j;dur=12.8;desc="21 calls",
+                   service;dur=17.3;desc="1 call", endpoint;dur=17.9,
+                   serialize;dur=0.6, total;dur=19.0
+
+- `mongo`, `neo4j`, `service`: the operations wrapped by `handle_db_operations`
+  (service spans include the database calls they make);
+- `endpoint`: the route function, `serialize`: the rest of the route, i.e.
+  FastAPI's request validation and response validation and serialization
+  (routes created with `TimedRoute`);
+- `total`: the whole request, middlewares included.
+
+A high call count for a short duration is the mark of an N+1 pattern.
+
+Environment:
+    SERVER_TIMING=0      do not add the header;
+    SERVER_TIMING_LOG=1  also log one JSON line per request (logger `gocod.timing`).
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from fastapi.routing import APIRoute
+
+from src.utils.profiling import profile_thread
+
+logger = logging.getLogger("gocod.timing")
+
+
+class RequestTimings:
+    """
+    Class to accumulate the spans of a request: total seconds and count per name.
+    """
+
+    def __init__(self):
+        self.spans = {}
+
+    def add(self, name: str, seconds: float):
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            span[0] += seconds
+            span[1] += 1
+
+    def header(self) -> str:
+        entries = []
+        for name, (seconds, count) in self.spans.items():
+            entry = f"{name};dur={1000 * seconds:.1f}"
+            if name in CALL_SPANS:
+                entry += f';desc="{count} call{"s" if count > 1 else ""}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+# Spans whose call count is reported.
+CALL_SPANS = ("mongo", "neo4j", "service")
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def record(name: str, seconds: float):
+    """
+    Add a span to the timings of the current request, if any.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def operation_span(func: Callable) -> str:
+    """
+    The span of an operation wrapped by `handle_db_operations`, from its class.
+    """
+    owner = func.__qualname__.split(".")[0]
+    if "Mongo" in owner:
+        return "mongo"
+    if "Neo4j" in owner:
+        return "neo4j"
+    if owner.endswith("Service"):
+        return "service"
+    return "other"
+
+
+def route_path(scope) -> Optional[str]:
+    """
+    The path template of the route that served a request (`/v1/sections/{section_id}/questions`).
+    """
+    # FastAPI keeps the router's own route in scope["route"], without the include prefixes
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    return getattr(scope.get("route"), "path", None)
+
+
+class TimedRoute(APIRoute):
+    """
+    Route recording the `endpoint` and `serialize` spans.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    record("endpoint", time.perf_counter() - start)
+        else:
+            @functools.wraps(endpoint)
+            def timed_endpoint(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    # sync endpoints run on a worker thread, profiled with the request
+                    with profile_thread():
+                        return endpoint(*args, **kwargs)
+                finally:
+                    record("endpoint", time.perf_counter() - start)
+        super().__init__(path, timed_endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            start = time.perf_counter()
+            response = await handler(request)
+            timings = _current.get()
+            if timings is not None:
+                endpoint = timings.spans.get("endpoint", [0.0])[0]
+                timings.add("serialize", time.perf_counter() - start - endpoint)
+            return response
+        return timed_handler
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware collecting the timings of each HTTP request.
+    """
+
+    def __init__(self, app, header: bool = None, log: bool = None):
+        self.app = app
+        self.header = os.getenv("SERVER_TIMING", "1") == "1" if header is None else header
+        self.log = os.getenv("SERVER_TIMING_LOG", "0") == "1" if log is None else log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (self.header or self.log):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = None
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.header:
+                    timings.add("total", time.perf_counter() - start)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timings.header().encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current.reset(token)
+            if self.log:
+                spans = {name: span for name, span in timings.spans.items() if name != "total"}
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_path(scope),
+                    "status": status,
+                    "total_ms": round(1000 * (time.perf_counter() - start), 3),
+                    "spans": {
+                        name: {"ms": round(1000 * seconds, 3), "calls": count}
+                        for name, (seconds, count) in spans.items()
+                    },
+                }))
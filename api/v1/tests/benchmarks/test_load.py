@@ -0,0 +1,46 @@
+import pytest
+from benchmarks.load import Recorder, compare, percentile
+
+
+@pytest.mark.benchmarks
+def test_percentile():
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == pytest.approx(4.8)
+    assert percentile([], 99) == 0.0
+
+
+@pytest.mark.benchmarks
+def test_recorder_summary():
+    recorder = Recorder()
+    recorder.add("GET /v1/sections/", 0.5, 200)
+    recorder.recording = True
+    recorder.add("GET /v1/sections/", 0.010, 200)
+    recorder.add("GET /v1/sections/", 0.020, 500)
+    recorder.add("GET /v1/templates/", 0.030, 0)
+
+    summary = recorder.summary(elapsed=2.0)
+
+    sections = summary["routes"]["GET /v1/sections/"]
+    assert sections["requests"] == 2
+    assert sections["errors"] == 1
+    assert sections["rps"] == 1.0
+    assert sections["p50_ms"] == pytest.approx(15.0)
+    assert sections["statuses"] == {"200": 1, "500": 1}
+    assert summary["total"]["requests"] == 3
+    assert summary["total"]["errors"] == 2
+
+
+@pytest.mark.benchmarks
+def test_compare():
+    stats = {"rps": 100.0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 0.0}
+    baseline = {"routes": {"GET /v1/sections/": stats}, "total": stats}
+    results = {
+        "routes": {"GET /v1/sections/": dict(stats, rps=150.0, p50_ms=5.0), "GET /v1/templates/": stats},
+        "total": stats,
+    }
+
+    changes = compare(baseline, results)
+
+    assert changes["GET /v1/sections/"] == {"rps": 50.0, "p50_ms": -50.0, "p95_ms": 0.0}
+    assert "GET /v1/templates/" not in changes
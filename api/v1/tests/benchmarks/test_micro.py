@@ -0,0 +1,18 @@
+import pytest
+from benchmarks.micro import Case, cases
+
+
+@pytest.mark.benchmarks
+def test_every_case_runs():
+    for case in cases():
+        stats = case.run(repeat=1, min_time=1e-9)
+        assert stats["ns"] > 0, case.name
+        assert stats["calls"] == 1, case.name
+
+
+@pytest.mark.benchmarks
+def test_allocations_count_the_kept_result():
+    stats = Case("list", lambda n: [None] * n, lambda: (1000,)).allocations(number=10)
+
+    assert stats["allocs"] >= 1
+    assert stats["bytes"] >= 8000
@@ -159,3 +159,25 @@ def test_delete_relationship(neo4j_db_instance):
     assert result is not None
     assert result._contains_updates == True
     assert result.relationships_deleted == 1
+
+
+@pytest.mark.crud_neo4j
+def test_drop_label_in_batches(neo4j_db_instance):
+    for i in range(5):
+        neo4j_db_instance.create(
+            tx_type="node",
+            node_label="DropTest",
+            properties={"id": f"drop_{i}"},
+            identifier="id",
+        )
+    progress = []
+
+    result = neo4j_db_instance.drop(
+        label="DropTest",
+        batch_size=2,
+        chunk_size=2,
+        on_progress=lambda label, deleted, total: progress.append((deleted, total)),
+    ).get("result")
+
+    assert result == {"DropTest": 5}
+    assert progress == [(2, 5), (4, 5), (5, 5)]
@@ -0,0 +1,30 @@
+import threading
+import time
+import pytest
+from src.db import memory_db
+
+
+@pytest.mark.crud_operations
+def test_concurrent_callers_get_the_seeded_graph(monkeypatch):
+    def slow_seed(neo4j):
+        time.sleep(0.2)
+        neo4j.merge_nodes("Section", ("id",), [{"id": "seeded"}])
+
+    monkeypatch.setattr(memory_db, "_neo4j", None)
+    monkeypatch.setattr(memory_db, "_seed", slow_seed)
+    monkeypatch.setenv("MEMORY_DB_SEED", "1")
+    graphs = []
+
+    def get_graph():
+        graph = memory_db.get_memory_neo4j_db()
+        graphs.append((graph, len(graph.read_nodes("Section").get("result"))))
+
+    threads = [threading.Thread(target=get_graph) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert len({id(graph) for graph, _ in graphs}) == 1
+    assert [sections for _, sections in graphs] == [1] * 8
@@ -0,0 +1,86 @@
+import sys
+import mongomock
+import pytest
+from src.db.ingestion import job
+from src.db.ingestion.graph import build_graph, content_hash
+from src.db.ingestion.incremental import IncrementalIngestion, diff_hashes
+from src.db.memory_db import InMemoryMongoDB, InMemoryNeo4jDB
+
+
+test_sections = [
+    {'id': 'project_info', 'name': 'Project Information', 'order': 1,
+     'description': 'Define the type of project you are working on.', 'is_conditional': False},
+]
+test_questions = [
+    {'statement': 'Which language?', 'id': 'language', 'question_type': 'multiselect',
+     'is_first': True, 'required': True, 'section_id': 'project_info', 'order': 1},
+    {'statement': 'Which version(s)?', 'id': 'language_version', 'question_type': 'chips',
+     'section_id': 'project_info', 'order': 2, 'depends_on': 'language', 'value': ['Python']},
+]
+test_options = [
+    {'text': 'Python', 'is_default': True, 'question_id': 'language', 'tags': ['Python', 'Scripting']},
+]
+test_templates = [
+    {'created_by': 'admin', 'is_private': False, 'template_name': 'Cookiecutter',
+     'template_description': 'A template.', 'template_tags': ['Python']},
+]
+
+
+@pytest.mark.ingestion
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+@pytest.mark.ingestion
+def test_build_graph():
+    nodes, edges = build_graph(test_templates, test_sections, test_questions, test_options)
+    assert set(nodes["Tag"]) == {("Python",), ("Scripting",)}
+    assert ("language", "Python") in nodes["Option"]
+    assert "value" not in nodes["Question"][("language_version",)]
+    leads_to = edges[("Option", "LEADS_TO", "Question")]
+    assert list(leads_to) == [(("language", "Python"), ("language_version",))]
+    assert len(edges[("Tag", "RECOMMENDS", "Template")]) == 1
+
+
+@pytest.mark.ingestion
+def test_diff_hashes():
+    nodes, _ = build_graph([], test_sections, test_questions, [])
+    stored = {key: node["content_hash"] for key, node in nodes["Question"].items()}
+    stored[("language",)] = "outdated"
+    stored[("removed",)] = "whatever"
+    del stored[("language_version",)]
+
+    changes = diff_hashes(nodes["Question"], stored)
+
+    assert changes == {
+        "inserts": [("language_version",)],
+        "updates": [("language",)],
+        "deletes": [("removed",)],
+    }
+
+
+@pytest.mark.ingestion
+def test_incremental_run_keeps_the_private_templates():
+    mongo = InMemoryMongoDB(mongomock.MongoClient()["test_db"])
+    # a public template removed from the source, and a private copy with the same name
+    stale = {"template_name": "Stale", "template_description": "Gone.", "content_hash": "old"}
+    mongo.create([{**stale, "is_private": False}, {**stale, "is_private": True, "created_by": "user"}],
+                 "templates", many=True)
+
+    IncrementalIngestion(mongo, InMemoryNeo4jDB()).run(test_templates, test_sections, test_questions, test_options)
+
+    remaining = mongo.read({}, "templates", many=True, limit=0).get("result")
+    assert sorted((doc["template_name"], doc["is_private"]) for doc in remaining) == [
+        ("Cookiecutter", False), ("Stale", True),
+    ]
+
+
+@pytest.mark.ingestion
+@pytest.mark.parametrize("mode", ["full", "stream", "staged"])
+def test_dry_run_is_only_for_the_incremental_mode(monkeypatch, mode):
+    monkeypatch.setattr(sys, "argv", ["job", "--mode", mode, "--dry-run"])
+    monkeypatch.setattr(job, "get_mongo_db", lambda: pytest.fail("the databases must not be opened"))
+    with pytest.raises(SystemExit) as error:
+        job.main()
+    assert error.value.code == 2
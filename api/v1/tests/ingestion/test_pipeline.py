@@ -0,0 +1,43 @@
+import threading
+import pytest
+from bson.objectid import ObjectId
+from src.db.ingestion.pipeline import StagedIngestion
+from src.db.ingestion.sources import ModuleSource
+
+
+class RecordingMongo:
+    def bulk_upsert(self, documents, collection_name, key, batch_size=1000):
+        return {"success": True, "result": len(documents)}
+
+    def read(self, query, collection_name, **kwargs):
+        names = query["template_name"]["$in"]
+        return {"success": True, "result": [{"_id": ObjectId(), "template_name": n} for n in names]}
+
+
+class RecordingNeo4j:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = []
+
+    def merge_nodes(self, node_label, key_fields, rows, batch_size=1000):
+        with self.lock:
+            self.writes.append(("node", node_label, len(rows)))
+
+    def merge_relationships(self, start_node_label, start_key_fields, relation_type,
+                            end_node_label, end_key_fields, rows, batch_size=1000):
+        with self.lock:
+            self.writes.append(("edge", (start_node_label, end_node_label), len(rows)))
+
+
+@pytest.mark.ingestion
+def test_edges_are_written_after_their_endpoints():
+    neo4j = RecordingNeo4j()
+    stages = StagedIngestion(RecordingMongo(), neo4j, batch_size=5, workers=3).run(ModuleSource())
+
+    for index, (kind, target, _) in enumerate(neo4j.writes):
+        if kind == "edge":
+            remaining_labels = {w[1] for w in neo4j.writes[index:] if w[0] == "node"}
+            assert not remaining_labels & set(target)
+
+    assert stages["(:Section)"]["records"] == 7
+    assert stages["(:Question)-[:HAS_OPTION]->(:Option)"]["records"] == 63
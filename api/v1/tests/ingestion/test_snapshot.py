@@ -0,0 +1,78 @@
+import datetime
+import gzip
+import pytest
+from bson.objectid import ObjectId
+from src.db.ingestion.snapshot import (
+    _chunk,
+    _edge_row,
+    from_columns,
+    read_snapshot,
+    to_columns,
+    write_snapshot,
+)
+
+
+@pytest.mark.ingestion
+def test_columns_round_trip():
+    rows = [{"id": "language", "order": 1}, {"id": "project_name", "required": True}]
+    columns, data, missing = to_columns(rows)
+    assert columns == ["id", "order", "required"]
+    assert data == [["language", "project_name"], [1, None], [None, True]]
+    assert missing == [[], [1], [0]]
+    assert from_columns(columns, data, missing) == rows
+
+
+@pytest.mark.ingestion
+def test_columns_round_trip_keeps_the_null_values():
+    rows = [{"id": "language", "depends_on": None}, {"id": "project_name"}]
+    assert from_columns(*to_columns(rows)) == rows
+
+
+@pytest.mark.ingestion
+def test_version_1_columns_drop_the_null_values():
+    assert from_columns(["id", "order"], [["language", "project_name"], [1, None]]) == [
+        {"id": "language", "order": 1}, {"id": "project_name"},
+    ]
+
+
+@pytest.mark.ingestion
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "graph.snap")
+    template_id = ObjectId()
+    created_at = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    chunks = [
+        _chunk("documents", "templates", [{"_id": template_id, "created_at": created_at, "description": None}],
+               collection="templates"),
+        _chunk("nodes", "(:Tag)", [{"name": "Python"}, {"name": "Go"}], label="Tag"),
+    ]
+
+    counts = write_snapshot(path, iter(chunks))
+    read = list(read_snapshot(path))
+
+    assert counts == {"templates": 1, "(:Tag)": 2}
+    document = from_columns(read[0]["columns"], read[0]["data"], read[0]["missing"])[0]
+    assert document == {"_id": template_id, "created_at": created_at, "description": None}
+    assert from_columns(read[1]["columns"], read[1]["data"], read[1]["missing"]) == [{"name": "Python"}, {"name": "Go"}]
+
+
+@pytest.mark.ingestion
+def test_truncated_snapshot_is_rejected(tmp_path):
+    path = str(tmp_path / "graph.snap")
+    write_snapshot(path, iter([_chunk("nodes", "(:Tag)", [{"name": "Python"}], label="Tag")]))
+    with gzip.open(path, "rb") as file:
+        content = file.read()
+    with gzip.open(path, "wb") as file:
+        file.write(content[:-10])
+
+    with pytest.raises(ValueError, match="truncated"):
+        list(read_snapshot(path))
+
+
+@pytest.mark.ingestion
+def test_edge_row():
+    row = {"start.question_id": "language", "start.text": "Python", "end.id": "language_version", "content_hash": "h"}
+    assert _edge_row(row) == {
+        "start": {"question_id": "language", "text": "Python"},
+        "end": {"id": "language_version"},
+        "properties": {"content_hash": "h"},
+    }
@@ -0,0 +1,56 @@
+import json
+import pytest
+from src.db.ingestion.sources import FileSource, ModuleSource, batched, dump_source
+
+
+@pytest.mark.ingestion
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 2)) == []
+
+
+@pytest.mark.ingestion
+def test_file_source_jsonl(tmp_path):
+    records = [
+        {"question_id": "language", "text": "Python", "tags": ["Python"]},
+        {"question_id": "language", "text": "Golang", "is_default": False},
+    ]
+    (tmp_path / "options.jsonl").write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    options = list(FileSource(str(tmp_path)).options())
+
+    assert [option["text"] for option in options] == ["Python", "Golang"]
+    assert options[0]["tags"] == ["Python"]
+    assert list(FileSource(str(tmp_path)).sections()) == []
+
+
+@pytest.mark.ingestion
+def test_file_source_yaml(tmp_path):
+    (tmp_path / "sections.yaml").write_text(
+        "id: project_info\nname: Project Information\norder: 1\n"
+        "description: Define the project.\nis_conditional: false\n"
+        "---\n"
+        "id: project_type\nname: Project Type\norder: '2'\n"
+        "description: Define the type.\nis_conditional: false\n"
+    )
+
+    sections = list(FileSource(str(tmp_path)).sections())
+
+    assert [section["id"] for section in sections] == ["project_info", "project_type"]
+    assert sections[1]["order"] == 2
+
+
+@pytest.mark.ingestion
+def test_file_source_rejects_invalid_record(tmp_path):
+    (tmp_path / "questions.jsonl").write_text(json.dumps({"id": "language"}) + "\n")
+
+    with pytest.raises(ValueError, match="questions.jsonl:1"):
+        list(FileSource(str(tmp_path)).questions())
+
+
+@pytest.mark.ingestion
+def test_dump_module_source(tmp_path):
+    counts = dump_source(ModuleSource(), str(tmp_path))
+
+    assert counts["sections"] == 7
+    assert len(list(FileSource(str(tmp_path)).questions())) == counts["questions"]
@@ -0,0 +1,56 @@
+import collections
+import pytest
+from src.db.ingestion.graph import build_graph
+from src.db.ingestion.sources import FileSource
+from src.db.ingestion.synthetic import PROJECT_TYPES, SyntheticCatalog, scaled
+
+
+@pytest.mark.ingestion
+def test_catalog_is_a_valid_source(tmp_path):
+    counts = SyntheticCatalog(templates=30, users=3, projects=6, depth=3, width=8).write(str(tmp_path))
+    source = FileSource(str(tmp_path))
+
+    templates = list(source.templates())
+    questions = list(source.questions())
+    options = list(source.options())
+
+    assert counts["templates"] == len(templates) == 30
+    assert counts["users"] == 3 and counts["projects"] == 6
+    # Level widths 1, 6, then capped at 8, in each of the 7 sections.
+    assert len(questions) == 7 * (1 + 6 + 8)
+    assert len(options) == 6 * len(questions)
+    assert [q["id"] for q in questions if q["is_first"]] == ["section-000-l0-q0"]
+
+
+@pytest.mark.ingestion
+def test_catalog_leads_to_existing_options():
+    catalog = SyntheticCatalog(templates=5, depth=4, width=10)
+    options = {(o["question_id"], o["text"]) for o in catalog.options()}
+
+    nodes, edges = build_graph(list(catalog.templates()), list(catalog.sections()),
+                               list(catalog.questions()), list(catalog.options()))
+
+    leads_to = edges[("Option", "LEADS_TO", "Question")]
+    assert leads_to
+    assert all(tuple(row["start"][k] for k in ("question_id", "text")) in options for row in leads_to.values())
+    project_types = [o["text"] for o in catalog.options() if o["question_id"] == "section-000-l0-q0"]
+    assert project_types == PROJECT_TYPES
+
+
+@pytest.mark.ingestion
+def test_catalog_is_deterministic_and_zipf():
+    first = list(SyntheticCatalog(templates=500, seed=1).templates())
+
+    assert first == list(SyntheticCatalog(templates=500, users=99, seed=1).templates())
+    assert first != list(SyntheticCatalog(templates=500, seed=2).templates())
+    tags = collections.Counter(tag for template in first for tag in template["template_tags"])
+    (top, top_count), = tags.most_common(1)
+    assert top == PROJECT_TYPES[0]
+    assert top_count > 10 * tags["Tag 00100"]
+
+
+@pytest.mark.ingestion
+def test_scaled():
+    assert scaled(10)["templates"] == 190
+    assert scaled(1000)["templates"] == 19000
+    assert scaled(1000)["depth"] > scaled(10)["depth"]
@@ -0,0 +1,104 @@
+import json
+import pytest
+from src.db.ingestion.sources import ModuleSource
+from src.db.ingestion.validation import (
+    INDEX_LABEL,
+    QuestionnaireGraphError,
+    delete_index,
+    find_cycles,
+    store_index,
+    topological_order,
+    validate_questionnaire,
+    validate_source,
+)
+from src.db.memory_db import InMemoryNeo4jDB
+
+sections = [
+    {"id": "s1", "order": 1},
+    {"id": "s2", "order": 2},
+]
+questions = [
+    {"id": "language", "section_id": "s1", "order": 1},
+    {"id": "version", "section_id": "s2", "order": 1, "depends_on": "language", "value": ["Python"]},
+    {"id": "framework", "section_id": "s1", "order": 2, "depends_on": "version", "value": ["3.12"]},
+]
+options = [
+    {"question_id": "language", "text": "Python"},
+    {"question_id": "language", "text": "Other"},
+    {"question_id": "version", "text": "3.12"},
+    {"question_id": "framework", "text": "Other"},
+]
+
+
+@pytest.mark.ingestion
+def test_valid_questionnaire_index():
+    report = validate_questionnaire(sections, questions, options)
+
+    assert report["errors"] == []
+    assert report["warnings"] == ["option text 'Other' shared by questions ['framework', 'language']"]
+    index = report["index"]
+    # framework comes before version by position, but after it in the LEADS_TO order
+    assert index["order"] == ["language", "version", "framework"]
+    assert json.loads(index["reachable"]) == {"language": ["framework", "version"], "version": ["framework"],
+                                              "framework": []}
+
+
+@pytest.mark.ingestion
+def test_invalid_questionnaire():
+    bad_questions = questions + [
+        {"id": "orphan", "section_id": "missing", "order": 1, "depends_on": "ghost", "value": ["x"]},
+        {"id": "tool", "section_id": "s1", "order": 3, "depends_on": "language", "value": ["Rust"]},
+    ]
+    bad_options = options + [{"question_id": "missing_question", "text": "Yes"}]
+
+    report = validate_questionnaire(sections, bad_questions, bad_options)
+
+    assert report["errors"] == [
+        "option 'Yes' of unknown question 'missing_question'",
+        "question 'orphan' of unknown section 'missing'",
+        "question 'orphan' depends on unknown question 'ghost'",
+        "question 'tool' depends on 'Rust', not an option of 'language'",
+    ]
+
+
+@pytest.mark.ingestion
+def test_cycles_are_rejected():
+    cyclic = [{**questions[0], "depends_on": "framework", "value": ["Other"]}] + questions[1:]
+
+    report = validate_questionnaire(sections, cyclic, options)
+
+    assert report["index"] is None
+    assert report["errors"] == ["LEADS_TO cycle language -> version -> framework -> language"]
+
+
+@pytest.mark.ingestion
+def test_topological_order_leaves_out_the_cycles():
+    edges = [("a", "b"), ("b", "c"), ("c", "a"), ("c", "d")]
+
+    order, cyclic = topological_order("abcde", edges)
+
+    assert order == ["e"]
+    assert cyclic == ["a", "b", "c", "d"]
+    assert find_cycles(cyclic, edges) == [["a", "b", "c", "a"]]
+
+
+@pytest.mark.ingestion
+def test_the_seed_questionnaire_is_valid():
+    report = validate_source(ModuleSource())
+    assert report["index"]["order"][0] == "project_name"
+
+    with pytest.raises(QuestionnaireGraphError):
+        validate_source(ModuleSource(), strict=True)
+
+
+@pytest.mark.ingestion
+def test_store_and_delete_the_index():
+    neo4j = InMemoryNeo4jDB()
+    index = validate_questionnaire(sections, questions, options)["index"]
+
+    store_index(neo4j, index)
+    store_index(neo4j, index)
+    assert neo4j.read_nodes(INDEX_LABEL).get("result") == [index]
+
+    delete_index(neo4j)
+    assert neo4j.read_nodes(INDEX_LABEL).get("result") == []
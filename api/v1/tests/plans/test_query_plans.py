@@ -0,0 +1,173 @@
+"""
+Query-plan regression suite.
+
+Seeds a synthetic catalog in scratch databases, creates the indexes of
+`src.db.indexes`, runs the service reads while capturing the MongoDB
+commands and the Neo4j queries they issue, then explains every captured
+query: the suite fails on a `COLLSCAN` or an `AllNodesScan`, and on a
+`NodeByLabelScan` for a lookup by property.
+
+It needs real databases (the in-memory backends have no query planner), and
+is skipped unless they are configured:
+
+    QUERY_PLAN_MONGO_URI=mongodb://localhost:27017 \\
+    QUERY_PLAN_NEO4J_URI=neo4j://localhost:7687 QUERY_PLAN_NEO4J_USER=neo4j QUERY_PLAN_NEO4J_PASSWORD=... \\
+    python -m pytest -m query_plans tests/plans
+
+The Mongo data goes to a `query_plans` database, dropped afterwards; the
+Neo4j graph must be a scratch one, its catalog labels are dropped afterwards.
+"""
+import json
+import os
+import pytest
+from pymongo import MongoClient
+from src.db import neo4j_profiling
+from src.db.indexes import ensure_indexes
+from src.db.ingestion.job import run_stream
+from src.db.ingestion.sources import FileSource
+from src.db.ingestion.synthetic import SyntheticCatalog, load_accounts, object_id, scaled
+from src.db.mongo_db import MongoDB
+from src.db.monitoring import EXPLAINABLE, CommandMonitor, explain_command, plan_stages, plan_summary
+from src.db.neo4j_db import Neo4jDB
+from src.db.neo4j_profiling import QueryProfiler, plan_operators
+from src.services.projects_service import ProjectService
+from src.services.questionnaire_service import QuestionnaireService
+from src.services.sections_service import SectionService
+from src.services.templates_service import TemplateService
+from src.services.users_service import UserService
+
+MONGO_URI = os.getenv("QUERY_PLAN_MONGO_URI")
+NEO4J_URI = os.getenv("QUERY_PLAN_NEO4J_URI")
+DATABASE = "query_plans"
+SCALE = 10
+LABELS = ["Section", "Question", "Option", "Tag", "Template", "Project"]
+
+# Queries that scan a whole label by design, by template prefix.
+ALLOWED_LABEL_SCANS = {
+    "MATCH (u:Section {}) RETURN u ORDER BY u.order ASC": "lists every section",
+    "MATCH (p:Project {id: $project_id})": "matches the options on toLower(o.text), and every template on its tags",
+    "MATCH (n:Section) RETURN properties(n)": "the questionnaire bundle reads every section",
+    "MATCH (n:Question) RETURN properties(n)": "the questionnaire bundle reads every question",
+    "MATCH (n:Option) RETURN properties(n)": "the questionnaire bundle reads every option",
+    "MATCH (a:Option)-[:LEADS_TO]->(b:Question)": "the questionnaire bundle reads every LEADS_TO",
+    "MATCH (n:QuestionnaireIndex) RETURN properties(n)": "the questionnaire bundle reads its one index node",
+}
+
+pytestmark = [
+    pytest.mark.query_plans,
+    pytest.mark.skipif(not (MONGO_URI and NEO4J_URI), reason="QUERY_PLAN_MONGO_URI and QUERY_PLAN_NEO4J_URI not set"),
+]
+
+
+def full_scan_expected(stats: dict) -> bool:
+    # count_documents({}) of the first page of templates counts every document
+    pipeline = stats["shape"].get("pipeline") or [None]
+    return stats["operation"] == "aggregate" and pipeline[0] == {"$match": {}}
+
+
+@pytest.fixture(scope="module")
+def databases(tmp_path_factory):
+    monitor = CommandMonitor(slow_ms=float("inf"))
+    client = MongoClient(MONGO_URI, event_listeners=[monitor])
+    mongo = MongoDB(client[DATABASE])
+    neo4j = Neo4jDB(NEO4J_URI, os.getenv("QUERY_PLAN_NEO4J_USER", "neo4j"), os.getenv("QUERY_PLAN_NEO4J_PASSWORD"))
+
+    directory = str(tmp_path_factory.mktemp("catalog"))
+    catalog = SyntheticCatalog(**scaled(SCALE))
+    catalog.write(directory)
+    run_stream(mongo, neo4j, FileSource(directory))
+    load_accounts(mongo, neo4j, directory)
+    ensure_indexes(mongo, neo4j)
+    neo4j.execute_auto("CALL db.awaitIndexes(300)")
+    try:
+        yield {"monitor": monitor, "client": client, "mongo": mongo, "neo4j": neo4j, "catalog": catalog}
+    finally:
+        client.drop_database(DATABASE)
+        neo4j.drop(label=LABELS)
+        neo4j.close()
+        client.close()
+
+
+@pytest.fixture(scope="module")
+def captured(databases):
+    """
+    Run the service reads, and return the Mongo command shapes and the Neo4j query templates they issued.
+    """
+    mongo, neo4j, catalog = databases["mongo"], databases["neo4j"], databases["catalog"]
+    monitor = databases["monitor"]
+    profiler = QueryProfiler(sample_rate=0.0, slow_ms=float("inf"))
+    previous = neo4j_profiling._profiler, neo4j_profiling._configured
+    neo4j_profiling._profiler, neo4j_profiling._configured = profiler, True
+    monitor.reset()
+
+    section_id = next(iter(catalog.sections()))["id"]
+    question_id = "section-000-l0-q0"
+    option_text = next(o["text"] for o in catalog.options() if o["question_id"] == question_id)
+    template = mongo.db["templates"].find_one()
+    user = mongo.db["users"].find_one({"templates.0": {"$exists": True}})
+    project_id = object_id(2, 0)
+    try:
+        sections = SectionService(neo4j)
+        sections.get_sections()
+        sections.get_section_by_property("id", section_id)
+        sections.get_next_section(section_id)
+        sections.get_questions_for_section(section_id)
+        sections.get_questions_for_sections([section_id], include_options=True)
+        sections.get_options_for_question(question_id)
+        sections.get_next_questions(question_id, option_text)
+        sections.prefetch_follow_ups([{"id": question_id}], 2)
+        QuestionnaireService(neo4j).get_bundle()
+
+        templates = TemplateService(mongo, neo4j)
+        templates.read_template(str(template["_id"]))
+        templates.read_template(user["templates"][0]["template_name"], user_id=str(user["_id"]))
+        templates.get_templates({}, 0, 10)
+        # list_templates(user_id) reads each template of the user by tid
+        mongo.read({"tid": template["tid"]}, "templates")
+
+        projects = ProjectService(mongo, neo4j)
+        projects.read_project(project_id)
+        projects.list_projects(str(user["_id"]))
+        projects.get_recommended_templates(project_id)
+
+        users = UserService(mongo)
+        users.read_user(str(user["_id"]))
+        users.get_user_by_username(user["username"])
+    finally:
+        neo4j_profiling._profiler, neo4j_profiling._configured = previous
+
+    return {"mongo": monitor.top(limit=1000), "neo4j": profiler.top(limit=1000)}
+
+
+def test_services_issue_the_expected_queries(captured):
+    collections = {(stats["collection"], stats["operation"]) for stats in captured["mongo"]}
+    assert {("templates", "find"), ("projects", "find"), ("users", "find")} <= collections
+    templates = [stats["template"] for stats in captured["neo4j"]]
+    assert any("HAS_OPTION" in template for template in templates)
+    assert any("LEADS_TO" in template for template in templates)
+    assert any(template.startswith("MATCH (p:Project {id: $project_id})") for template in templates)
+
+
+def test_mongo_queries_do_not_scan_collections(databases, captured):
+    failures = []
+    for stats in captured["mongo"]:
+        if stats["collection"] is None or stats["operation"] not in EXPLAINABLE or full_scan_expected(stats):
+            continue
+        explain = explain_command(databases["client"], stats)
+        if "COLLSCAN" in plan_stages(explain):
+            failures.append(f"{stats['collection']}.{stats['operation']} {json.dumps(stats['shape'])}: "
+                            f"{plan_summary(explain)}")
+    assert not failures, "Full collection scans:\n" + "\n".join(failures)
+
+
+def test_neo4j_queries_do_not_scan_all_nodes(databases, captured):
+    failures = []
+    for stats in captured["neo4j"]:
+        sample = stats["sample"]
+        with databases["neo4j"]._driver.session() as session:
+            plan = session.run(f"EXPLAIN {sample['query']}", sample["parameters"]).consume().plan
+        operators = [operator["operator"] for operator in plan_operators(plan)]
+        label_scan_allowed = any(stats["template"].startswith(prefix) for prefix in ALLOWED_LABEL_SCANS)
+        if "AllNodesScan" in operators or ("NodeByLabelScan" in operators and not label_scan_allowed):
+            failures.append(f"{stats['template']}: {' <- '.join(operators)}")
+    assert not failures, "Full scans:\n" + "\n".join(failures)
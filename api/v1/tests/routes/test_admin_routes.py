@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.db import monitoring
+from src.db.monitoring import CommandMonitor, command_shape, plan_summary
+
+client = TestClient(app)
+
+
+class ListSink:
+    def __init__(self):
+        self.entries = []
+
+    def write(self, entry):
+        self.entries.append(entry)
+
+
+def run_command(monitor, request_id, command_name, command, duration_ms, reply):
+    event = SimpleNamespace(connection_id=("localhost", 27017), request_id=request_id, command_name=command_name,
+                            command=command, database_name="test_db", duration_micros=int(1000 * duration_ms),
+                            reply=reply)
+    monitor.started(event)
+    monitor.succeeded(event)
+
+
+@pytest.mark.admin_routes
+def test_command_shape_normalizes_literals():
+    first = {"find": "templates", "filter": {"template_name": "FastAPI", "stars": {"$gte": 3}},
+             "limit": 10, "lsid": {"id": "session"}}
+    second = {"find": "templates", "filter": {"template_name": "Django", "stars": {"$gte": 1}},
+              "limit": 10, "lsid": {"id": "other"}}
+
+    assert command_shape("find", first) == command_shape("find", second) == {
+        "filter": {"template_name": "?", "stars": {"$gte": "?"}}, "limit": 10,
+    }
+    assert command_shape("find", {"find": "t", "filter": {"tags": {"$in": ["a", "b", "c"]}}}) == {
+        "filter": {"tags": {"$in": ["?"]}},
+    }
+
+
+@pytest.mark.admin_routes
+def test_command_monitor_aggregates_shapes_and_logs_slow_commands():
+    sink = ListSink()
+    monitor = CommandMonitor(slow_ms=50, sink=sink)
+    reply = {"cursor": {"firstBatch": [{}, {}], "id": 0}, "ok": 1}
+    run_command(monitor, 1, "find", {"find": "templates", "filter": {"template_name": "FastAPI"}}, 10, reply)
+    run_command(monitor, 2, "find", {"find": "templates", "filter": {"template_name": "Django"}}, 80, reply)
+    run_command(monitor, 3, "insert", {"insert": "users", "documents": [{"a": 1}]}, 5, {"n": 1, "ok": 1})
+
+    top = monitor.top(sort="max_ms")
+    assert [(s["collection"], s["operation"]) for s in top] == [("templates", "find"), ("users", "insert")]
+    assert top[0]["count"] == 2
+    assert top[0]["slow"] == 1
+    assert top[0]["documents"] == 4
+    assert top[0]["mean_ms"] == pytest.approx(45)
+    assert top[0]["sample"]["filter"] == {"template_name": "Django"}
+    assert [(e["collection"], e["duration_ms"]) for e in sink.entries] == [("templates", 80)]
+    assert monitor.top(slow_only=True) == top[:1]
+    assert "documents" not in top[1]["sample"]
+
+
+@pytest.mark.admin_routes
+def test_command_monitor_logs_slow_commands_past_max_shapes():
+    sink = ListSink()
+    monitor = CommandMonitor(slow_ms=50, sink=sink, max_shapes=1)
+    reply = {"cursor": {"firstBatch": [], "id": 0}, "ok": 1}
+    run_command(monitor, 1, "find", {"find": "templates", "filter": {"template_name": "FastAPI"}}, 10, reply)
+    run_command(monitor, 2, "find", {"find": "projects", "filter": {"id": "p1"}}, 80, reply)
+    updates = [{"q": {"id": "p1"}, "u": {"$set": {"tree": "x" * 1000}}}, {"q": {"id": "p2"}, "u": {}}]
+    run_command(monitor, 3, "update", {"update": "projects", "updates": updates}, 5, {"n": 2, "ok": 1})
+
+    assert [stats["collection"] for stats in monitor.top()] == ["templates"]
+    assert [entry["collection"] for entry in sink.entries] == ["projects"]
+
+    monitor = CommandMonitor(slow_ms=50)
+    run_command(monitor, 4, "update", {"update": "projects", "updates": updates}, 5, {"n": 2, "ok": 1})
+    assert monitor.top()[0]["sample"]["updates"] == [{"q": {"id": "p1"}, "u": {"$set": {"tree": "?"}}}]
+
+
+@pytest.mark.admin_routes
+@pytest.mark.parametrize("env, sink_type", [
+    ({}, monitoring.SlowQueryLog),
+    ({"MONGO_SLOW_LOG": "file"}, monitoring.SlowQueryLog),
+    ({"MONGO_SLOW_LOG": "file", "MONGO_SLOW_LOG_PATH": "slow.log"}, monitoring.SlowQueryFile),
+    ({"MONGO_SLOW_LOG": "off"}, type(None)),
+])
+def test_command_monitor_sink(monkeypatch, tmp_path, env, sink_type):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(monitoring, "_monitor", None)
+    for name in ("MONGO_SLOW_LOG", "MONGO_SLOW_LOG_PATH"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+
+    monitor = monitoring.get_command_monitor()
+    assert isinstance(monitor.sink, sink_type)
+    if monitor.sink is not None:
+        monitor.sink.write({"collection": "templates", "duration_ms": 80})
+    assert [path.name for path in tmp_path.iterdir()] == (["slow.log"] if "MONGO_SLOW_LOG_PATH" in env else [])
+
+
+@pytest.mark.admin_routes
+def test_plan_summary():
+    explain = {"queryPlanner": {"winningPlan": {
+        "stage": "FETCH", "inputStage": {"stage": "IXSCAN", "keyPattern": {"template_name": 1}},
+    }}}
+    assert plan_summary(explain) == "IXSCAN { template_name: 1 }"
+    assert plan_summary({"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}) == "COLLSCAN"
+
+
+@pytest.mark.admin_routes
+def test_admin_routes_require_the_admin_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/v1/admin/mongo/slow-queries", headers={"X-Admin-Token": ""}).status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get("/v1/admin/mongo/slow-queries").status_code == 403
+    assert client.get("/v1/admin/mongo/slow-queries", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+@pytest.mark.admin_routes
+def test_get_mongo_slow_queries(monkeypatch):
+    monitor = CommandMonitor(slow_ms=50)
+    run_command(monitor, 1, "find", {"find": "templates", "filter": {"template_name": "FastAPI"}}, 80,
+                {"cursor": {"firstBatch": [], "id": 0}})
+    monkeypatch.setattr(monitoring, "_monitor", monitor)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+    response = client.get("/v1/admin/mongo/slow-queries?limit=5", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["slow_ms"] == 50
+    assert body["shapes"][0]["shape"] == {"filter": {"template_name": "?"}}
+    assert "sample" not in body["shapes"][0]
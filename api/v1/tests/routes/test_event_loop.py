@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.utils import concurrency, metrics
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+
+def block_the_loop():
+    time.sleep(0.3)
+
+
+@pytest.mark.admin_routes
+def test_monitor_records_a_stall_with_its_stack_and_route():
+    monitor = concurrency.LoopMonitor(interval=0.01, threshold=0.05)
+
+    async def request():
+        scope = {"type": "http", "path": "/v1/blocking"}  # noqa: F841 (read by the watchdog)
+        block_the_loop()
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        await request()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(run())
+
+    stall = monitor.status()["stalls"][0]
+    assert stall["route"] == "/v1/blocking"
+    assert any("block_the_loop" in frame for frame in stall["stack"])
+    assert stall["duration_ms"] >= 250
+    assert monitor.max_lag >= 0.25
+    assert ("/v1/blocking",) in metrics.event_loop_stall.collect()
+
+
+@pytest.mark.admin_routes
+def test_offloaded_service_runs_on_the_pool():
+    class Service:
+        prefix = "thread"
+
+        def where(self, suffix):
+            return f"{threading.current_thread().name}:{suffix}"
+
+    service = concurrency.offloaded(Service())
+
+    assert service.prefix == "thread"
+    assert asyncio.run(service.where("x")).startswith("service")
+    assert asyncio.run(service.where("x")).endswith(":x")
+
+
+@pytest.mark.admin_routes
+def test_event_loop_endpoint():
+    with TestClient(app) as client:
+        assert client.get("/v1/admin/event-loop").status_code == 403
+        assert client.get("/v1/sections/").status_code == 200
+
+        status = client.get("/v1/admin/event-loop", headers=ADMIN).json()
+
+    assert status["monitor"]["stall_threshold_ms"] > 0
+    assert status["pool"]["threads"] >= 1
+    assert status["pool"]["started"] >= 1
@@ -0,0 +1,94 @@
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.utils.compression import negotiate
+from src.utils.etag import ETagMiddleware, content_etag, etag_matches
+
+client = TestClient(app)
+
+
+@pytest.mark.sections_routes
+def test_sections_are_gzipped_above_the_threshold():
+    response = client.get("/v1/sections/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert isinstance(response.json(), list)
+
+    identity = client.get("/v1/sections/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.json() == response.json()
+
+
+@pytest.mark.sections_routes
+def test_small_responses_are_not_compressed():
+    response = client.get("/v1/sections/by/id/does-not-exist", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.sections_routes
+def test_unchanged_sections_cost_a_304():
+    first = client.get("/v1/sections/")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "no-cache"
+
+    second = client.get("/v1/sections/", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+    assert client.get("/v1/sections/", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+
+@pytest.mark.templates_routes
+def test_templates_listing_has_an_etag():
+    response = client.get("/v1/templates/", headers={"Accept-Encoding": "gzip"})
+    if response.status_code != 200:
+        pytest.skip("the template listing fails on this backend")
+
+    assert response.headers["content-encoding"] == "gzip"
+    conditional = client.get("/v1/templates/", headers={"If-None-Match": response.headers["etag"]})
+    assert conditional.status_code == 304
+
+
+def body_app(etag=None):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", b"application/json")] + ([(b"etag", etag)] if etag else [])
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else b"[1, 2]"})
+    return app
+
+
+def test_head_responses_are_not_hashed():
+    head_client = TestClient(ETagMiddleware(body_app(), paths=("/",)))
+    etag = head_client.get("/").headers["etag"]
+
+    response = head_client.head("/", headers={"If-None-Match": content_etag(b"")})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert head_client.head("/", headers={"If-None-Match": etag}).status_code == 200
+
+    versioned = TestClient(ETagMiddleware(body_app(b'W/"v1"'), paths=("/",)))
+    assert versioned.head("/").headers["etag"] == 'W/"v1"'
+    assert versioned.head("/", headers={"If-None-Match": 'W/"v1"'}).status_code == 304
+
+
+def test_negotiate():
+    assert negotiate("gzip, deflate", ("br", "gzip")) == "gzip"
+    assert negotiate("br;q=0.5, gzip;q=0.8", ("br", "gzip")) == "gzip"
+    assert negotiate("br, gzip", ("br", "gzip")) == "br"
+    assert negotiate("*;q=0.1, gzip;q=0", ("br", "gzip")) == "br"
+    assert negotiate("identity", ("br", "gzip")) is None
+    assert negotiate("", ("gzip",)) is None
+
+
+def test_etag_matches():
+    etag = content_etag(b"body")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"x", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"x"', etag)
@@ -0,0 +1,61 @@
+import tracemalloc
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.utils import memory, metrics
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Token": "secret"}
+retained = []
+
+
+@pytest.fixture(autouse=True)
+def tracing(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    was_tracing = tracemalloc.is_tracing()
+    yield
+    if not was_tracing:
+        memory.stop()
+
+
+def allocate_blocks():
+    retained.extend(bytearray(1024) for _ in range(1000))
+
+
+@pytest.mark.admin_routes
+def test_diff_reports_the_growing_call_site():
+    assert client.post("/v1/admin/memory/start?frames=5", headers=ADMIN).json()["tracing"] is True
+    base = client.post("/v1/admin/memory/snapshots", headers=ADMIN).json()
+    allocate_blocks()
+    target = client.post("/v1/admin/memory/snapshots", headers=ADMIN).json()
+
+    response = client.get(f"/v1/admin/memory/diff?base={base['id']}&target={target['id']}&limit=5", headers=ADMIN)
+
+    assert response.status_code == 200
+    growth = response.json()[0]
+    assert "test_memory_routes.py" in growth["site"]
+    assert growth["size_diff_bytes"] >= 1000 * 1024
+    assert growth["count_diff"] >= 1000
+    retained.clear()
+
+    top = client.get(f"/v1/admin/memory/snapshots/{target['id']}?group_by=traceback", headers=ADMIN).json()
+    assert isinstance(top[0]["site"], list)
+    assert client.get("/v1/admin/memory/snapshots/999", headers=ADMIN).status_code == 404
+
+
+@pytest.mark.admin_routes
+def test_snapshot_requires_tracing():
+    client.post("/v1/admin/memory/stop", headers=ADMIN)
+
+    assert client.post("/v1/admin/memory/snapshots", headers=ADMIN).status_code == 409
+    assert client.get("/v1/admin/memory", headers=ADMIN).json()["snapshots"] == []
+
+
+@pytest.mark.admin_routes
+def test_request_peak_allocation_is_recorded_while_tracing():
+    client.post("/v1/admin/memory/start", headers=ADMIN)
+    client.get("/v1/sections/")
+
+    series = metrics.request_peak_allocation.collect()
+    assert series[("GET", "/v1/sections/")][-1] > 0
+    assert "gocod_request_peak_allocation_bytes_bucket" in client.get("/metrics").text
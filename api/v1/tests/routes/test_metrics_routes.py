@@ -0,0 +1,55 @@
+import threading
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.utils.handlers import handle_db_operations
+from src.utils.metrics import Histogram, result_size
+
+client = TestClient(app)
+
+
+@pytest.mark.metrics
+def test_histogram_sums_the_thread_shards():
+    histogram = Histogram("test_seconds", "Test.", ("operation",), (0.1, 1.0))
+    threads = [
+        threading.Thread(target=lambda: [histogram.observe(("op",), v) for v in (0.05, 0.1, 0.5, 2.0)])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert histogram.collect() == {("op",): [8, 4, 4, pytest.approx(4 * 2.65)]}
+    text = histogram.expose()
+    assert 'test_seconds_bucket{operation="op",le="0.1"} 8' in text
+    assert 'test_seconds_bucket{operation="op",le="1.0"} 12' in text
+    assert 'test_seconds_bucket{operation="op",le="+Inf"} 16' in text
+    assert 'test_seconds_count{operation="op"} 16' in text
+
+
+@pytest.mark.metrics
+def test_result_size():
+    assert result_size(None) == 0
+    assert result_size("6ad65b85a46978c2b777850c") == 1
+    assert result_size([1, 2, 3]) == 3
+    assert result_size({"result": [1, 2]}) == 2
+    assert result_size({"result": {"id": "s1", "name": "Section", "order": 1}}) == 1
+    assert result_size({"result": None}) == 0
+    assert result_size({"_id": "6ad65b85a46978c2b777850c", "template_name": "Django"}) == 1
+
+
+@pytest.mark.metrics
+def test_get_metrics_records_operations():
+    @handle_db_operations
+    def list_things(tx_type=None):
+        return [1, 2, 3]
+
+    list_things(tx_type="node")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    operation = "test_get_metrics_records_operations.<locals>.list_things[node]"
+    assert f'gocod_operation_duration_seconds_count{{operation="{operation}",outcome="success"}} 1' in response.text
+    assert f'gocod_operation_result_size_sum{{operation="{operation}"}} 3' in response.text
@@ -0,0 +1,112 @@
+import logging
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.db import neo4j_profiling
+from src.db.memory_db import InMemoryNeo4jDB, Node
+from src.db.neo4j_profiling import QueryProfiler, parameter_shape, plan_operators, query_template
+
+client = TestClient(app)
+
+PLAN = {
+    "operatorType": "ProduceResults@neo4j", "dbHits": 0, "rows": 2,
+    "children": [{"operatorType": "Expand(All)@neo4j", "dbHits": 6, "rows": 2, "children": [
+        {"operatorType": "NodeIndexSeek@neo4j", "dbHits": 2, "rows": 1, "children": []},
+    ]}],
+}
+
+
+class FakeSummary:
+    profile = PLAN
+
+
+class FakeRecord(dict):
+    def data(self):
+        return dict(self)
+
+
+class FakeResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def consume(self):
+        return FakeSummary()
+
+
+class FakeTransaction:
+    def __init__(self):
+        self.queries = []
+
+    def run(self, query, parameters=None):
+        self.queries.append(query)
+        return FakeResult([FakeRecord(o=1), FakeRecord(o=2)])
+
+
+@pytest.mark.admin_routes
+def test_query_template_normalizes_literals():
+    first = "MATCH (q:Question {id: 'q1', order: 2})-[:HAS_OPTION]->(o:Option) RETURN o"
+    second = "MATCH  (q:Question {id: 'q2', order: 10})-[:HAS_OPTION]->(o:Option)\nRETURN o"
+
+    assert query_template(first) == query_template(second) == (
+        "MATCH (q:Question {id: ?, order: ?})-[:HAS_OPTION]->(o:Option) RETURN o"
+    )
+    assert query_template("MATCH (t:Template {template_tags: ['a', 'b']}) RETURN t LIMIT 5") == (
+        "MATCH (t:Template {template_tags: [?]}) RETURN t LIMIT ?"
+    )
+    assert parameter_shape({"rows": [{"id": 1}], "project_id": "p1"}) == {"rows": "list[dict]", "project_id": "str"}
+
+
+@pytest.mark.admin_routes
+def test_profiler_profiles_sampled_queries():
+    profiler = QueryProfiler(sample_rate=1.0, slow_ms=10_000)
+    tx = FakeTransaction()
+
+    result = profiler.run(tx, "MATCH (q:Question {id: 'q1'})-[:HAS_OPTION]->(o:Option) RETURN o", {})
+
+    assert tx.queries == ["PROFILE MATCH (q:Question {id: 'q1'})-[:HAS_OPTION]->(o:Option) RETURN o"]
+    assert result.data() == [{"o": 1}, {"o": 2}]
+    stats = profiler.top()[0]
+    assert stats["count"] == stats["profiled"] == 1
+    assert stats["rows"] == 2
+    assert stats["db_hits_per_query"] == 8
+    assert [op["operator"] for op in stats["operators"]] == ["ProduceResults", "Expand(All)", "NodeIndexSeek"]
+    assert plan_operators(PLAN)[2]["depth"] == 2
+
+
+@pytest.mark.admin_routes
+def test_profiler_logs_slow_queries(caplog):
+    profiler = QueryProfiler(sample_rate=0.0, slow_ms=0)
+    tx = FakeTransaction()
+
+    with caplog.at_level(logging.WARNING, logger="gocod.neo4j.slow"):
+        profiler.run(tx, "UNWIND $rows AS row MERGE (n:Option {id: row.id})",
+                     {"rows": [{"id": "o1"}, {"id": "o2"}, {"id": "o3"}], "label": "Option"})
+
+    assert tx.queries == ["UNWIND $rows AS row MERGE (n:Option {id: row.id})"]
+    assert profiler.top()[0]["slow"] == 1
+    assert profiler.top()[0]["sample"]["parameters"] == {"rows": [{"id": "o1"}], "label": "Option"}
+    assert '"parameters": {"rows": "list[dict]", "label": "str"}' in caplog.text
+
+
+@pytest.mark.admin_routes
+def test_get_neo4j_queries(monkeypatch):
+    profiler = QueryProfiler(sample_rate=1.0, slow_ms=10_000)
+    monkeypatch.setattr(neo4j_profiling, "_profiler", profiler)
+    monkeypatch.setattr(neo4j_profiling, "_configured", True)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    db = InMemoryNeo4jDB()
+    question = Node("Question", {"id": "q1"})
+    db.nodes["Question"] = [question]
+
+    db.read(tx_type=None, custom_query="MATCH (q:Question {id: 'q1'})-[:HAS_OPTION]->(o:Option) RETURN o")
+    response = client.get("/v1/admin/neo4j/queries", headers={"X-Admin-Token": "secret"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["enabled"] is True
+    assert body["templates"][0]["template"] == "MATCH (q:Question {id: ?})-[:HAS_OPTION]->(o:Option) RETURN o"
+    assert body["templates"][0]["profiled"] == 1
+    assert "sample" not in body["templates"][0]
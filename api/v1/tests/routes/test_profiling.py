@@ -0,0 +1,113 @@
+import cProfile
+import re
+import threading
+import time
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.utils import profiling
+from src.utils.profiling import SamplingProfiler
+
+client = TestClient(app)
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+
+@pytest.mark.admin_routes
+def test_sampling_profiler_collapses_the_stacks_of_its_threads():
+    def spin_for_a_while():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    profiler = SamplingProfiler(interval=0.001)
+    worker = threading.Thread(target=spin_for_a_while)
+    worker.start()
+    profiler.add_thread(worker.ident)
+    profiler.start()
+    worker.join()
+    profiler.stop()
+
+    collapsed = profiler.collapsed()
+    assert profiler.samples > 0
+    # the qualified name on Python 3.11+, the bare name before
+    assert re.search(r"test_profiling\.py:(\S+\.<locals>\.)?spin_for_a_while", collapsed)
+    stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+    assert stack.startswith("threading.py:") and int(count) > 0
+
+
+@pytest.mark.admin_routes
+def test_profile_header_requires_the_admin_token():
+    response = client.get("/v1/sections/", headers={"X-Profile": "collapsed", "X-Admin-Token": "wrong"})
+
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+
+
+@pytest.mark.admin_routes
+def test_collapsed_profile_is_stored():
+    response = client.get("/v1/sections/", headers={"X-Profile": "collapsed", **ADMIN})
+    profile_id = response.headers["x-profile-id"]
+
+    profiles = client.get("/v1/admin/profiles", headers=ADMIN).json()
+    assert profiles[0]["id"] == profile_id
+    assert profiles[0]["path"] == "/v1/sections/"
+    assert profiles[0]["mode"] == "collapsed"
+    assert profiles[0]["status"] == 200
+    profile = client.get(f"/v1/admin/profiles/{profile_id}", headers=ADMIN)
+    assert profile.status_code == 200
+    assert profile.headers["content-type"].startswith("text/plain")
+
+
+@pytest.mark.admin_routes
+def test_pstats_profile_covers_the_worker_thread():
+    # the admin routes are sync: they run on a worker thread
+    response = client.get("/v1/admin/profiles", headers={"X-Profile": "pstats", **ADMIN})
+    profile_id = response.headers["x-profile-id"]
+
+    report = client.get(f"/v1/admin/profiles/{profile_id}?format=text&limit=10000", headers=ADMIN)
+    raw = client.get(f"/v1/admin/profiles/{profile_id}", headers=ADMIN)
+
+    assert "(list_profiles)" in report.text
+    assert "(__call__)" in report.text
+    assert raw.headers["content-type"] == "application/octet-stream"
+    assert client.get("/v1/admin/profiles/unknown", headers=ADMIN).status_code == 404
+
+
+class SingleProfiler(cProfile.Profile):
+    # one enabled profiler per process, as on Python 3.12+
+    active = []
+
+    def enable(self, *args, **kwargs):
+        if SingleProfiler.active:
+            raise ValueError("Another profiling tool is already active")
+        SingleProfiler.active.append(self)
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        super().disable()
+        if self in SingleProfiler.active:
+            SingleProfiler.active.remove(self)
+
+
+@pytest.mark.admin_routes
+def test_pstats_profile_of_an_offloaded_endpoint(monkeypatch):
+    # the sections service runs on the service thread pool
+    response = client.get("/v1/sections/", headers={"X-Profile": "pstats", **ADMIN})
+    assert response.status_code == 200
+    report = client.get(f"/v1/admin/profiles/{response.headers['x-profile-id']}?format=text&limit=10000",
+                        headers=ADMIN)
+    assert "sections_service.py" in report.text
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", SingleProfiler)
+    response = client.get("/v1/sections/", headers={"X-Profile": "pstats", **ADMIN})
+
+    assert response.status_code == 200
+    profile = client.get("/v1/admin/profiles", headers=ADMIN).json()[0]
+    assert profile["id"] == response.headers["x-profile-id"]
+    assert profile["unprofiled_threads"][0].startswith("service")
+    assert SingleProfiler.active == []
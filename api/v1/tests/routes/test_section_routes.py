@@ -74,4 +74,39 @@ def test_get_questions_for_section():
     section_id = "project_info"  # Replace with an actual section_id
     response = client.get(f"/v1/sections/{section_id}/questions")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
\ No newline at end of file
+    assert isinstance(response.json(), list)
+
+@pytest.mark.sections_routes
+def test_get_questions_with_prefetch():
+    response = client.get("/v1/sections/project_type/questions", params={"prefetch": 1})
+    assert response.status_code == 200
+    options = {option["text"]: option for option in response.json()[0]["options"]}
+    assert [question["id"] for question in options["Frontend"]["next"]] == ["frontend_framework"]
+    assert all("next" not in option for option in options["Frontend"]["next"][0]["options"])
+
+    assert client.get("/v1/sections/project_type/questions", params={"prefetch": 99}).status_code == 422
+
+
+@pytest.mark.sections_routes
+def test_resolve_answers():
+    answers = {"project_type": "Frontend", "frontend_framework": "React", "framework": "Django"}
+    response = client.post("/v1/sections/resolve", json={"answers": answers})
+
+    assert response.status_code == 200
+    resolution = response.json()
+    ids = [question["id"] for question in resolution["questions"]]
+    assert ids.index("project_type") < ids.index("frontend_framework")
+    assert "backend_framework" not in ids
+    assert resolution["unreachable_answers"] == ["framework"]
+    assert "project_name" in resolution["missing"]
+
+
+@pytest.mark.sections_routes
+def test_get_questions_with_options():
+    response = client.get("/v1/sections/project_type/questions", params={"include": "options"})
+
+    assert response.status_code == 200
+    questions = response.json()
+    assert [question["order"] for question in questions] == sorted(question["order"] for question in questions)
+    assert any(option["text"] == "Frontend" for option in questions[0]["options"])
+    assert client.get("/v1/sections/project_type/questions", params={"include": "tags"}).status_code == 422
@@ -0,0 +1,59 @@
+import datetime
+import json
+from typing import List
+from bson.objectid import ObjectId
+from pydantic import TypeAdapter
+import pytest
+from src.models.project import ProjectFields
+from src.models.template import TemplateReadFields
+from src.utils.parsing import parse_mongo_id
+from src.utils.serialization import TrustedSerializer, dumps
+
+template_document = {
+    "_id": ObjectId(),
+    "created_by": "653e4964f9e328a046420984",
+    "template_name": "FastAPI",
+    "template_description": "A FastAPI project.",
+    "is_private": False,
+    "template_tags": ["Python", "API"],
+    "template_url": "https://example.com/fastapi",
+    "stars": 3,
+}
+
+
+@pytest.mark.templates_routes
+def test_trusted_rows_match_the_validated_response():
+    serializer = TrustedSerializer(TemplateReadFields, "template")
+    adapter = TypeAdapter(List[TemplateReadFields])
+
+    trusted = json.loads(serializer.response([template_document, None]).body)
+    validated = adapter.dump_python(adapter.validate_python(parse_mongo_id([dict(template_document)], "template")))
+
+    assert trusted == validated
+    assert "_id" in template_document and "tid" not in template_document
+
+
+@pytest.mark.templates_routes
+def test_trusted_rows_keep_their_own_id_without_document_type():
+    row = TrustedSerializer(ProjectFields).rows({"pid": "p1", "project_name": "Dev", "_id": ObjectId()})
+
+    assert row == {"pid": "p1", "project_name": "Dev"}
+
+
+@pytest.mark.templates_routes
+def test_dumps_converts_object_ids_and_datetimes():
+    object_id = ObjectId()
+    at = datetime.datetime(2024, 1, 2, 3, 4, 5)
+
+    assert json.loads(dumps({"id": object_id, "ids": [object_id], "at": at})) == {
+        "id": str(object_id), "ids": [str(object_id)], "at": "2024-01-02T03:04:05",
+    }
+
+
+@pytest.mark.templates_routes
+def test_response_validation_rejects_mismatched_documents(monkeypatch):
+    monkeypatch.setenv("RESPONSE_VALIDATION", "1")
+    serializer = TrustedSerializer(TemplateReadFields, "template")
+
+    with pytest.raises(ValueError):
+        serializer.response({"_id": ObjectId(), "template_name": "No owner"})
@@ -0,0 +1,47 @@
+import json
+import logging
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from tests.main_test import app
+from src.utils.timing import RequestTimings, ServerTimingMiddleware
+
+client = TestClient(app)
+
+
+@pytest.mark.metrics
+def test_request_timings_header():
+    timings = RequestTimings()
+    timings.add("neo4j", 0.002)
+    timings.add("neo4j", 0.003)
+    timings.add("serialize", 0.0004)
+
+    assert timings.header() == 'neo4j;dur=5.0;desc="2 calls", serialize;dur=0.4'
+
+
+@pytest.mark.metrics
+def test_server_timing_header():
+    response = client.get("/v1/sections/project_type/questions")
+
+    assert response.status_code == 200
+    spans = {entry.split(";")[0]: entry for entry in response.headers["server-timing"].split(", ")}
+    assert {"neo4j", "endpoint", "serialize", "total"} <= set(spans)
+    assert 'desc="1 call"' in spans["neo4j"]
+
+
+@pytest.mark.metrics
+def test_server_timing_log(caplog):
+    timed = FastAPI()
+    timed.add_middleware(ServerTimingMiddleware, header=False, log=True)
+
+    @timed.get("/ping")
+    async def ping():
+        return {"ping": "pong"}
+
+    with caplog.at_level(logging.INFO, logger="gocod.timing"):
+        response = TestClient(timed).get("/ping")
+
+    assert "server-timing" not in response.headers
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["path"] == "/ping"
+    assert line["status"] == 200
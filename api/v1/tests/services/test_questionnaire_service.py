@@ -0,0 +1,151 @@
+import pytest
+from fastapi.testclient import TestClient
+from src.db.ingestion.graph import EDGE_GROUPS, NODE_KEYS, build_graph
+from src.db.ingestion.validation import build_index, edges_hash
+from src.db.memory_db import InMemoryNeo4jDB, Node
+from src.services.questionnaire_service import QuestionnaireService
+from tests.main_test import app
+
+sections = [
+    {"id": "s1", "name": "First", "order": 1, "description": "", "is_conditional": False},
+    {"id": "s2", "name": "Second", "order": 2, "description": "", "is_conditional": True},
+]
+questions = [
+    {"id": "q1", "statement": "Type?", "question_type": "select", "section_id": "s1", "order": 1},
+    {"id": "q2", "statement": "Framework?", "question_type": "select", "section_id": "s2", "order": 1,
+     "required": True, "depends_on": "q1", "value": ["Web"]},
+]
+options = [
+    {"question_id": "q1", "text": "Web", "is_default": True},
+    {"question_id": "q1", "text": "CLI"},
+    {"question_id": "q2", "text": "Django"},
+]
+
+
+def load(neo4j, sections, questions, options):
+    nodes, edges = build_graph([], sections, questions, options)
+    for label, rows in nodes.items():
+        neo4j.merge_nodes(label, NODE_KEYS[label], list(rows.values()))
+    for (start_label, relation_type, end_label), rows in edges.items():
+        neo4j.merge_relationships(start_label, NODE_KEYS[start_label], relation_type, end_label,
+                                  NODE_KEYS[end_label], list(rows.values()))
+
+
+@pytest.fixture
+def questionnaire_service():
+    neo4j = InMemoryNeo4jDB()
+    load(neo4j, sections, questions, options)
+    # a partial duplicate of an option node, as left by the legacy loader
+    neo4j.nodes["Option"].append(Node("Option", {"question_id": "q1", "text": "Web"}))
+    return QuestionnaireService(neo4j, ttl=0)
+
+
+@pytest.mark.section_service
+def test_bundle_nests_the_questionnaire(questionnaire_service):
+    bundle = questionnaire_service.get_bundle()
+
+    assert list(bundle["sections"]) == ["s1", "s2"]
+    assert bundle["sections"]["s1"]["questions"] == ["q1"]
+    options_q1 = {option["text"]: option for option in bundle["questions"]["q1"]["options"]}
+    assert options_q1["Web"]["next"] == ["q2"]
+    assert options_q1["CLI"]["next"] == []
+    assert len(bundle["questions"]["q1"]["options"]) == 2
+    assert "content_hash" not in bundle["questions"]["q1"]
+    assert len(bundle["version"]) == 16
+    assert questionnaire_service.get_bundle()["version"] == bundle["version"]
+
+
+@pytest.mark.section_service
+def test_bundle_uses_the_stored_index(questionnaire_service):
+    bundle = questionnaire_service.get_bundle()
+    assert bundle["order"] == ["q1", "q2"]
+    assert bundle["questions"]["q1"]["reachable"] == ["q2"]
+
+    # a stored index of the same questions and LEADS_TO is used as it is
+    index = {"id": "questionnaire", "order": ["q1", "q2"], "reachable": '{"q1": ["stored"], "q2": []}',
+             "edges_hash": edges_hash([("q1", "q2")])}
+    questionnaire_service.neo4j.merge_nodes("QuestionnaireIndex", ("id",), [index])
+    bundle = questionnaire_service.get_bundle()
+    assert bundle["questions"]["q1"]["reachable"] == ["stored"]
+
+    # an out of date one is recomputed
+    questionnaire_service.neo4j.merge_nodes("QuestionnaireIndex", ("id",), [{**index, "order": ["q1"]}])
+    assert questionnaire_service.get_bundle()["questions"]["q1"]["reachable"] == ["q2"]
+
+
+@pytest.mark.section_service
+def test_an_index_of_other_leads_to_is_recomputed():
+    abcd = [{"id": question_id, "section_id": "s1", "order": order} for order, question_id in enumerate("abcd")]
+    abcd_options = [{"question_id": question_id, "text": text} for question_id, text in zip("acb", "xyz")]
+    # the index was built from a -> b -> d, the graph now has a -> c -> b -> d
+    stored = build_index(sections, abcd, [("a", "b"), ("b", "d")])
+    live = [{**abcd[0]}, {**abcd[1], "depends_on": "c", "value": ["y"]},
+            {**abcd[2], "depends_on": "a", "value": ["x"]}, {**abcd[3], "depends_on": "b", "value": ["z"]}]
+    neo4j = InMemoryNeo4jDB()
+    load(neo4j, sections, live, abcd_options)
+    neo4j.merge_nodes("QuestionnaireIndex", ("id",), [stored])
+
+    resolution = QuestionnaireService(neo4j, ttl=0).resolve({"a": "x", "c": "y", "b": "z"})
+
+    assert [question["id"] for question in resolution["questions"]] == ["a", "b", "c", "d"]
+
+
+@pytest.mark.section_service
+def test_delta_returns_what_changed(questionnaire_service):
+    version = questionnaire_service.get_bundle()["version"]
+    neo4j = questionnaire_service.neo4j
+    neo4j.merge_nodes("Question", ("id",), [{**questions[1], "statement": "Which framework?"}])
+    neo4j.delete_nodes("Section", ("id",), [("s1",)])
+
+    delta = questionnaire_service.get_delta(version)
+
+    assert delta["since"] == version and delta["version"] != version
+    assert list(delta["questions"]) == ["q2"]
+    assert delta["questions"]["q2"]["statement"] == "Which framework?"
+    assert delta["sections"] == {}
+    assert delta["removed_sections"] == ["s1"]
+    assert questionnaire_service.get_delta("unknown") is None
+
+
+@pytest.mark.sections_routes
+def test_questionnaire_route_is_cacheable():
+    client = TestClient(app)
+    response = client.get("/v1/questionnaire/")
+    assert response.status_code == 200
+    version, order = response.json()["version"], response.json()["order"]
+    assert response.headers["etag"] == f'W/"{version}"'
+    assert "max-age" in response.headers["cache-control"]
+
+    assert client.get("/v1/questionnaire/", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    delta = client.get("/v1/questionnaire/", params={"since": version}).json()
+    assert delta == {"version": version, "since": version, "order": order, "sections": {}, "removed_sections": [],
+                     "questions": {}, "removed_questions": []}
+    assert "sections" in client.get("/v1/questionnaire/", params={"since": "unknown"}).json()
+
+
+@pytest.mark.section_service
+def test_resolve_follows_the_chosen_options(questionnaire_service):
+    resolution = questionnaire_service.resolve({"q1": "CLI", "q2": "Django"})
+
+    assert [question["id"] for question in resolution["questions"]] == ["q1"]
+    assert resolution["questions"][0]["answer"] == ["CLI"]
+    assert resolution["unreachable_answers"] == ["q2"]
+    assert resolution["complete"]
+
+    resolution = questionnaire_service.resolve({"q1": ["Web", "Mobile"]})
+
+    assert [question["id"] for question in resolution["questions"]] == ["q1", "q2"]
+    assert resolution["invalid_answers"] == {"q1": ["Mobile"]}
+    assert resolution["unreachable_answers"] == []
+    assert resolution["missing"] == ["q2"]
+    assert not resolution["complete"]
+
+
+@pytest.mark.sections_routes
+def test_the_routes_share_one_questionnaire():
+    from src.routers import questionnaire, sections
+
+    assert sections.questionnaire_service is questionnaire.questionnaire_service
+    client = TestClient(app)
+    version = client.get("/v1/questionnaire/").json()["version"]
+    assert client.post("/v1/sections/resolve", json={"answers": {}}).json()["version"] == version
@@ -75,3 +75,39 @@ def test_get_next_questions(section_service_instance):
     assert len(questions) == 1
     assert questions[0]["id"] == "frontend_framework"
     assert questions[0]["options"][0]["text"] == "React"
+
+
+@pytest.mark.section_service
+def test_prefetch_follow_ups():
+    from src.db.memory_db import InMemoryNeo4jDB, Node
+    from tests.services.test_questionnaire_service import load, options, questions, sections
+
+    neo4j = InMemoryNeo4jDB()
+    load(neo4j, sections, questions, options)
+    # a partial duplicate of an option node, as left by the legacy loader
+    neo4j.nodes["Option"].append(Node("Option", {"question_id": "q1", "text": "Web"}))
+    service = SectionService(neo4j=neo4j)
+    first = [{"id": "q1", "statement": "Type?", "question_type": "select", "section_id": "s1", "order": 1}]
+
+    expanded = service.prefetch_follow_ups(first, depth=1)
+
+    web, cli = expanded[0]["options"][1], expanded[0]["options"][0]
+    assert (web["text"], web["is_default"]) == ("Web", True)
+    assert cli["next"] == []
+    assert [question["id"] for question in web["next"]] == ["q2"]
+    assert web["next"][0]["options"] == [{"text": "Django"}]
+    assert "content_hash" not in web["next"][0]
+    assert service.prefetch_follow_ups(first, depth=0) is first
+
+
+@pytest.mark.section_service
+def test_get_questions_for_sections_with_options(section_service_instance):
+    questions = section_service_instance.get_questions_for_sections(["project_type", "project_info"], True)
+
+    assert [question["id"] for question in questions["project_info"]] == ["project_name", "project_tags"]
+    project_type = questions["project_type"][0]
+    texts = [option["text"] for option in project_type["options"]]
+    assert texts == sorted(set(texts))
+    assert "Frontend" in texts
+    assert all("content_hash" not in option for option in project_type["options"])
+    assert "options" not in section_service_instance.get_questions_for_section("project_type")[0]
@@ -1,6 +1,5 @@
 import pytest
 from bson.objectid import ObjectId
-from api.v1.tests.services.test_user_service import user_service_instance
 from src.services.templates_service import TemplateService
 from src.services.users_service import UserService
 from src.utils.handlers import random_string
@@ -21,12 +20,20 @@ def neo4j_instance():
 @pytest.fixture(scope='module')
 def template_service_instance(mongo_instance, neo4j_instance):
     return TemplateService(mongo=mongo_instance, neo4j=neo4j_instance)
-mongo = get_mongo_db('test_db')
-user_service_instance = UserService(db=mongo)
-user_id = user_service_instance.create_user({"username": "John", "password": "secure_password"}).get("result")
+
+
+@pytest.fixture(scope='module')
+def user_service_instance(mongo_instance):
+    return UserService(db=mongo_instance)
+
+
+@pytest.fixture
+def user_id(user_service_instance):
+    # created per test: other modules drop the `users` collection of the test database
+    return user_service_instance.create_user({"username": "John", "password": "secure_password"}).get("result")
 
 @pytest.mark.template_service
-def test_create_template(template_service_instance):
+def test_create_template(template_service_instance, user_id):
     template_name = "ReadTest"+random_string()
     template_data = {"template_name": template_name, "is_private": False, "created_by": user_id}
     print(f"Template data in creation: {template_data}")
@@ -49,7 +56,7 @@ def test_create_template(template_service_instance):
     assert template_neo4j["template_name"] == template_name
 
 @pytest.mark.template_service
-def test_read_template(template_service_instance):
+def test_read_template(template_service_instance, user_id):
     # You need to create a template first to test the read operation
     template_name = "ReadTest"+random_string()
     template_data = {"template_name": template_name, "is_private": False, "created_by": user_id}
@@ -62,7 +69,7 @@ def test_read_template(template_service_instance):
     assert template['template_name'] == template_name
 
 @pytest.mark.template_service
-def test_list_templates(template_service_instance):
+def test_list_templates(template_service_instance, user_id):
 
     # You should create some templates first to test the listing
     for i in range(3):
@@ -111,7 +118,7 @@ def test_delete_template(template_service_instance):
     assert template_neo4j is None
 
 @pytest.mark.template_service
-def test_delete_private_template(template_service_instance):
+def test_delete_private_template(template_service_instance, user_id):
     # You need to create a template first to test the delete operation
     template_data = {"template_name": "DeleteTest"+random_string(), "is_private": True, "created_by": user_id}
     template_id = template_service_instance.create_template(template_data).get("result").get("value")
@@ -125,7 +132,7 @@ def test_delete_private_template(template_service_instance):
     assert deleted_template is None
 
 @pytest.mark.template_service
-def test_star_template(template_service_instance):
+def test_star_template(template_service_instance, user_service_instance, user_id):
     # You need to create a template first to test the star operation
     template_name = "StarTest"+random_string()
     template_data = {"template_name": template_name, "is_private": True, "created_by": user_id}
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.utils import concurrency, metrics
+
+
+class Service:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    @concurrency.single_flight
+    def read(self, section_ids, include_options=False):
+        with self._lock:
+            self.calls.append((tuple(section_ids), include_options))
+        time.sleep(0.1)
+        return {"sections": list(section_ids)}
+
+    @concurrency.single_flight
+    def fail(self):
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    def write(self, value):
+        with self._lock:
+            self.calls.append(value)
+        time.sleep(0.05)
+        return value
+
+
+def counts(method):
+    calls = metrics.single_flight_calls.collect()
+    return calls.get((method, "leader"), 0), calls.get((method, "coalesced"), 0)
+
+
+@pytest.mark.concurrency
+def test_concurrent_reads_share_one_call():
+    service = Service()
+    offloaded = concurrency.offloaded(service, coalesce=True)
+    before = counts("Service.read")
+
+    async def burst():
+        same = [offloaded.read(["s1", "s2"]) for _ in range(10)]
+        other = [offloaded.read(["s1", "s2"], include_options=True), offloaded.read(["s3"])]
+        return await asyncio.gather(*same, *other)
+
+    results = asyncio.run(burst())
+
+    assert sorted(service.calls) == [(("s1", "s2"), False), (("s1", "s2"), True), (("s3",), False)]
+    assert all(result is results[0] for result in results[:10])
+    assert results[-1] == {"sections": ["s3"]}
+    leaders, coalesced = counts("Service.read")
+    assert (leaders - before[0], coalesced - before[1]) == (3, 9)
+
+    # once the call is over, the next one runs again
+    asyncio.run(offloaded.read(["s1", "s2"]))
+    assert len(service.calls) == 4
+
+
+@pytest.mark.concurrency
+def test_only_the_opted_in_methods_are_coalesced():
+    service = Service()
+    offloaded = concurrency.offloaded(service, coalesce=True)
+
+    async def burst():
+        return await asyncio.gather(*(offloaded.write(1) for _ in range(5)))
+
+    assert asyncio.run(burst()) == [1] * 5
+    assert service.calls == [1] * 5
+
+    service.calls.clear()
+    uncoalesced = concurrency.offloaded(service, coalesce=False)
+
+    async def reads():
+        return await asyncio.gather(*(uncoalesced.read(["s1"]) for _ in range(5)))
+
+    asyncio.run(reads())
+    assert len(service.calls) == 5
+
+
+@pytest.mark.concurrency
+def test_the_callers_share_the_error():
+    offloaded = concurrency.offloaded(Service(), coalesce=True)
+
+    async def burst():
+        return await asyncio.gather(*(offloaded.fail() for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(burst())
+
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert "gocod_single_flight_calls_total" in metrics.expose()